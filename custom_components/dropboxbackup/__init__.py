@@ -1,25 +1,117 @@
 """The Dropbox Backup integration."""
 
+from functools import partial
+
 from homeassistant.config_entries import ConfigEntry
-from homeassistant.core import HomeAssistant
+from homeassistant.const import Platform
+from homeassistant.core import HomeAssistant, callback
+
+from .backup import async_get_agent, cache_location
+from .cache import BackupCache
+from .const import (
+    CONF_AGENT_ID,
+    CONF_DOWNLOAD_LIMIT,
+    CONF_IO_WORKERS,
+    CONF_UNLIMITED_HOURS,
+    CONF_UPLOAD_LIMIT,
+    DATA_AGENTS,
+    DATA_BACKUP_AGENT_LISTENERS,
+    DEFAULT_IO_WORKERS,
+    DOMAIN,
+    LEGACY_AGENT_ID,
+)
+from .workers import WorkerPool
 
-from .backup import async_register_backup_agents_listener
-from .const import DATA_BACKUP_AGENT_LISTENERS
+PLATFORMS = [Platform.SENSOR]
+# Options applied to running transfers without reloading the entry
+LIVE_OPTIONS = (CONF_UPLOAD_LIMIT, CONF_DOWNLOAD_LIMIT, CONF_UNLIMITED_HOURS)
 
 
 async def async_setup_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
     """Set up Dropbox Backup and register for backup agent updates."""
+    # Blocking work gets its own threads instead of HA's shared executor
+    pool = WorkerPool(entry.options.get(CONF_IO_WORKERS, DEFAULT_IO_WORKERS), DOMAIN)
+    entry.async_on_unload(pool.shutdown)
+
+    # One agent per entry, kept with its index and caches across reloads
+    agent = async_get_agent(hass, entry, pool)
+    entry.runtime_data = agent
+    entry.async_on_unload(agent.async_unload)
 
     # Notify function drives the BackupManager to reload agents
+    @callback
     def _notify() -> None:
         for listener in hass.data.get(DATA_BACKUP_AGENT_LISTENERS, []):
             listener()
 
-    # Register and ensure cleanup
-    remove = async_register_backup_agents_listener(hass, listener=_notify)
-    entry.async_on_unload(remove)
+    # Import the SDK, check the token and list the folder before the backup
+    # page asks for it, without holding up startup
+    agent.start_warm_up()
+
+    # Watch the backup folder for changes made outside this instance
+    entry.async_create_background_task(
+        hass, agent.async_watch_folder(_notify), f"{DOMAIN} folder watcher"
+    )
+
+    await hass.config_entries.async_forward_entry_setups(entry, PLATFORMS)
 
-    # Fire immediately to register your agent
+    # The worker pool is sized at setup, so option changes reload the entry
+    entry.async_on_unload(
+        entry.add_update_listener(
+            partial(_async_update_listener, _static_options(entry.options))
+        )
+    )
+
+    # Fire now to register the agent, and again when the entry is unloaded
+    entry.async_on_unload(_notify)
     _notify()
 
     return True
+
+
+async def _async_update_listener(
+    setup_options: dict, hass: HomeAssistant, entry: ConfigEntry
+) -> None:
+    """Apply changed options.
+
+    Bandwidth limits change on the running agent, so a transfer in progress
+    carries on at the new rate; any other change reloads the entry.
+    """
+    if _static_options(entry.options) == setup_options:
+        entry.runtime_data.limiter.configure(entry.options)
+        return
+    await hass.config_entries.async_reload(entry.entry_id)
+
+
+def _static_options(options) -> dict:
+    """Return the options that only take effect on setup."""
+    return {key: value for key, value in options.items() if key not in LIVE_OPTIONS}
+
+
+async def async_migrate_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Bring an entry up to the current config entry version."""
+    if entry.version > 1:
+        return False
+    if entry.minor_version < 2:
+        data = {**entry.data}
+        # The first entry upgraded keeps the id of the old shared agent, so
+        # automatic backup settings still select it
+        if not any(
+            other.data.get(CONF_AGENT_ID) == LEGACY_AGENT_ID
+            for other in hass.config_entries.async_entries(DOMAIN)
+        ):
+            data[CONF_AGENT_ID] = LEGACY_AGENT_ID
+        hass.config_entries.async_update_entry(entry, data=data, minor_version=2)
+    return True
+
+
+async def async_unload_entry(hass: HomeAssistant, entry: ConfigEntry) -> bool:
+    """Unload a config entry; the folder watcher is cancelled with it."""
+    return await hass.config_entries.async_unload_platforms(entry, PLATFORMS)
+
+
+async def async_remove_entry(hass: HomeAssistant, entry: ConfigEntry) -> None:
+    """Forget a removed entry's agent and delete its local backup cache."""
+    hass.data.get(DATA_AGENTS, {}).pop(entry.entry_id, None)
+    cache = BackupCache(*cache_location(hass, entry.entry_id), 0, 0)
+    await hass.async_add_executor_job(cache.clear)
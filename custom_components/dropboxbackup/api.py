@@ -0,0 +1,262 @@
+"""Asyncio transport for the Dropbox API on Home Assistant's aiohttp session."""
+
+import json
+
+import aiohttp
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
+
+from .retry import parse_retry_after
+
+HOSTS = {
+    "api": "https://api.dropboxapi.com",
+    "content": "https://content.dropboxapi.com",
+}
+# Per-request socket timeouts; a chunk upload or a download can take far
+# longer than this overall, as long as data keeps moving.
+REQUEST_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=120)
+
+
+class DropboxClient:
+    """Async client for the Dropbox endpoints the backup agent uses.
+
+    Requests go through Home Assistant's shared aiohttp session, so
+    connections are pooled and kept alive and no executor thread waits on the
+    network. Arguments, results and errors are converted with the SDK's own
+    route definitions, so callers get the same types and exceptions as from
+    ``dropbox.Dropbox``. Any other method is served by the wrapped SDK client.
+    """
+
+    def __init__(self, hass: HomeAssistant, access_token: str, sdk) -> None:
+        self._hass = hass
+        self._access_token = access_token
+        self._sdk = sdk
+
+    def __getattr__(self, name: str):
+        # Endpoints without a native implementation fall back to the SDK
+        return getattr(self._sdk, name)
+
+    async def files_list_folder(
+        self, path: str, recursive: bool = False, limit: int | None = None
+    ):
+        """List the first page of a folder, and its subfolders if ``recursive``."""
+        from dropbox import files
+
+        return await self._request(
+            files.list_folder,
+            files.ListFolderArg(path, recursive=recursive, limit=limit),
+        )
+
+    async def files_list_folder_continue(self, cursor: str):
+        """List the next page of changes after ``cursor``."""
+        from dropbox import files
+
+        return await self._request(
+            files.list_folder_continue, files.ListFolderContinueArg(cursor)
+        )
+
+    async def files_get_metadata(self, path: str):
+        """Return the metadata of a file or folder."""
+        from dropbox import files
+
+        return await self._request(files.get_metadata, files.GetMetadataArg(path))
+
+    async def files_delete_v2(self, path: str):
+        """Delete a file or folder."""
+        from dropbox import files
+
+        return await self._request(files.delete_v2, files.DeleteArg(path))
+
+    async def files_copy_v2(self, from_path: str, to_path: str):
+        """Copy a file on the server."""
+        from dropbox import files
+
+        return await self._request(
+            files.copy_v2, files.RelocationArg(from_path, to_path)
+        )
+
+    async def files_get_temporary_link(self, path: str):
+        """Return a short-lived link to a file that supports Range requests."""
+        from dropbox import files
+
+        return await self._request(
+            files.get_temporary_link, files.GetTemporaryLinkArg(path)
+        )
+
+    async def files_delete_batch(self, entries):
+        """Start deleting several files; returns a job id or the result."""
+        from dropbox import files
+
+        return await self._request(files.delete_batch, files.DeleteBatchArg(entries))
+
+    async def files_delete_batch_check(self, async_job_id: str):
+        """Return the status of a delete_batch job."""
+        from dropbox import async_, files
+
+        return await self._request(
+            files.delete_batch_check, async_.PollArg(async_job_id)
+        )
+
+    async def files_upload(self, f: bytes, path: str, mode=None):
+        """Upload a file in a single request."""
+        from dropbox import files
+
+        arg = files.UploadArg(path, mode=mode or files.WriteMode.add)
+        return await self._request(files.upload, arg, f)
+
+    async def files_upload_session_start(
+        self, f: bytes, close: bool = False, session_type=None
+    ):
+        """Start an upload session with ``f`` as its first data."""
+        from dropbox import files
+
+        arg = files.UploadSessionStartArg(close, session_type)
+        return await self._request(files.upload_session_start, arg, f)
+
+    async def files_upload_session_append_v2(
+        self, f: bytes, cursor, close: bool = False
+    ) -> None:
+        """Append ``f`` to an upload session at the cursor's offset."""
+        from dropbox import files
+
+        arg = files.UploadSessionAppendArg(cursor, close)
+        return await self._request(files.upload_session_append_v2, arg, f)
+
+    async def files_upload_session_finish(self, f: bytes, cursor, commit):
+        """Append ``f``, then commit the upload session to a file."""
+        from dropbox import files
+
+        arg = files.UploadSessionFinishArg(cursor, commit)
+        return await self._request(files.upload_session_finish, arg, f)
+
+    async def files_download(self, path: str):
+        """Return the metadata of a file and a DownloadResponse for its body."""
+        from dropbox import files
+
+        return await self._request(files.download, files.DownloadArg(path))
+
+    async def _request(self, route, arg, data: bytes | None = None):
+        """Call ``route`` and return its decoded result.
+
+        Download routes return ``(result, DownloadResponse)`` with the body
+        still unread; the caller must close it.
+        """
+        from dropbox import stone_serializers
+
+        style = route.attrs["style"]
+        name = route.name if route.version == 1 else f"{route.name}_v{route.version}"
+        url = f"{HOSTS[route.attrs['host']]}/2/files/{name}"
+        serialized = stone_serializers.json_encode(route.arg_type, arg)
+        headers = {"Authorization": f"Bearer {self._access_token}"}
+        if style == "rpc":
+            headers["Content-Type"] = "application/json"
+            data = serialized.encode()
+        else:
+            headers["Dropbox-API-Arg"] = serialized
+            if style == "upload":
+                headers["Content-Type"] = "application/octet-stream"
+
+        session = async_get_clientsession(self._hass)
+        resp = await session.post(
+            url, headers=headers, data=data, timeout=REQUEST_TIMEOUT
+        )
+        try:
+            if resp.status != 200:
+                await _raise_for_response(route, resp)
+            if style == "download":
+                result = json.loads(resp.headers["Dropbox-API-Result"])
+            else:
+                result = json.loads(await resp.read())
+            result = stone_serializers.json_compat_obj_decode(
+                route.result_type, result, strict=False
+            )
+        except BaseException:
+            resp.release()
+            raise
+        if style == "download":
+            return result, DownloadResponse(resp)
+        resp.release()
+        return result
+
+
+class DownloadResponse:
+    """Body of a download, read from the network as the caller consumes it."""
+
+    def __init__(self, resp: aiohttp.ClientResponse) -> None:
+        self._resp = resp
+
+    async def iter_chunks(self, size: int):
+        """Yield the body in pieces of at most ``size`` bytes."""
+        async for chunk in self._resp.content.iter_chunked(size):
+            yield chunk
+
+    async def read(self, limit: int | None = None) -> bytes:
+        """Read the whole body, or at most its first ``limit`` bytes."""
+        if limit is None:
+            return await self._resp.read()
+        parts = []
+        while limit > 0 and (part := await self._resp.content.read(limit)):
+            parts.append(part)
+            limit -= len(part)
+        return b"".join(parts)
+
+    def close(self) -> None:
+        """Release the connection; an unfinished body closes it instead."""
+        self._resp.release()
+
+
+async def _raise_for_response(route, resp: aiohttp.ClientResponse) -> None:
+    """Raise the exception the SDK raises for a failed ``route`` response."""
+    from dropbox import stone_serializers
+    from dropbox.auth import AuthError_validator, RateLimitError_validator
+    from dropbox.exceptions import (
+        ApiError,
+        AuthError,
+        BadInputError,
+        HttpError,
+        InternalServerError,
+        RateLimitError,
+    )
+
+    request_id = resp.headers.get("x-dropbox-request-id")
+    text = await resp.text()
+    status = resp.status
+    if status >= 500:
+        raise InternalServerError(request_id, status, text)
+    if status == 400:
+        raise BadInputError(request_id, text)
+
+    try:
+        body = json.loads(text)
+    except ValueError:
+        body = None
+    error = body.get("error") if isinstance(body, dict) else None
+
+    if status == 401:
+        if error is not None:
+            error = stone_serializers.json_compat_obj_decode(
+                AuthError_validator, error, strict=False
+            )
+        raise AuthError(request_id, error)
+    if status == 429:
+        retry_after = None
+        if error is not None:
+            error = stone_serializers.json_compat_obj_decode(
+                RateLimitError_validator, error, strict=False
+            )
+            retry_after = error.retry_after
+        elif (header := resp.headers.get("Retry-After")) is not None:
+            # Not always whole seconds; HTTP dates give no usable delay
+            retry_after = parse_retry_after(header)
+        raise RateLimitError(request_id, error, retry_after)
+    if status in (403, 404, 409) and error is not None:
+        user_message = body.get("user_message") or {}
+        raise ApiError(
+            request_id,
+            stone_serializers.json_compat_obj_decode(
+                route.error_type, error, strict=False
+            ),
+            user_message.get("text"),
+            user_message.get("locale"),
+        )
+    raise HttpError(request_id, status, text)
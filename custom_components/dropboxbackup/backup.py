@@ -1,207 +1,1524 @@
 """Dropbox Backup Agent for Home Assistant."""
 
+import asyncio
+import fnmatch
+import inspect
+import io
 import logging
+import time
 import urllib.parse
+from collections import deque
+from collections.abc import Callable
+from datetime import UTC
+from functools import partial
 
+import aiohttp
 from homeassistant.components.backup import BackupAgent, BackupAgentError, AgentBackup
+from homeassistant.config_entries import ConfigEntryState
 from homeassistant.core import HomeAssistant, callback
+from homeassistant.helpers.aiohttp_client import async_get_clientsession
 from homeassistant.helpers.config_entry_oauth2_flow import (
     async_get_config_entry_implementation,
 )
-from .const import DOMAIN, CONF_FOLDER
+from .api import DownloadResponse, DropboxClient
+from .bandwidth import BandwidthLimiter
+from .cache import CACHE_FOLDER, CACHE_READ_SIZE, BackupCache, CacheWriter
+from .chunk_size import ChunkSizer
+from .compression import (
+    CODEC_NONE,
+    compress_bytes,
+    compress_stream,
+    decompress_head,
+    decompress_stream,
+    detect_codec,
+)
+from .const import (
+    CONF_AGENT_ID,
+    CONF_CACHE_BACKUPS,
+    CONF_CACHE_SIZE,
+    CONF_BACKUP_PATTERN,
+    CONF_COMPRESSION,
+    CONF_COMPRESSION_LEVEL,
+    CONF_DEDUPLICATE,
+    CONF_DOWNLOAD_CHUNK_SIZE,
+    CONF_DOWNLOAD_CONCURRENCY,
+    CONF_FOLDER,
+    CONF_INCLUDE_SUBFOLDERS,
+    CONF_KEEP_DAILY,
+    CONF_KEEP_LAST,
+    CONF_KEEP_MONTHLY,
+    CONF_KEEP_WEEKLY,
+    CONF_MAX_CHUNK_SIZE,
+    CONF_MAX_TOTAL_SIZE,
+    CONF_MIN_CHUNK_SIZE,
+    CONF_UPLOAD_CONCURRENCY,
+    DEFAULT_BACKUP_PATTERN,
+    DEFAULT_COMPRESSION,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_DEDUPLICATE,
+    DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    DEFAULT_DOWNLOAD_CONCURRENCY,
+    DEFAULT_INCLUDE_SUBFOLDERS,
+    DEFAULT_MAX_CHUNK_SIZE,
+    DEFAULT_MIN_CHUNK_SIZE,
+    DEFAULT_UPLOAD_CONCURRENCY,
+    DATA_AGENTS,
+    DATA_BACKUP_AGENT_LISTENERS,
+    DOMAIN,
+)
+from .content_hash import ContentHasher
+from .dedup import (
+    CHUNK_FOLDER,
+    ContentChunker,
+    chunk_id,
+    dump_manifest,
+    is_manifest,
+    load_manifest,
+    restore_chunk,
+)
+from .metadata import (
+    ARCHIVE_HEADER_LIMIT,
+    INDEX_FILE,
+    dump_index,
+    load_index,
+    read_archive_metadata,
+)
+from .metrics import (
+    OperationRecord,
+    TransferMetrics,
+    count_api_call,
+    count_throttled,
+)
+from .retention import expired_backups
+from .retry import (
+    REQUEST_ATTEMPTS,
+    backoff_delay,
+    parse_retry_after,
+    retries_spent,
+    retry_delay,
+    start_operation,
+    take_retry,
+)
+from .store import UPLOAD_SESSION_MAX_AGE, UploadSessionStore
+from .workers import WorkerPool
 
 
 _LOGGER = logging.getLogger(__name__)
 
-# Dropbox recommends 4 MB chunks for upload sessions.
+# Upload sessions start with chunks of this size; ChunkSizer then adapts it
+# to the measured throughput.
 CHUNK_SIZE = 8 * 1024 * 1024
-# Files up to 150 MB can be uploaded in a single call.
-SIMPLE_UPLOAD_LIMIT = 150 * 1024 * 1024
+# Number of read-ahead chunks queued for an upload session.
+UPLOAD_QUEUE_DEPTH = 2
+# Backups that fit in one chunk are sent with a single files_upload call;
+# anything larger streams through an upload session.
+SIMPLE_UPLOAD_LIMIT = CHUNK_SIZE
+# Downloads are streamed from the network in chunks of this size.
+DOWNLOAD_CHUNK_SIZE = 1024 * 1024
+# Number of downloaded chunks buffered ahead of the consumer.
+DOWNLOAD_READ_AHEAD = 4
+# Attempts per byte range before a ranged download gives up.
+RANGE_ATTEMPTS = 4
+RANGE_TIMEOUT = aiohttp.ClientTimeout(total=None, sock_connect=30, sock_read=60)
+# Refresh the access token this many seconds before it expires.
+TOKEN_EXPIRY_MARGIN = 60
+# Entries whose agent is offered to the backup manager
+AGENT_ENTRY_STATES = (ConfigEntryState.SETUP_IN_PROGRESS, ConfigEntryState.LOADED)
+# Unused dedup chunks younger than this are kept, as a backup another
+# instance is uploading may not have written the manifest listing them yet.
+CHUNK_GRACE_PERIOD = 24 * 60 * 60
+# Entries asked for per listing page; Dropbox allows up to 2000.
+LIST_PAGE_LIMIT = 2000
+# Archive headers read at once while rebuilding the sidecar index.
+METADATA_READ_CONCURRENCY = 4
+# Dropbox holds a long-poll request open for up to this many seconds, plus
+# up to 90 seconds of random jitter.
+LONGPOLL_URL = "https://notify.dropboxapi.com/2/files/list_folder/longpoll"
+LONGPOLL_TIMEOUT = 480
+LONGPOLL_CLIENT_TIMEOUT = aiohttp.ClientTimeout(total=LONGPOLL_TIMEOUT + 120)
+# Deletes arriving within this many seconds of each other share one batch.
+DELETE_BATCH_DELAY = 0.5
+# Dropbox accepts at most this many entries per delete_batch call.
+DELETE_BATCH_LIMIT = 1000
+# Batch jobs are polled from this interval, doubling up to the maximum,
+# until they finish or the timeout passes.
+DELETE_POLL_INTERVAL = 0.5
+DELETE_POLL_MAX_INTERVAL = 5.0
+DELETE_POLL_TIMEOUT = 300
+
+
+class ForeignArchiveError(Exception):
+    """An archive that is not a manifest has no readable backup.json."""
+
+
+class RangeIgnoredError(Exception):
+    """The server answered a Range request with the whole file."""
 
 
 class DropboxBackupAgent(BackupAgent):
     """This module provides a BackupAgent implementation that interacts with Dropbox to list."""
 
     domain = DOMAIN
-    name = "Dropbox"
-    unique_id = "dropbox_backup"
 
-    def __init__(self, hass, entry):
+    def __init__(self, hass, entry, pool: WorkerPool | None = None):
         self.hass = hass
         self.entry = entry
-        self.folder = entry.data.get(CONF_FOLDER, "").strip("/")
+        # Each entry is a backup location of its own
+        self.unique_id = entry.data.get(CONF_AGENT_ID, entry.entry_id)
+        self.name = entry.title
+        # Blocking work runs here; without a pool it uses HA's executor
+        self.pool = pool
+        # Which files in the folder are listed as backups
+        self.folder, self._recursive, self._patterns = _listing_options(entry)
         self._dbx = None
+        # Access token the cached client was built with
+        self._dbx_token = None
+        self._token_lock = asyncio.Lock()
+        self._upload_sessions = UploadSessionStore(hass, entry.entry_id)
+        # Dropbox files in the folder by backup_id, and the cursor they are
+        # current to
+        self._files: dict = {}
+        self._list_cursor: str | None = None
+        # AgentBackup details from the sidecar index, None until it is read
+        self._metadata: dict[str, dict] | None = None
+        # Archives whose backup.json could not be read while rebuilding
+        self._unreadable: set[str] = set()
+        # The unreadable archives known not to be dedup manifests, which
+        # chunk collection can leave out
+        self._foreign: set[str] = set()
+        self._index_lock = asyncio.Lock()
+        # True while the folder watcher holds a long-poll on the current cursor
+        self._watching = False
+        # Background warm-up started with the entry
+        self._warm_up: asyncio.Task | None = None
+        # Deletes waiting for the next batch, by path, and the task sending it
+        self._pending_deletes: dict[str, list[asyncio.Future]] = {}
+        self._delete_flush: asyncio.Task | None = None
+        # Stored sizes of the chunks in the dedup chunk folder by name, None
+        # until it is listed, and the chunks each deduplicated backup uses
+        self._chunks: dict[str, int] | None = None
+        self._manifests: dict[str, set[str]] = {}
+        self._chunk_lock = asyncio.Lock()
+        # Timings and counters of every operation, for sensors and diagnostics
+        self.metrics = TransferMetrics()
+        # Upload and download caps shared by every transfer
+        self.limiter = BandwidthLimiter(entry.options)
+        # Recent uploads kept on local disk, so restoring them needs no download
+        self.cache = BackupCache(
+            *cache_location(hass, entry.entry_id),
+            entry.options.get(CONF_CACHE_BACKUPS, 0),
+            entry.options.get(CONF_CACHE_SIZE, 0) * 1024**3,
+        )
 
-    async def _get_dbx(self):
-        """Return a Dropbox client with a fresh access token."""
-        # Always refresh the token to avoid using an expired one
-        impl = await async_get_config_entry_implementation(self.hass, self.entry)
-        _LOGGER.debug("Got OAuth2 impl: %s", impl)  # ②
+    def reconfigure(self, entry, pool: WorkerPool | None) -> None:
+        """Take over the reloaded ``entry`` and its new worker pool.
 
-        # 2) Show entire config entry data
-        _LOGGER.debug("Config entry data: %s", self.entry.data)  # ③
+        The index, metrics, caches and upload sessions carry over, so the
+        reloaded entry starts warm. The index starts over only if the
+        folder or the files it lists changed.
+        """
+        self.entry = entry
+        self.name = entry.title
+        self.pool = pool
+        listing = _listing_options(entry)
+        if listing != (self.folder, self._recursive, self._patterns):
+            self.folder, self._recursive, self._patterns = listing
+            self._files = {}
+            self._list_cursor = None
+            self._metadata = None
+            self._unreadable = set()
+            self._foreign = set()
+            self._chunks = None
+            self._manifests = {}
+        self.limiter.configure(entry.options)
+        self.cache.max_backups = entry.options.get(CONF_CACHE_BACKUPS, 0)
+        self.cache.max_bytes = entry.options.get(CONF_CACHE_SIZE, 0) * 1024**3
+
+    @callback
+    def async_unload(self) -> None:
+        """Close the Dropbox client's connections when the entry unloads.
 
-        # 3) Pull token dict from entry.data
-        token_data = self.entry.data.get("token")
-        _LOGGER.debug("Token dict before refresh: %s", token_data)  # ④
+        Everything else is kept for the next setup; the client is built
+        again on the next request. The entry shuts its worker pool down, so
+        a transfer still running uses HA's executor until the next setup.
+        """
+        self.pool = None
+        if self._dbx is not None:
+            self._dbx.close()
+            self._dbx = self._dbx_token = None
 
-        if not token_data:
-            _LOGGER.error("No token_data found under entry.data['token']")  # ⑤
-            raise BackupAgentError("OAuth2 token not found in config entry")
+    async def _get_dbx(self, stale=None):
+        """Return a cached Dropbox client, refreshing the token only when needed.
 
+        Passing the client that just failed authentication as ``stale`` forces a
+        refresh, unless a concurrent caller has already replaced it.
+        """
+        if stale is None and self._dbx is not None and self._token_is_fresh():
+            return self._dbx
+
+        # Only one caller refreshes; the others wait and reuse its result
+        async with self._token_lock:
+            token_data = self.entry.data.get("token")
+            if not token_data:
+                _LOGGER.error("No token_data found under entry.data['token']")
+                raise BackupAgentError("OAuth2 token not found in config entry")
+
+            if not self._token_is_fresh() or (stale is not None and stale is self._dbx):
+                token_data = await self._async_refresh_token(token_data)
+
+            access_token = token_data.get("access_token")
+            if self._dbx is None or access_token != self._dbx_token:
+                # Lazy-import Dropbox SDK
+                import dropbox
+
+                if self._dbx is not None:
+                    # The client for the old token gives up its connections
+                    self._dbx.close()
+                # Retries are handled by _async_call, which backs off without
+                # blocking a worker thread the way the SDK's own retries do
+                self._dbx = DropboxClient(
+                    self.hass,
+                    access_token,
+                    dropbox.Dropbox(
+                        oauth2_access_token=access_token,
+                        max_retries_on_error=0,
+                        max_retries_on_rate_limit=0,
+                    ),
+                )
+                self._dbx_token = access_token
+                _LOGGER.debug("Dropbox client instantiated successfully")
+            return self._dbx
+
+    def _token_is_fresh(self) -> bool:
+        """Return True if the stored access token is not close to expiry."""
+        token_data = self.entry.data.get("token") or {}
+        expires_at = token_data.get("expires_at")
+        return (
+            bool(token_data.get("access_token"))
+            and expires_at is not None
+            and expires_at > time.time() + TOKEN_EXPIRY_MARGIN
+        )
+
+    async def _async_refresh_token(self, token_data: dict) -> dict:
+        """Refresh the OAuth2 token and persist it in the config entry."""
+        impl = await async_get_config_entry_implementation(self.hass, self.entry)
+        record = OperationRecord("token_refresh", api_calls=1)
         try:
-            # 4) Refresh token (new signature takes only token_data)
             session = await impl.async_refresh_token(token_data)
-            _LOGGER.debug(
-                "Session returned by async_refresh_token: %s", session
-            )  # ⑥
-
-            # Persist the refreshed token so future calls use the new values
-            new_data = {**self.entry.data, "token": session}
-            self.hass.config_entries.async_update_entry(self.entry, data=new_data)
         except Exception as e:
-            _LOGGER.error("async_refresh_token failed: %s", e, exc_info=True)  # ⑦
+            _LOGGER.error("async_refresh_token failed: %s", e, exc_info=True)
+            record.failed = True
             raise
+        finally:
+            record.duration = time.monotonic() - record.started
+            self.metrics.add(record)
 
-        access_token = session.get("access_token")
-        _LOGGER.debug("Using access_token: %s…", access_token[:8])  # ⑧
+        # Persist the refreshed token so future calls use the new values
+        new_data = {**self.entry.data, "token": session}
+        self.hass.config_entries.async_update_entry(self.entry, data=new_data)
+        _LOGGER.debug(
+            "Refreshed Dropbox access token, expires at %s", session.get("expires_at")
+        )
+        return session
 
-        # 5) Lazy-import Dropbox SDK
-        import dropbox
+    async def _async_run(self, func, *args):
+        """Run blocking ``func(*args)`` on the integration's worker pool."""
+        if self.pool is None:
+            return await self.hass.async_add_executor_job(func, *args)
+        return await self.pool.async_run(func, *args)
 
-        dbx = dropbox.Dropbox(oauth2_access_token=access_token)  # ⑨
-        self._dbx = dbx
-        _LOGGER.info("Dropbox client instantiated successfully")  # ⑩
-        return dbx
+    async def _async_call(self, method: str, *args, **kwargs):
+        """Call a Dropbox client method.
 
-    async def async_list_backups(self, **kwargs) -> list[AgentBackup]:
-        """List all backups in the configured Dropbox folder."""
-        # Build the Dropbox path
-        folder = self.folder.strip("/") if self.folder else ""
-        dbx_path = f"/{folder}" if folder else ""
-        all_entries = []
+        Native async methods are awaited on the event loop; SDK methods run
+        on the worker pool.
+        A rejected access token forces one token refresh and a single retry.
+        Rate limits, server errors and dropped connections retry just this
+        request with backoff, up to REQUEST_ATTEMPTS times and while the
+        operation's retry budget lasts.
+        """
+        from dropbox.exceptions import AuthError, RateLimitError
+
+        dbx = await self._get_dbx()
+        refreshed = False
+        attempt = 0
+        while True:
+            call = getattr(dbx, method)
+            count_api_call()
+            try:
+                if inspect.iscoroutinefunction(call):
+                    return await call(*args, **kwargs)
+                return await self._async_run(partial(call, *args, **kwargs))
+            except AuthError:
+                if refreshed:
+                    raise
+                refreshed = True
+                _LOGGER.debug(
+                    "Dropbox rejected the access token for %s, retrying", method
+                )
+                dbx = await self._get_dbx(stale=dbx)
+            except Exception as err:
+                if isinstance(err, RateLimitError):
+                    count_throttled()
+                attempt += 1
+                delay = retry_delay(err, attempt)
+                if delay is None or attempt >= REQUEST_ATTEMPTS or not take_retry():
+                    raise
+                _LOGGER.warning(
+                    "Dropbox %s failed (attempt %d), retrying in %.1fs: %s",
+                    method,
+                    attempt,
+                    delay,
+                    err,
+                )
+                await asyncio.sleep(delay)
+
+    def start_warm_up(self) -> None:
+        """Start warming the agent up in the background of its entry."""
+        self._warm_up = self.entry.async_create_background_task(
+            self.hass, self.async_warm_up(), f"{DOMAIN} warm-up"
+        )
 
+    async def async_warm_up(self) -> None:
+        """Get ready for the first request without holding up setup.
+
+        Imports the Dropbox SDK on a worker thread, as importing it on the
+        event loop would block it, checks or refreshes the token and lists
+        the folder. A failure is only logged; the first request tries again.
+        """
+        start_operation()
         try:
-            # Lazily get a valid Dropbox client (with a fresh token)
-            dbx = await self._get_dbx()
+            with self.metrics.operation("warm_up"):
+                await self._async_run(_import_sdk)
+                await self._get_dbx()
+                await self._async_refresh_index()
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Warming up Dropbox backups failed: %s", err)
 
-            # List the first page
-            result = await self.hass.async_add_executor_job(
-                dbx.files_list_folder, dbx_path
-            )
-            all_entries.extend(result.entries)
+    async def _async_warmed_up(self) -> bool:
+        """Wait for a warm-up in progress.
 
-            # Continue paging until done
-            while result.has_more:
-                result = await self.hass.async_add_executor_job(
-                    dbx.files_list_folder_continue, result.cursor
-                )
-                all_entries.extend(result.entries)
-
-            # Convert to HA AgentBackup objects
-            backups: list[AgentBackup] = []
-            for entry in all_entries:
-                # Lazy‐check FileMetadata
-                from dropbox.files import FileMetadata
-
-                if not isinstance(entry, FileMetadata):
-                    continue
-
-                ui_id = entry.path_lower.lstrip("/")
-                backups.append(
-                    AgentBackup(
-                        addons=[],
-                        backup_id=ui_id,
-                        date=entry.server_modified,
-                        database_included=True,
-                        extra_metadata={},
-                        folders=[],
-                        homeassistant_included=True,
-                        homeassistant_version=getattr(self.hass, "version", ""),
-                        name=entry.name,
-                        protected=False,
-                        size=entry.size,
-                    )
-                )
-            return backups
+        Returns True if there was one and it listed the folder.
+        """
+        if self._warm_up is None or self._warm_up.done():
+            return False
+        # wait() leaves the warm-up running if this caller is cancelled
+        await asyncio.wait({self._warm_up})
+        return self._list_cursor is not None
 
+    async def async_list_backups(self, **kwargs) -> list[AgentBackup]:
+        """List all backups in the configured Dropbox folder.
+
+        The first call lists the whole folder; later calls only fetch the
+        changes since the saved cursor. While the folder watcher is waiting
+        on the cursor the index is already current and no request is made,
+        and a call made during the warm-up is answered from its listing.
+        If Dropbox cannot be reached, the last listing is returned.
+        """
+        if await self._async_warmed_up() or (
+            self._watching and self._list_cursor is not None
+        ):
+            return self._indexed_backups()
+
+        start_operation()
+        try:
+            with self.metrics.operation("list"):
+                await self._async_refresh_index()
         except Exception as err:
+            if self._list_cursor is not None:
+                _LOGGER.warning(
+                    "Dropbox list_backups failed for path '%s', "
+                    "showing the last listing: %s",
+                    self._folder_path,
+                    err,
+                )
+                return self._indexed_backups()
             _LOGGER.error(
                 "Dropbox list_backups failed for path '%s': %s",
-                dbx_path,
+                self._folder_path,
                 err,
                 exc_info=True,
             )
             raise BackupAgentError from err
+        return self._indexed_backups()
+
+    def _indexed_backups(self) -> list[AgentBackup]:
+        """Return the backups in the index."""
+        return [
+            self._metadata_to_backup(file, backup_id)
+            for backup_id, file in self._files.items()
+        ]
+
+    def _recognised_backups(self) -> list[AgentBackup]:
+        """Return the indexed backups known to be Home Assistant backups.
+
+        Only files with an entry in the sidecar index count, so other files
+        in the folder are never removed by retention.
+        """
+        metadata = self._metadata or {}
+        return [
+            self._metadata_to_backup(file, backup_id)
+            for backup_id, file in self._files.items()
+            if _index_key(backup_id) in metadata and backup_id not in self._unreadable
+        ]
+
+    @property
+    def stored_bytes(self) -> int:
+        """Return the total size of the indexed backups and stored chunks."""
+        total = sum(file.size for file in self._files.values())
+        return total + sum((self._chunks or {}).values())
+
+    @property
+    def _folder_path(self) -> str:
+        """Return the Dropbox path of the backup folder."""
+        return f"/{self.folder}" if self.folder else ""
+
+    @property
+    def _index_path(self) -> str:
+        """Return the Dropbox path of the sidecar metadata index."""
+        return f"{self._folder_path}/{INDEX_FILE}"
+
+    @property
+    def _chunk_path(self) -> str:
+        """Return the Dropbox path of the dedup chunk folder."""
+        return f"{self._folder_path}/{CHUNK_FOLDER}"
+
+    async def _async_refresh_index(self) -> bool:
+        """Bring the backup index up to date with the Dropbox folder.
+
+        Returns True if backups were added, removed or changed in size.
+        """
+        from dropbox.exceptions import ApiError
+
+        async with self._index_lock:
+            before = {key: file.size for key, file in self._files.items()}
+            result = None
+            if self._list_cursor is not None:
+                try:
+                    result = await self._async_call(
+                        "files_list_folder_continue", self._list_cursor
+                    )
+                except ApiError as err:
+                    if not _is_cursor_reset(err):
+                        raise
+                    _LOGGER.info("Dropbox listing cursor expired, listing again")
+
+            loaded = False
+            if result is None:
+                if self._metadata is None:
+                    # Backups in the sidecar index are kept whatever their
+                    # name, so it is needed to filter the pages
+                    await self._async_load_metadata()
+                    loaded = True
+                # A full listing replaces the index once every page is in
+                files: dict = {}
+                result = await self._async_call(
+                    "files_list_folder",
+                    self._folder_path,
+                    recursive=self._recursive,
+                    limit=LIST_PAGE_LIMIT,
+                )
+                sidecar_changed = True
+            else:
+                files = self._files
+                sidecar_changed = False
+
+            sidecar_changed |= self._apply_entries(files, result.entries)
+            while result.has_more:
+                result = await self._async_call(
+                    "files_list_folder_continue", result.cursor
+                )
+                sidecar_changed |= self._apply_entries(files, result.entries)
+
+            self._files = files
+            self._list_cursor = result.cursor
+
+            if (sidecar_changed and not loaded) or self._metadata is None:
+                await self._async_load_metadata()
+            await self._async_rebuild_metadata()
+            return before != {key: file.size for key, file in files.items()}
+
+    async def async_watch_folder(self, on_change: Callable[[], None]) -> None:
+        """Keep the backup index current and call ``on_change`` on remote changes.
+
+        Runs until cancelled. Each long-poll request waits until something in
+        the folder changes after the index cursor, so archives added or
+        removed by another Home Assistant instance or by hand show up without
+        the backup page polling Dropbox.
+        """
+        session = async_get_clientsession(self.hass)
+        failures = 0
+        # The warm-up lists the folder, so start from its cursor
+        await self._async_warmed_up()
+        while True:
+            try:
+                if self._list_cursor is None:
+                    start_operation()
+                    with self.metrics.operation("list"):
+                        await self._async_refresh_index()
+
+                self._watching = True
+                try:
+                    changes, backoff = await self._async_longpoll(
+                        session, self._list_cursor
+                    )
+                finally:
+                    self._watching = False
+
+                if changes:
+                    start_operation()
+                    with self.metrics.operation("list"):
+                        changed = await self._async_refresh_index()
+                    if changed:
+                        _LOGGER.debug("Backups in %s changed on Dropbox", self.folder)
+                        on_change()
+                failures = 0
+                if backoff:
+                    # Dropbox asks clients to wait before polling again
+                    await asyncio.sleep(backoff)
+            except Exception as err:  # noqa: BLE001
+                failures += 1
+                delay = backoff_delay(failures)
+                _LOGGER.warning(
+                    "Watching Dropbox folder failed, retrying in %.0fs: %s", delay, err
+                )
+                await asyncio.sleep(delay)
+
+    async def _async_longpoll(self, session, cursor: str) -> tuple[bool, int | None]:
+        """Wait for changes after ``cursor`` and return (changes, backoff)."""
+        # The longpoll endpoint is authorised by the cursor, not a token
+        async with session.post(
+            LONGPOLL_URL,
+            json={"cursor": cursor, "timeout": LONGPOLL_TIMEOUT},
+            timeout=LONGPOLL_CLIENT_TIMEOUT,
+        ) as resp:
+            if resp.status == 409:
+                # The cursor was reset; refreshing lists the folder again
+                return True, None
+            resp.raise_for_status()
+            result = await resp.json(content_type=None)
+        return result["changes"], result.get("backoff")
+
+    def _apply_entries(self, files: dict, entries) -> bool:
+        """Apply listed files and deletions to ``files``.
+
+        Files that are not backups are dropped as each page arrives, so they
+        are never held. Returns True if the sidecar index itself was among
+        the changes.
+        """
+        # Lazy-import Dropbox metadata types
+        from dropbox.files import DeletedMetadata, FileMetadata
+
+        sidecar_id = self._index_path.lower().lstrip("/")
+        sidecar_changed = False
+        for entry in entries:
+            backup_id = entry.path_lower.lstrip("/")
+            if backup_id == sidecar_id:
+                sidecar_changed = True
+            elif isinstance(entry, FileMetadata):
+                if self._is_backup(backup_id, entry.name):
+                    files[backup_id] = entry
+            elif isinstance(entry, DeletedMetadata):
+                # A deleted subfolder takes the backups in it along
+                prefix = backup_id + "/"
+                gone = [key for key in files if key.startswith(prefix)]
+                for key in (backup_id, *gone):
+                    files.pop(key, None)
+                    if self._metadata is not None:
+                        self._metadata.pop(key, None)
+        return sidecar_changed
+
+    def _is_backup(self, backup_id: str, name: str) -> bool:
+        """Return True if the file ``backup_id`` is listed as a backup.
+
+        Files in the sidecar index, such as this agent's own uploads, always
+        are; others must match the file name patterns.
+        """
+        if backup_id.startswith(self._chunk_path.lower().lstrip("/") + "/"):
+            return False
+        return _index_key(backup_id) in (self._metadata or {}) or _matches(
+            name, self._patterns
+        )
+
+    async def _async_load_metadata(self) -> None:
+        """Read the sidecar index of AgentBackup details.
+
+        A missing or corrupt index is treated as empty, so it is rebuilt
+        from the archives; any other failure leaves the current state alone.
+        """
+        from dropbox.exceptions import ApiError
+
+        try:
+            _file, response = await self._async_call("files_download", self._index_path)
+            data = await self._async_read_body(response)
+            self._metadata = load_index(data)
+        except ApiError as err:
+            if not _is_not_found(err):
+                _LOGGER.warning("Could not read %s: %s", self._index_path, err)
+                return
+            _LOGGER.debug("No %s yet, rebuilding it", self._index_path)
+            self._metadata = {}
+        except ValueError as err:
+            _LOGGER.warning("Ignoring corrupt %s: %s", self._index_path, err)
+            self._metadata = {}
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Could not read %s: %s", self._index_path, err)
+
+    async def _async_rebuild_metadata(self) -> None:
+        """Read backup.json from archives missing from the sidecar index.
+
+        The sidecar is written once, after every header has been read.
+        """
+        if self._metadata is None:
+            return
+        missing = [
+            backup_id
+            for backup_id in self._files
+            if backup_id not in self._metadata and backup_id not in self._unreadable
+        ]
+        if not missing:
+            return
+
+        _LOGGER.info("Reading metadata of %d backups from Dropbox", len(missing))
+        # Each header is a round trip, so a few are read at once
+        semaphore = asyncio.Semaphore(METADATA_READ_CONCURRENCY)
+
+        async def _read(backup_id: str) -> None:
+            async with semaphore:
+                try:
+                    _file, response = await self._async_call(
+                        "files_download", f"/{backup_id}"
+                    )
+                    stored = await self._async_read_archive(response)
+                except Exception as err:  # noqa: BLE001
+                    _LOGGER.warning("Could not read metadata of %s: %s", backup_id, err)
+                    self._unreadable.add(backup_id)
+                    if isinstance(err, ForeignArchiveError):
+                        self._foreign.add(backup_id)
+                    return
+            self._metadata[backup_id] = stored
+
+        await asyncio.gather(*(_read(backup_id) for backup_id in missing))
+
+        if any(backup_id in self._metadata for backup_id in missing):
+            try:
+                await self._async_save_metadata()
+            except Exception as err:  # noqa: BLE001
+                _LOGGER.warning("Could not write %s: %s", self._index_path, err)
+
+    async def _async_read_body(self, response) -> bytes:
+        """Read a whole downloaded body, then release the connection."""
+        if isinstance(response, DownloadResponse):
+            try:
+                return await response.read()
+            finally:
+                response.close()
+        return await self._async_run(_read_and_close, response)
+
+    async def _async_read_archive(self, response) -> dict:
+        """Read backup.json from a downloading archive, then drop the download.
+
+        Raises ForeignArchiveError if a file that is not a manifest has no
+        readable backup.json.
+        """
+        try:
+            # tarfile reads synchronously, so it gets the archive header from
+            # memory rather than from the socket
+            if isinstance(response, DownloadResponse):
+                head = await response.read(ARCHIVE_HEADER_LIMIT)
+            else:
+                head = await self._async_run(response.raw.read, ARCHIVE_HEADER_LIMIT)
+            if is_manifest(head):
+                # A deduplicated backup's manifest holds its details
+                manifest = await self._async_run(load_manifest, head)
+                return {**manifest["backup"], "dedup": {"size": manifest["size"]}}
+            try:
+                # A compressed archive is decompressed as far as its header
+                tar_head = await self._async_run(
+                    decompress_head, head, ARCHIVE_HEADER_LIMIT
+                )
+                stored = await self._async_run(
+                    read_archive_metadata, io.BytesIO(tar_head)
+                )
+            except Exception as err:
+                raise ForeignArchiveError(err) from err
+            if (codec := detect_codec(head)) is not None:
+                # Restores decompress it; the size of the backup is unknown
+                stored["compression"] = {"codec": codec}
+            return stored
+        finally:
+            if isinstance(response, DownloadResponse):
+                response.close()
+            else:
+                await self._async_run(response.close)
+
+    async def _async_save_metadata(self) -> None:
+        """Write the sidecar index back to Dropbox."""
+        from dropbox.files import WriteMode
+
+        if self._list_cursor is not None:
+            # Drop archives that are no longer in the folder
+            self._metadata = {
+                backup_id: stored
+                for backup_id, stored in self._metadata.items()
+                if backup_id in self._files
+            }
+        await self._async_call(
+            "files_upload",
+            dump_index(self._metadata),
+            self._index_path,
+            mode=WriteMode.overwrite,
+        )
+
+    async def _async_update_metadata(
+        self,
+        changes: dict[str, AgentBackup | None],
+        storage: dict | None = None,
+    ) -> None:
+        """Record each backup in ``changes`` under its id in the sidecar index.
+
+        A None value drops the entry. ``storage`` is added to the entries and
+        describes how the given backups were stored. Failures are logged and
+        left for the next rebuild to repair, as the archives themselves are
+        already in place.
+        """
+        if self._metadata is None and all(b is None for b in changes.values()):
+            # Entries for deleted archives are pruned the next time it is saved
+            return
+        try:
+            async with self._index_lock:
+                if self._metadata is None:
+                    await self._async_load_metadata()
+                if self._metadata is None:
+                    return
+                changed = False
+                for backup_id, backup in changes.items():
+                    if backup is not None:
+                        self._metadata[backup_id] = _index_entry(backup, storage)
+                        changed = True
+                    elif self._metadata.pop(backup_id, None) is not None:
+                        changed = True
+                if changed:
+                    await self._async_save_metadata()
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Could not update %s: %s", self._index_path, err)
+
+    def _metadata_to_backup(self, metadata, backup_id: str) -> AgentBackup:
+        """Build the AgentBackup for a Dropbox file.
+
+        Details come from the sidecar index when it has them; otherwise
+        only what the file listing shows is known.
+        """
+        stored = (self._metadata or {}).get(_index_key(backup_id))
+        if stored is not None:
+            size = metadata.size
+            # Listings show the size of the backup, not of what is stored
+            for storage in ("compression", "dedup"):
+                if storage in stored:
+                    size = stored[storage].get("size", size)
+            try:
+                return AgentBackup.from_dict(
+                    {**stored, "backup_id": backup_id, "size": size}
+                )
+            except (KeyError, TypeError, ValueError) as err:
+                _LOGGER.debug("Ignoring bad index entry for %s: %s", backup_id, err)
+        return AgentBackup(
+            addons=[],
+            backup_id=backup_id,
+            date=metadata.server_modified,
+            database_included=True,
+            extra_metadata={},
+            folders=[],
+            homeassistant_included=True,
+            homeassistant_version=getattr(self.hass, "version", ""),
+            name=metadata.name,
+            protected=False,
+            size=metadata.size,
+        )
 
     async def async_upload_backup(self, *, open_stream, backup, **kwargs) -> None:
         """Upload a snapshot using the most efficient Dropbox API."""
         decoded = urllib.parse.unquote(backup.backup_id)
         path = f"/{decoded}"
         _LOGGER.debug("Uploading backup to %s", path)
+        start_operation()
+
+        writer = None
+        if self.cache.enabled:
+            # The backup is written to the local cache as it streams past
+            writer = self.cache.writer()
+            open_original = open_stream
 
+            async def open_stream():
+                await self._async_run(writer.restart)
+                return self._tee(await open_original(), writer)
+
+        options = self.entry.options
+        codec = options.get(CONF_COMPRESSION, DEFAULT_COMPRESSION)
+        level = options.get(CONF_COMPRESSION_LEVEL, DEFAULT_COMPRESSION_LEVEL)
+        deduplicate = options.get(CONF_DEDUPLICATE, DEFAULT_DEDUPLICATE)
+        compression = None
+        if codec != CODEC_NONE and not deduplicate:
+            # The codec, level and size of the backup itself are kept in the
+            # sidecar index, so listings show the real size
+            compression = {"codec": codec, "level": level, "size": backup.size}
+            open_backup = open_stream
+
+            async def open_stream():
+                return compress_stream(
+                    await open_backup(), codec, level, self._async_run
+                )
+
+        with self.metrics.operation("upload") as record:
+            try:
+                if deduplicate:
+                    # Chunks are compressed one by one, so they stay shareable
+                    metadata, size, record.bytes = await self._async_upload_chunks(
+                        path, backup, await open_stream(), codec, level
+                    )
+                    storage = {"dedup": {"size": size}}
+                else:
+                    storage = {"compression": compression} if compression else None
+                    # An identical archive already in the folder is not sent again
+                    metadata = await self._async_find_duplicate(
+                        path, backup.size, open_stream, compression
+                    )
+                    if metadata is None:
+                        metadata = await self._async_upload_stream(
+                            path, backup, await open_stream(), compression
+                        )
+                        record.bytes = metadata.size
+
+            except BackupAgentError:
+                await self._async_discard(writer)
+                raise
+
+            except Exception as err:
+                await self._async_discard(writer)
+                _LOGGER.error(
+                    "Chunked upload failed for %s: %s", path, err, exc_info=True
+                )
+                raise BackupAgentError from err
+
+            # Index the new archive and keep its details in the sidecar index
+            backup_id = metadata.path_lower.lstrip("/")
+            self._files[backup_id] = metadata
+            await self._async_update_metadata({backup_id: backup}, storage)
+            if not self._is_backup(backup_id, metadata.name):
+                # Without its index entry the next listing would drop it too
+                self._files.pop(backup_id)
+        if writer is not None:
+            await self._async_cache_upload(backup_id, backup, writer, metadata)
+        await self._async_apply_retention()
+
+    async def _tee(self, stream, writer: CacheWriter):
+        """Pass ``stream`` through, writing it to the cache on the way."""
+        async for data in stream:
+            await self._async_run(writer.write, data)
+            yield data
+
+    async def _async_cache_upload(
+        self, backup_id: str, backup, writer: CacheWriter, metadata
+    ) -> None:
+        """Keep an uploaded backup in the local cache.
+
+        The cache is only a shortcut for restores, so failures are logged.
+        """
+        if writer.size != backup.size:
+            # The stream was not read to the end, as for a duplicate
+            await self._async_discard(writer)
+            return
         try:
-            dbx = await self._get_dbx()
+            await self._async_run(
+                self.cache.add,
+                backup_id,
+                writer,
+                metadata.content_hash,
+                metadata.server_modified.isoformat(),
+            )
+        except OSError as err:
+            _LOGGER.warning("Could not cache %s locally: %s", backup_id, err)
+            await self._async_discard(writer)
 
-            stream = await open_stream()
+    async def _async_discard(self, writer: CacheWriter | None) -> None:
+        """Delete a cache file that will not be kept."""
+        if writer is not None:
+            await self._async_run(writer.discard)
 
-            # For small files we can upload in a single request
-            if backup.size <= SIMPLE_UPLOAD_LIMIT:
-                data = bytearray()
-                async for chunk in stream:
-                    data.extend(chunk)
+    async def _async_apply_retention(self) -> None:
+        """Delete the backups the configured retention rules no longer keep.
 
-                await self.hass.async_add_executor_job(
-                    dbx.files_upload,
-                    bytes(data),
-                    path,
+        Works from the cached listing and removes everything expired in one
+        batch. Failures are logged; the next upload tries again.
+        """
+        options = self.entry.options
+        rules = {
+            "keep_last": options.get(CONF_KEEP_LAST, 0),
+            "keep_daily": options.get(CONF_KEEP_DAILY, 0),
+            "keep_weekly": options.get(CONF_KEEP_WEEKLY, 0),
+            "keep_monthly": options.get(CONF_KEEP_MONTHLY, 0),
+            "max_total_bytes": options.get(CONF_MAX_TOTAL_SIZE, 0) * 1024**3,
+        }
+        if not any(rules.values()):
+            return
+        try:
+            if self._list_cursor is None:
+                await self._async_refresh_index()
+            expired = expired_backups(self._recognised_backups(), **rules)
+            if not expired:
+                return
+            _LOGGER.info("Retention is removing %d backups from Dropbox", len(expired))
+            errors = await self._async_delete_batch([f"/{key}" for key in expired])
+            deleted = [key for key, error in zip(expired, errors) if error is None]
+            for key, error in zip(expired, errors):
+                if error is not None:
+                    _LOGGER.warning("Retention could not delete %s: %s", key, error)
+            await self._async_forget(deleted)
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Applying retention rules failed: %s", err)
+
+    async def _async_find_duplicate(
+        self, path: str, size: int, open_stream, compression: dict | None = None
+    ):
+        """Return the metadata of ``path`` if this archive is already indexed.
+
+        Only files of the same size, stored with the same ``compression``,
+        are candidates, so the local backup is hashed only when one exists.
+        A match stored under another name is copied to ``path`` on the server
+        instead of being uploaded.
+        """
+        # A compressed archive's size is compared through its index entry
+        candidates = [
+            file
+            for backup_id, file in self._files.items()
+            if file.content_hash
+            and "dedup" not in self._stored(backup_id)
+            and self._stored(backup_id).get("compression") == compression
+            and (compression is not None or file.size == size)
+        ]
+        if not candidates:
+            return None
+
+        hasher = ContentHasher()
+        async for chunk in await open_stream():
+            await self._async_run(hasher.update, chunk)
+        content_hash = hasher.hexdigest()
+
+        for file in candidates:
+            if file.content_hash != content_hash:
+                continue
+            if file.path_lower == path.lower():
+                _LOGGER.info("%s is already in Dropbox, skipping the upload", path)
+                return file
+            _LOGGER.info("%s matches %s, copying it on Dropbox", path, file.path_lower)
+            result = await self._async_call("files_copy_v2", file.path_lower, path)
+            return result.metadata
+        return None
+
+    def _stored(self, backup_id: str) -> dict:
+        """Return the sidecar index entry of a backup, empty if it has none."""
+        return (self._metadata or {}).get(backup_id) or {}
+
+    async def _async_upload_chunks(
+        self, path: str, backup, stream, codec: str, level: int
+    ):
+        """Upload the chunks of ``stream`` missing from the chunk folder.
+
+        Returns the metadata of the manifest then written to ``path``, the
+        size of the backup and the number of bytes sent. Chunks are named by
+        their SHA-256, so any chunk already stored, by an earlier backup or
+        an interrupted upload, is not sent again. New chunks are uploaded by
+        up to the configured number of parallel requests.
+        """
+        from dropbox.files import WriteMode
+
+        concurrency = self.entry.options.get(
+            CONF_UPLOAD_CONCURRENCY, DEFAULT_UPLOAD_CONCURRENCY
+        )
+        slots = asyncio.Semaphore(concurrency)
+        uploads: list[asyncio.Task] = []
+        chunker = ContentChunker()
+        entries: list[tuple[str, int]] = []
+        queued: set[str] = set()
+        sent = 0
+
+        async def _put(name: str, data: bytes) -> None:
+            nonlocal sent
+            try:
+                if codec != CODEC_NONE:
+                    packed = await self._async_run(compress_bytes, data, codec, level)
+                    # Chunks of already compressed data are stored as they are
+                    if len(packed) < len(data):
+                        data = packed
+                await self.limiter.upload.async_consume(len(data))
+                await self._async_call(
+                    "files_upload",
+                    data,
+                    f"{self._chunk_path}/{name}",
+                    mode=WriteMode.overwrite,
                 )
-                _LOGGER.info("Uploaded %s in one request (%d bytes)", path, backup.size)
+                chunks[name] = len(data)
+                sent += len(data)
+            finally:
+                slots.release()
+
+        async def _add(data: bytes) -> None:
+            name = await self._async_run(chunk_id, data)
+            entries.append((name, len(data)))
+            if name in chunks or name in queued:
                 return
+            queued.add(name)
+            await slots.acquire()
+            # Surface a failed upload before queueing more work
+            for task in [task for task in uploads if task.done()]:
+                uploads.remove(task)
+                task.result()
+            uploads.append(asyncio.create_task(_put(name, data)))
+
+        # Chunks are only collected while no upload is adding to them
+        async with self._chunk_lock:
+            chunks = await self._async_load_chunks()
+            try:
+                async for data in stream:
+                    for chunk in await self._async_run(chunker.feed, data):
+                        await _add(chunk)
+                if (chunk := chunker.flush()) is not None:
+                    await _add(chunk)
+                await asyncio.gather(*uploads)
+            finally:
+                for task in uploads:
+                    task.cancel()
+            if not entries:
+                _LOGGER.error(
+                    "No data received from open_stream for upload of %s", path
+                )
+                raise BackupAgentError("Empty upload stream")
+
+            manifest = dump_manifest(_index_entry(backup), entries)
+            metadata = await self._async_call("files_upload", manifest, path)
+            sent += len(manifest)
+            self._manifests[metadata.path_lower.lstrip("/")] = {
+                name for name, _size in entries
+            }
+
+        size = sum(size for _name, size in entries)
+        _LOGGER.info(
+            "Uploaded %s as %d chunks, %d of them new (%d of %d bytes sent)",
+            path,
+            len(entries),
+            len(queued),
+            sent,
+            size,
+        )
+        return metadata, size, sent
+
+    async def _async_load_chunks(self) -> dict[str, int]:
+        """Return the chunks in the chunk folder, listing it the first time."""
+        if self._chunks is None:
+            await self._async_list_chunks()
+        return self._chunks
 
-            # Otherwise use an upload session
-            first_chunk = await stream.__anext__()
-            session_start = await self.hass.async_add_executor_job(
-                dbx.files_upload_session_start,
-                first_chunk,
+    async def _async_list_chunks(self) -> dict:
+        """List the chunk folder and return its files by name.
+
+        The stored chunk sizes are replaced with what the listing shows.
+        """
+        from dropbox.exceptions import ApiError
+        from dropbox.files import FileMetadata
+
+        chunks = {}
+        try:
+            result = await self._async_call("files_list_folder", self._chunk_path)
+            while True:
+                chunks.update(
+                    (entry.name, entry)
+                    for entry in result.entries
+                    if isinstance(entry, FileMetadata)
+                )
+                if not result.has_more:
+                    break
+                result = await self._async_call(
+                    "files_list_folder_continue", result.cursor
+                )
+        except ApiError as err:
+            if not _is_not_found(err):
+                raise
+        self._chunks = {name: entry.size for name, entry in chunks.items()}
+        return chunks
+
+    async def _async_upload_stream(
+        self, path: str, backup, stream, compression: dict | None = None
+    ):
+        """Upload ``stream`` using the most efficient Dropbox API.
+
+        Returns the metadata of the committed file. The content hash is
+        computed as the data streams past and checked against the one Dropbox
+        reports for the committed file.
+        """
+        hasher = ContentHasher()
+
+        # Backups that fit in one chunk are uploaded in a single request
+        if backup.size <= SIMPLE_UPLOAD_LIMIT:
+            data = b"".join([chunk async for chunk in stream])
+            await self._async_run(hasher.update, data)
+            await self.limiter.upload.async_consume(len(data))
+            metadata = await self._async_call("files_upload", data, path)
+            _LOGGER.info("Uploaded %s in one request (%d bytes)", path, backup.size)
+        else:
+            # Otherwise use an upload session, appending chunks in parallel
+            # when more than one concurrent request is allowed
+            options = self.entry.options
+            concurrency = options.get(
+                CONF_UPLOAD_CONCURRENCY, DEFAULT_UPLOAD_CONCURRENCY
             )
-            session_id = session_start.session_id
-            offset = len(first_chunk)
-
-            from dropbox.files import UploadSessionCursor, CommitInfo
-
-            buffer = bytearray()
-            async for chunk in stream:
-                buffer.extend(chunk)
-                if len(buffer) >= CHUNK_SIZE:
-                    cursor = UploadSessionCursor(session_id, offset)
-                    await self.hass.async_add_executor_job(
-                        dbx.files_upload_session_append_v2,
-                        bytes(buffer),
-                        cursor,
+            mib = 1024 * 1024
+            sizer = ChunkSizer(
+                CHUNK_SIZE,
+                options.get(CONF_MIN_CHUNK_SIZE, DEFAULT_MIN_CHUNK_SIZE) * mib,
+                options.get(CONF_MAX_CHUNK_SIZE, DEFAULT_MAX_CHUNK_SIZE) * mib,
+            )
+            if concurrency > 1:
+                metadata = await self._upload_concurrent_session(
+                    path, stream, concurrency, hasher, sizer
+                )
+            else:
+                fingerprint = f"{backup.backup_id}:{backup.size}"
+                if compression is not None:
+                    # A resumed session must continue the same compressed bytes
+                    fingerprint += f":{compression['codec']}{compression['level']}"
+                metadata = await self._upload_session(
+                    path, stream, fingerprint, hasher, sizer
+                )
+            _LOGGER.info(
+                "Completed chunked upload for %s (%d bytes, %.1f MiB/s, "
+                "last chunks %d MiB)",
+                path,
+                backup.size,
+                (sizer.rate or 0) / mib,
+                sizer.chunk_size // mib,
+            )
+
+        if metadata.content_hash and metadata.content_hash != hasher.hexdigest():
+            _LOGGER.error("%s does not match the data sent, deleting it", path)
+            try:
+                await self._async_call("files_delete_v2", path)
+            except Exception as err:  # noqa: BLE001
+                _LOGGER.warning("Could not delete corrupt upload %s: %s", path, err)
+            raise BackupAgentError(f"Upload of {path} failed its content hash check")
+        return metadata
+
+    async def _upload_session(
+        self,
+        path: str,
+        stream,
+        fingerprint: str,
+        hasher: ContentHasher,
+        sizer: ChunkSizer,
+    ):
+        """Upload ``stream`` through an upload session.
+
+        Returns the metadata of the committed file.
+
+        A reader task cuts the stream into pieces sized by ``sizer`` and queues
+        up to UPLOAD_QUEUE_DEPTH of them while the previous chunk is being sent, so
+        reading the archive overlaps with the network appends.
+
+        The session id is saved when the session opens and the acknowledged
+        offset, with a short delay, after every chunk. A later attempt for
+        the same backup skips what Dropbox already has and continues the
+        saved session.
+        """
+        from dropbox.files import CommitInfo, UploadSessionCursor
+
+        session_id, offset = await self._resume_session(path, fingerprint)
+        queue: asyncio.Queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_DEPTH)
+        reader = asyncio.create_task(
+            self._read_chunks(stream, queue, hasher, sizer, skip=offset)
+        )
+        try:
+            if session_id is None:
+                chunk = await self._next_chunk(queue)
+                if chunk is None:
+                    _LOGGER.error(
+                        "No data received from open_stream for upload of %s", path
                     )
-                    offset += len(buffer)
-                    buffer.clear()
+                    raise BackupAgentError("Empty upload stream")
+
+                session_start = await self._async_measured(
+                    sizer,
+                    path,
+                    len(chunk),
+                    self._async_call("files_upload_session_start", chunk),
+                )
+                session_id = session_start.session_id
+                offset = len(chunk)
+                session = {
+                    "session_id": session_id,
+                    "offset": offset,
+                    "fingerprint": fingerprint,
+                    "started": time.time(),
+                }
+                await self._upload_sessions.async_set(path, session)
+            else:
+                session = await self._upload_sessions.async_get(path)
 
+            while (chunk := await self._next_chunk(queue)) is not None:
+                offset = await self._async_measured(
+                    sizer,
+                    path,
+                    len(chunk),
+                    self._append_chunk(session_id, offset, chunk),
+                )
+                session["offset"] = offset
+                await self._upload_sessions.async_update(path, session)
+
+            # Every chunk has been appended, so the session closes with no data
             cursor = UploadSessionCursor(session_id, offset)
             commit = CommitInfo(path)
-            await self.hass.async_add_executor_job(
-                dbx.files_upload_session_finish,
-                bytes(buffer),
-                cursor,
-                commit,
+            metadata = await self._async_call(
+                "files_upload_session_finish", b"", cursor, commit
             )
-            offset += len(buffer)
+            await self._upload_sessions.async_remove(path)
+            return metadata
+        finally:
+            reader.cancel()
 
-            _LOGGER.info("Completed chunked upload for %s (%d bytes)", path, offset)
+    async def _resume_session(self, path: str, fingerprint: str):
+        """Return the saved session id and Dropbox's offset for ``path``.
 
-        except StopAsyncIteration:
-            _LOGGER.error("No data received from open_stream for upload of %s", path)
-            raise BackupAgentError("Empty upload stream") from None
+        Returns ``(None, 0)`` when there is nothing usable to resume.
+        """
+        session = await self._upload_sessions.async_get(path)
+        if session is None:
+            return None, 0
+        if (
+            session["fingerprint"] != fingerprint
+            or time.time() - session["started"] > UPLOAD_SESSION_MAX_AGE
+        ):
+            await self._upload_sessions.async_remove(path)
+            return None, 0
 
-        except Exception as err:
-            _LOGGER.error("Chunked upload failed for %s: %s", path, err, exc_info=True)
-            raise BackupAgentError from err
+        from dropbox.files import UploadSessionCursor
+
+        # A zero-byte append confirms the session is open and where it ends
+        session_id = session["session_id"]
+        offset = session["offset"]
+        try:
+            await self._async_call(
+                "files_upload_session_append_v2",
+                b"",
+                UploadSessionCursor(session_id, offset),
+            )
+        except Exception as err:  # noqa: BLE001
+            if (offset := _correct_offset(err)) is None:
+                _LOGGER.info("Cannot resume upload of %s, starting over: %s", path, err)
+                await self._upload_sessions.async_remove(path)
+                return None, 0
+
+        _LOGGER.info("Resuming upload of %s at byte %d", path, offset)
+        return session_id, offset
+
+    async def _append_chunk(self, session_id: str, offset: int, chunk: bytes) -> int:
+        """Append ``chunk`` at ``offset`` and return the new offset.
+
+        If Dropbox reports a different offset inside this chunk, for example
+        because an earlier append landed but its response was lost, the chunk
+        is trimmed to match the server and sent again.
+        """
+        from dropbox.files import UploadSessionCursor
+
+        while chunk:
+            cursor = UploadSessionCursor(session_id, offset)
+            try:
+                await self._async_call("files_upload_session_append_v2", chunk, cursor)
+            except Exception as err:
+                correct = _correct_offset(err)
+                if correct is None or not offset < correct <= offset + len(chunk):
+                    raise
+                _LOGGER.warning(
+                    "Dropbox session is at byte %d, not %d; resyncing",
+                    correct,
+                    offset,
+                )
+                chunk = chunk[correct - offset :]
+                offset = correct
+            else:
+                return offset + len(chunk)
+        return offset
+
+    async def _upload_concurrent_session(
+        self,
+        path: str,
+        stream,
+        concurrency: int,
+        hasher: ContentHasher,
+        sizer: ChunkSizer,
+    ):
+        """Upload ``stream`` through a concurrent upload session.
+
+        Chunks are appended at their known offsets by up to ``concurrency``
+        parallel requests. Dropbox requires every chunk but the last to be a
+        multiple of 4 MiB, which ``sizer`` guarantees, and the last one to close
+        the session, so one chunk is held back until the end of the stream is
+        seen.
+        Returns the metadata of the committed file.
+        """
+        from dropbox.files import CommitInfo, UploadSessionCursor, UploadSessionType
+
+        queue: asyncio.Queue = asyncio.Queue(maxsize=UPLOAD_QUEUE_DEPTH)
+        reader = asyncio.create_task(self._read_chunks(stream, queue, hasher, sizer))
+        slots = asyncio.Semaphore(concurrency)
+        appends: list[asyncio.Task] = []
+
+        async def _append(chunk: bytes, cursor, close: bool = False) -> None:
+            try:
+                await self._async_measured(
+                    sizer,
+                    path,
+                    len(chunk),
+                    self._async_call(
+                        "files_upload_session_append_v2", chunk, cursor, close
+                    ),
+                )
+            finally:
+                slots.release()
+
+        try:
+            held = await self._next_chunk(queue)
+            if held is None:
+                _LOGGER.error(
+                    "No data received from open_stream for upload of %s", path
+                )
+                raise BackupAgentError("Empty upload stream")
+
+            # Concurrent sessions only accept data through append calls
+            session_start = await self._async_call(
+                "files_upload_session_start",
+                b"",
+                session_type=UploadSessionType.concurrent,
+            )
+            session_id = session_start.session_id
+            offset = 0
+
+            while (chunk := await self._next_chunk(queue)) is not None:
+                await slots.acquire()
+                # Surface a failed append before queueing more work
+                for task in [task for task in appends if task.done()]:
+                    appends.remove(task)
+                    task.result()
+                cursor = UploadSessionCursor(session_id, offset)
+                appends.append(asyncio.create_task(_append(held, cursor)))
+                offset += len(held)
+                held = chunk
+
+            await asyncio.gather(*appends)
+            appends.clear()
+
+            await slots.acquire()
+            cursor = UploadSessionCursor(session_id, offset)
+            await _append(held, cursor, close=True)
+            offset += len(held)
+
+            cursor = UploadSessionCursor(session_id, offset)
+            commit = CommitInfo(path)
+            metadata = await self._async_call(
+                "files_upload_session_finish", b"", cursor, commit
+            )
+            _LOGGER.debug(
+                "Concurrent session for %s used %d parallel appends", path, concurrency
+            )
+            return metadata
+        finally:
+            reader.cancel()
+            for task in appends:
+                task.cancel()
+
+    async def _async_measured(self, sizer: ChunkSizer, path: str, size: int, request):
+        """Await the request sending a chunk and feed its throughput to ``sizer``.
+
+        A request that needed a retry counts as a failure and shrinks the
+        chunks that follow. Time spent waiting for the upload limit counts
+        as sending time, so chunks stay sized to the limited rate.
+        """
+        spent = retries_spent()
+        record = OperationRecord("upload_chunk", bytes=size)
+        try:
+            await self.limiter.upload.async_consume(size)
+            result = await request
+        except BaseException:
+            record.failed = True
+            raise
+        finally:
+            record.duration = time.monotonic() - record.started
+            record.retries = retries_spent() - spent
+            record.api_calls = 1 + record.retries
+            self.metrics.add(record)
+        previous = sizer.chunk_size
+        sizer.record(size, record.duration, record.retries > 0)
+        if sizer.chunk_size != previous:
+            _LOGGER.debug(
+                "Upload chunk size for %s changed from %d to %d MiB at %.1f MiB/s",
+                path,
+                previous // (1024 * 1024),
+                sizer.chunk_size // (1024 * 1024),
+                (sizer.rate or 0) / (1024 * 1024),
+            )
+        return result
+
+    async def _read_chunks(
+        self,
+        stream,
+        queue: asyncio.Queue,
+        hasher: ContentHasher,
+        sizer: ChunkSizer,
+        skip: int = 0,
+    ) -> None:
+        """Queue ``stream`` as pieces sized by ``sizer``, followed by None.
+
+        The first ``skip`` bytes are dropped. Every byte read, skipped or not,
+        is fed to ``hasher`` in order. An error raised by the stream is queued
+        in place of the end marker.
+        """
+        # Collect zero-copy views of the incoming data and join them once per
+        # chunk; the SDK only accepts bytes, so that join is the single copy
+        parts: list[memoryview] = []
+        size = 0
+        try:
+            async for data in stream:
+                view = memoryview(data)
+                if skip:
+                    dropped = min(skip, len(view))
+                    await self._async_run(hasher.update, view[:dropped])
+                    view = view[dropped:]
+                    skip -= dropped
+                while size + len(view) >= sizer.chunk_size:
+                    take = sizer.chunk_size - size
+                    parts.append(view[:take])
+                    chunk = b"".join(parts)
+                    await self._async_run(hasher.update, chunk)
+                    await queue.put(chunk)
+                    parts.clear()
+                    size = 0
+                    view = view[take:]
+                if view:
+                    parts.append(view)
+                    size += len(view)
+            if parts:
+                chunk = b"".join(parts)
+                await self._async_run(hasher.update, chunk)
+                await queue.put(chunk)
+        except Exception as err:  # noqa: BLE001
+            await queue.put(err)
+        else:
+            await queue.put(None)
+
+    @staticmethod
+    async def _next_chunk(queue: asyncio.Queue):
+        """Return the next queued chunk, re-raising a reader error."""
+        chunk = await queue.get()
+        if isinstance(chunk, Exception):
+            raise chunk
+        return chunk
 
     async def async_download_backup(self, backup_id: str, **kwargs):
         """
@@ -213,60 +1530,589 @@ class DropboxBackupAgent(BackupAgent):
         path = f"/{decoded}"
         _LOGGER.debug("Starting Dropbox download for %s", path)
 
+        concurrency = self.entry.options.get(
+            CONF_DOWNLOAD_CONCURRENCY, DEFAULT_DOWNLOAD_CONCURRENCY
+        )
+        start_operation()
+        record = self.metrics.start("download")
+        key = _index_key(backup_id)
+        # Only requests made here count against the download. The stream is
+        # read later, perhaps by another task, and finishes the record when
+        # it ends.
+        with self.metrics.counting(record):
+            if self.cache.enabled and (cached := await self._async_cached(key)):
+                _LOGGER.info("Restoring %s from the local cache", path)
+                return self._stream_cached(key, cached, record)
+            deduplicated = "dedup" in self._stored(key)
+            try:
+                if deduplicated:
+                    # The manifest lists the chunks to fetch
+                    _file, response = await self._async_call("files_download", path)
+                    manifest = load_manifest(await self._async_read_body(response))
+                elif concurrency > 1:
+                    # A temporary link supports Range requests and reports the size
+                    link = await self._async_call("files_get_temporary_link", path)
+                else:
+                    # Both clients return before the body is read; it is
+                    # streamed below
+                    metadata, response = await self._async_call("files_download", path)
+            except Exception as err:
+                _LOGGER.error(
+                    "Dropbox download failed for %s: %s", path, err, exc_info=True
+                )
+                self.metrics.finish(record, failed=True)
+                raise BackupAgentError from err
+
+        if deduplicated:
+            return self._stream_chunks(path, manifest, concurrency, record)
+        if concurrency > 1:
+            metadata = link.metadata
+            chunks = self._stream_ranges(path, link.link, metadata.size, concurrency)
+        elif isinstance(response, DownloadResponse):
+            chunks = self._stream_body(response, path)
+        else:
+            chunks = self._stream_response(response, path)
+        verified = self._verify_download(chunks, metadata.content_hash, path, record)
+        # Archives uploaded with compression are restored decompressed
+        codec = self._stored(key).get("compression", {}).get("codec")
+        return decompress_stream(
+            self._expand_manifest(verified, path, concurrency), codec, self._async_run
+        )
+
+    async def _expand_manifest(self, chunks, path: str, concurrency: int):
+        """Yield ``chunks``, or the backup they list if they are a manifest.
+
+        Deduplicated backups are known from the sidecar index, which may be
+        missing or unreadable, so a manifest is also recognised by its first
+        bytes, the way compression is.
+        """
+        try:
+            first = await anext(chunks, b"")
+            if not is_manifest(first):
+                if first:
+                    yield first
+                async for chunk in chunks:
+                    yield chunk
+                return
+            data = first + b"".join([chunk async for chunk in chunks])
+        finally:
+            await chunks.aclose()
+        _LOGGER.debug("%s is a deduplicated backup", path)
+        manifest = await self._async_run(load_manifest, data)
+        async for chunk in self._stream_chunks(path, manifest, concurrency):
+            yield chunk
+
+    async def _async_cached(self, key: str) -> dict | None:
+        """Return the cache entry of a backup if it matches the file on Dropbox."""
         try:
-            dbx = await self._get_dbx()
-            # Download the full content in a thread
-            metadata, response = await self.hass.async_add_executor_job(
-                dbx.files_download, path
+            file = await self._async_call("files_get_metadata", f"/{key}")
+            return await self._async_run(
+                self.cache.lookup,
+                key,
+                file.content_hash,
+                file.server_modified.isoformat(),
             )
-            content = response.content
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.debug("Not restoring %s from the local cache: %s", key, err)
+            return None
+
+    async def _stream_cached(self, key: str, entry: dict, record: OperationRecord):
+        """Yield a cached backup from local disk, checking it as it is read.
+
+        A copy that fails the check is dropped from the cache.
+        """
+        hasher = ContentHasher()
+        failed = True
+        file = await self._async_run(open, entry["path"], "rb")
+        try:
+            while data := await self._async_run(file.read, CACHE_READ_SIZE):
+                await self._async_run(hasher.update, data)
+                record.bytes += len(data)
+                yield data
+            if hasher.hexdigest() != entry["local_hash"]:
+                _LOGGER.error("The cached copy of %s is corrupt, dropping it", key)
+                await self._async_run(self.cache.remove, key)
+                raise BackupAgentError(f"Cached copy of {key} failed its hash check")
+            failed = False
+        finally:
+            await self._async_run(file.close)
+            self.metrics.finish(record, failed)
+
+    async def _verify_download(
+        self, chunks, content_hash: str | None, path: str, record: OperationRecord
+    ):
+        """Pass ``chunks`` through, checking them against Dropbox's content_hash.
+
+        The hash is computed as the data goes by, so corruption is caught
+        without reading the backup a second time. The download's ``record``
+        is finished when the stream ends.
+        """
+        hasher = ContentHasher() if content_hash else None
+        failed = True
+        try:
+            async for chunk in chunks:
+                if hasher is not None:
+                    await self._async_run(hasher.update, chunk)
+                record.bytes += len(chunk)
+                yield chunk
+            if hasher is not None and hasher.hexdigest() != content_hash:
+                _LOGGER.error("Download of %s does not match its content hash", path)
+                raise BackupAgentError(
+                    f"Download of {path} failed its content hash check"
+                )
+            failed = False
+        finally:
+            await chunks.aclose()
+            self.metrics.finish(record, failed)
+
+    async def _stream_chunks(
+        self,
+        path: str,
+        manifest: dict,
+        concurrency: int,
+        record: OperationRecord | None = None,
+    ):
+        """Yield the chunks of ``manifest`` in order.
+
+        Up to ``concurrency`` chunks are fetched ahead of the consumer, as
+        ranges are for an archive. The download's ``record``, if given, is
+        finished when the stream ends.
+        """
+        names = (name for name, _size in manifest["chunks"])
+        pending: deque[asyncio.Task] = deque()
+
+        def _schedule_next() -> None:
+            if (name := next(names, None)) is not None:
+                pending.append(asyncio.create_task(self._async_fetch_chunk(name)))
+
+        _LOGGER.debug(
+            "Downloading %s (%d bytes) from %d chunks",
+            path,
+            manifest["size"],
+            len(manifest["chunks"]),
+        )
+        failed = True
+        try:
+            for _ in range(concurrency):
+                _schedule_next()
+            while pending:
+                data = await pending.popleft()
+                _schedule_next()
+                if record is not None:
+                    record.bytes += len(data)
+                yield data
+            failed = False
+        finally:
+            for task in pending:
+                task.cancel()
+            if record is not None:
+                self.metrics.finish(record, failed)
+
+    async def _async_fetch_chunk(self, name: str) -> bytes:
+        """Download one chunk and return its content, checked against its name."""
+        try:
+            _file, response = await self._async_call(
+                "files_download", f"{self._chunk_path}/{name}"
+            )
+            data = await self._async_read_body(response)
+            await self.limiter.download.async_consume(len(data))
+            return await self._async_run(restore_chunk, name, data)
+        except Exception as err:
+            _LOGGER.error("Could not fetch chunk %s: %s", name, err)
+            raise BackupAgentError(f"Chunk {name} is missing or corrupt") from err
+
+    async def _stream_ranges(self, path: str, url: str, size: int, concurrency: int):
+        """Yield a file fetched as concurrent HTTP Range requests, in order.
+
+        Up to ``concurrency`` ranges are in flight at once. The next range is
+        requested before the oldest one is handed to the consumer, so the
+        window stays full while HA writes the data out. If the server ignores
+        Range, the rest of the file is downloaded as a single stream.
+        """
+        range_mib = self.entry.options.get(
+            CONF_DOWNLOAD_CHUNK_SIZE, DEFAULT_DOWNLOAD_CHUNK_SIZE
+        )
+        range_size = range_mib * 1024 * 1024
+        session = async_get_clientsession(self.hass)
+        ranges = (
+            (start, min(start + range_size, size) - 1)
+            for start in range(0, size, range_size)
+        )
+        pending: deque[asyncio.Task] = deque()
+
+        def _schedule_next() -> None:
+            if (byte_range := next(ranges, None)) is not None:
+                pending.append(
+                    asyncio.create_task(self._fetch_range(session, url, *byte_range))
+                )
+
+        _LOGGER.debug(
+            "Downloading %s (%d bytes) with %d parallel ranges of %d bytes",
+            path,
+            size,
+            concurrency,
+            range_size,
+        )
+        sent = 0
+        try:
+            for _ in range(concurrency):
+                _schedule_next()
+            while pending:
+                try:
+                    data = await pending.popleft()
+                except RangeIgnoredError:
+                    break
+                _schedule_next()
+                sent += len(data)
+                yield data
+            else:
+                return
+        finally:
+            for task in pending:
+                task.cancel()
+
+        _LOGGER.warning(
+            "Range requests for %s are not honoured, downloading it as one stream",
+            path,
+        )
+        async for data in self._stream_single(path, skip=sent):
+            yield data
+
+    async def _stream_single(self, path: str, skip: int = 0):
+        """Yield a file downloaded in one request, less its first ``skip`` bytes."""
+        try:
+            _metadata, response = await self._async_call("files_download", path)
         except Exception as err:
+            _LOGGER.error("Dropbox download failed for %s: %s", path, err)
+            raise BackupAgentError from err
+        if isinstance(response, DownloadResponse):
+            chunks = self._stream_body(response, path)
+        else:
+            chunks = self._stream_response(response, path)
+        async for chunk in chunks:
+            if skip >= len(chunk):
+                skip -= len(chunk)
+                continue
+            yield chunk[skip:]
+            skip = 0
+
+    async def _fetch_range(self, session, url: str, start: int, end: int) -> bytes:
+        """Fetch one byte range, retrying it on its own if it fails."""
+        for attempt in range(1, RANGE_ATTEMPTS + 1):
+            # Each range is paced as a whole, like an upload chunk
+            await self.limiter.download.async_consume(end - start + 1)
+            count_api_call()
+            try:
+                async with session.get(
+                    url,
+                    headers={"Range": f"bytes={start}-{end}"},
+                    timeout=RANGE_TIMEOUT,
+                ) as resp:
+                    resp.raise_for_status()
+                    # A 200 carries the whole file, which is never read here
+                    if resp.status != 206:
+                        raise RangeIgnoredError(resp.status)
+                    data = await resp.read()
+                if len(data) != end - start + 1:
+                    raise ValueError(
+                        f"expected {end - start + 1} bytes, got {len(data)}"
+                    )
+                return data
+            except (aiohttp.ClientError, TimeoutError, ValueError) as err:
+                if attempt == RANGE_ATTEMPTS or not take_retry():
+                    _LOGGER.error(
+                        "Giving up on bytes %d-%d after %d attempts: %s",
+                        start,
+                        end,
+                        attempt,
+                        err,
+                    )
+                    raise BackupAgentError(
+                        f"Download of bytes {start}-{end} failed"
+                    ) from err
+                _LOGGER.warning(
+                    "Retrying bytes %d-%d (attempt %d failed): %s",
+                    start,
+                    end,
+                    attempt,
+                    err,
+                )
+                retry_after = None
+                if isinstance(err, aiohttp.ClientResponseError):
+                    if err.status == 429:
+                        count_throttled()
+                    if err.headers:
+                        retry_after = parse_retry_after(err.headers.get("Retry-After"))
+                await asyncio.sleep(backoff_delay(attempt, retry_after))
+
+    async def _stream_body(self, response: DownloadResponse, path: str):
+        """Yield a download from the native client as it arrives.
+
+        aiohttp buffers a bounded amount and pauses the socket when the
+        consumer falls behind, so no reader task is needed.
+        """
+        received = 0
+        try:
+            async for chunk in response.iter_chunks(DOWNLOAD_CHUNK_SIZE):
+                received += len(chunk)
+                await self.limiter.download.async_consume(len(chunk))
+                yield chunk
+            _LOGGER.debug("Finished Dropbox download of %s (%d bytes)", path, received)
+        except (aiohttp.ClientError, TimeoutError) as err:
             _LOGGER.error(
-                "Dropbox download failed for %s: %s", path, err, exc_info=True
+                "Dropbox download of %s failed after %d bytes: %s", path, received, err
             )
             raise BackupAgentError from err
+        finally:
+            response.close()
+
+    async def _stream_response(self, response, path: str):
+        """Yield a streamed HTTP response body as it arrives from the network.
 
-        # Inner async generator for streaming chunks
-        async def _stream():
-            chunk_size = 1024 * 1024
-            for offset in range(0, len(content), chunk_size):
-                yield content[offset : offset + chunk_size]
+        A reader task pulls chunks on the worker pool and keeps at most
+        DOWNLOAD_READ_AHEAD of them queued, so memory use does not depend on
+        the size of the backup.
+        """
+        queue: asyncio.Queue = asyncio.Queue(maxsize=DOWNLOAD_READ_AHEAD)
+        chunks = response.iter_content(DOWNLOAD_CHUNK_SIZE)
 
-        return _stream()
+        async def _reader():
+            try:
+                while chunk := await self._async_run(next, chunks, None):
+                    await queue.put(chunk)
+            except Exception as err:  # noqa: BLE001
+                await queue.put(err)
+            else:
+                await queue.put(None)
+
+        reader = asyncio.create_task(_reader())
+        received = 0
+        try:
+            while (chunk := await queue.get()) is not None:
+                if isinstance(chunk, Exception):
+                    _LOGGER.error(
+                        "Dropbox download of %s failed after %d bytes: %s",
+                        path,
+                        received,
+                        chunk,
+                    )
+                    raise BackupAgentError from chunk
+                received += len(chunk)
+                await self.limiter.download.async_consume(len(chunk))
+                yield chunk
+            _LOGGER.debug("Finished Dropbox download of %s (%d bytes)", path, received)
+        finally:
+            reader.cancel()
+            await self._async_run(response.close)
 
     async def async_delete_backup(self, backup_id: str, **kwargs) -> None:
-        """Delete by path."""
+        """Delete by path.
+
+        Deletes that arrive together, such as Home Assistant trimming old
+        backups, are sent to Dropbox as one batch.
+        """
         path = f"/{backup_id}"
         _LOGGER.debug("Deleting Dropbox backup %s", path)
+        start_operation()
+        future = asyncio.get_running_loop().create_future()
+        self._pending_deletes.setdefault(path, []).append(future)
         try:
-            dbx = await self._get_dbx()
-            await self.hass.async_add_executor_job(dbx.files_delete_v2, path)
+            with self.metrics.operation("delete"):
+                if self._delete_flush is None:
+                    self._delete_flush = asyncio.create_task(
+                        self._async_flush_deletes()
+                    )
+                await future
         except Exception as err:
             _LOGGER.error("Dropbox delete failed for %s: %s", path, err, exc_info=True)
             raise BackupAgentError from err
 
+    async def _async_flush_deletes(self) -> None:
+        """Send the deletes queued during the batch window as one batch.
+
+        Every waiting delete is answered, whatever goes wrong after the
+        batch, so no caller is left waiting.
+        """
+        await asyncio.sleep(DELETE_BATCH_DELAY)
+        pending, self._pending_deletes = self._pending_deletes, {}
+        self._delete_flush = None
+        paths = list(pending)
+        errors: list[Exception | None] = [
+            BackupAgentError("The batch delete was cancelled")
+        ] * len(paths)
+        try:
+            try:
+                errors = await self._async_delete_batch(paths)
+            except Exception as err:  # noqa: BLE001
+                errors = [err] * len(paths)
+            try:
+                await self._async_forget(
+                    [
+                        _index_key(path)
+                        for path, error in zip(paths, errors)
+                        if error is None
+                    ]
+                )
+            except Exception as err:  # noqa: BLE001
+                # The files are gone; the next listing drops them from the index
+                _LOGGER.warning("Could not forget deleted backups: %s", err)
+        finally:
+            for path, error in zip(paths, errors):
+                for future in pending[path]:
+                    if future.done():
+                        continue
+                    if error is None:
+                        future.set_result(None)
+                    else:
+                        future.set_exception(error)
+
+    async def _async_delete_batch(self, paths: list[str]) -> list[Exception | None]:
+        """Delete ``paths`` with files_delete_batch.
+
+        Returns, for each path in order, None if it was deleted or the
+        error Dropbox reported for it.
+        """
+        from dropbox.exceptions import ApiError
+        from dropbox.files import DeleteArg
+
+        errors: list[Exception | None] = []
+        for start in range(0, len(paths), DELETE_BATCH_LIMIT):
+            batch = paths[start : start + DELETE_BATCH_LIMIT]
+            launch = await self._async_call(
+                "files_delete_batch", [DeleteArg(path) for path in batch]
+            )
+            if launch.is_complete():
+                result = launch.get_complete()
+            else:
+                result = await self._async_wait_delete_batch(launch.get_async_job_id())
+            _LOGGER.debug("Dropbox deleted a batch of %d paths", len(batch))
+            errors.extend(
+                None
+                if entry.is_success()
+                else ApiError(None, entry.get_failure(), None, None)
+                for entry in result.entries
+            )
+        return errors
+
+    async def _async_wait_delete_batch(self, job_id: str):
+        """Poll a delete_batch job until it finishes and return its result."""
+        delay = DELETE_POLL_INTERVAL
+        deadline = time.monotonic() + DELETE_POLL_TIMEOUT
+        while time.monotonic() < deadline:
+            await asyncio.sleep(delay)
+            status = await self._async_call("files_delete_batch_check", job_id)
+            if status.is_complete():
+                return status.get_complete()
+            if status.is_failed():
+                raise BackupAgentError(
+                    f"Dropbox batch delete failed: {status.get_failed()}"
+                )
+            delay = min(delay * 2, DELETE_POLL_MAX_INTERVAL)
+        raise BackupAgentError("Dropbox batch delete did not finish in time")
+
+    async def _async_forget(self, backup_ids: list[str]) -> None:
+        """Drop deleted backups from the index and the sidecar index.
+
+        Chunks left unused by deleted deduplicated backups are removed too.
+        """
+        deduplicated = any("dedup" in self._stored(key) for key in backup_ids)
+        for backup_id in backup_ids:
+            self._files.pop(backup_id, None)
+            self._manifests.pop(backup_id, None)
+        if backup_ids:
+            await self._async_update_metadata(dict.fromkeys(backup_ids))
+        if self.cache.enabled:
+            try:
+                for backup_id in backup_ids:
+                    await self._async_run(self.cache.remove, backup_id)
+            except OSError as err:
+                _LOGGER.warning(
+                    "Could not remove deleted backups from the cache: %s", err
+                )
+        if deduplicated:
+            await self._async_collect_chunks()
+
+    async def _async_collect_chunks(self) -> None:
+        """Delete the chunks no remaining manifest uses.
+
+        Nothing is deleted unless every backup in the folder that could be a
+        manifest is indexed, so chunks are never lost to one that could not
+        be read. Another instance may be uploading to the folder, so the
+        chunk folder is listed again before the backups, and chunks newer
+        than CHUNK_GRACE_PERIOD are kept, as a manifest may not list them yet.
+        Failures are logged; the next delete tries again.
+        """
+        try:
+            async with self._chunk_lock:
+                listed = await self._async_list_chunks()
+                await self._async_refresh_index()
+                if self._metadata is None:
+                    _LOGGER.warning(
+                        "The backup index is unreadable, keeping all chunks"
+                    )
+                    return
+                # Archives that cannot be manifests use no chunks
+                unindexed = sorted(
+                    backup_id
+                    for backup_id in self._files
+                    if backup_id not in self._metadata
+                    and backup_id not in self._foreign
+                )
+                if unindexed:
+                    _LOGGER.warning(
+                        "Keeping all chunks, as these backups are not indexed: %s",
+                        ", ".join(unindexed),
+                    )
+                    return
+                used: set[str] = set()
+                for backup_id in self._files:
+                    if "dedup" in self._metadata.get(backup_id, {}):
+                        used |= await self._async_manifest_chunks(backup_id)
+                cutoff = time.time() - CHUNK_GRACE_PERIOD
+                unused = [
+                    name
+                    for name, entry in listed.items()
+                    if name not in used and _modified_at(entry) < cutoff
+                ]
+                if not unused:
+                    return
+                errors = await self._async_delete_batch(
+                    [f"{self._chunk_path}/{name}" for name in unused]
+                )
+                for name, error in zip(unused, errors):
+                    if error is None:
+                        self._chunks.pop(name, None)
+                _LOGGER.info(
+                    "Removed %d chunks no backup uses",
+                    errors.count(None),
+                )
+        except Exception as err:  # noqa: BLE001
+            _LOGGER.warning("Removing unused chunks failed: %s", err)
+
+    async def _async_manifest_chunks(self, backup_id: str) -> set[str]:
+        """Return the names of the chunks a deduplicated backup uses."""
+        if (names := self._manifests.get(backup_id)) is None:
+            _file, response = await self._async_call("files_download", f"/{backup_id}")
+            manifest = load_manifest(await self._async_read_body(response))
+            names = {name for name, _size in manifest["chunks"]}
+            self._manifests[backup_id] = names
+        return names
+
     async def async_get_backup(self, backup_id: str, **kwargs) -> AgentBackup:
         """Fetch one snapshot’s metadata by URL-decoding the ID first."""
+        # Backups seen by the last listing are served from the index
+        if (file := self._files.get(_index_key(backup_id))) is not None:
+            return self._metadata_to_backup(file, _index_key(backup_id))
+
         # Decode any %20, %2F, etc. back to real characters
         decoded = urllib.parse.unquote(backup_id)
         path = f"/{decoded}"
         _LOGGER.debug("Decoded backup_id %s → %s", backup_id, path)
+        start_operation()
         try:
-            dbx = await self._get_dbx()
-            meta = await self.hass.async_add_executor_job(dbx.files_get_metadata, path)
-            return AgentBackup(
-                addons=[],
-                backup_id=backup_id,
-                date=meta.server_modified,
-                database_included=True,
-                extra_metadata={},
-                folders=[],
-                homeassistant_included=True,
-                homeassistant_version=getattr(self.hass, "version", ""),
-                name=meta.name,
-                protected=False,
-                size=meta.size,
-            )
+            with self.metrics.operation("get"):
+                meta = await self._async_call("files_get_metadata", path)
+            return self._metadata_to_backup(meta, backup_id)
         except Exception as err:
             _LOGGER.error(
                 "Dropbox get_backup failed for %s: %s", path, err, exc_info=True
@@ -274,22 +2120,132 @@ class DropboxBackupAgent(BackupAgent):
             raise BackupAgentError from err
 
 
+def _index_entry(backup: AgentBackup, storage: dict | None = None) -> dict:
+    """Return the sidecar index entry for ``backup``, stored as ``storage``."""
+    stored = backup.as_dict()
+    del stored["backup_id"], stored["size"]
+    return {**stored, **(storage or {})}
+
+
+def _index_key(backup_id: str) -> str:
+    """Return the backup index key for a possibly URL-encoded backup_id."""
+    return urllib.parse.unquote(backup_id).strip("/").lower()
+
+
+def cache_location(hass: HomeAssistant, entry_id: str) -> tuple[str, str]:
+    """Return the directory and file name prefix of an entry's local cache."""
+    return hass.config.path(CACHE_FOLDER), f"{DOMAIN}_{entry_id}"
+
+
+def _listing_options(entry) -> tuple[str, bool, list[str]]:
+    """Return the folder, subfolder option and patterns of a listing."""
+    return (
+        entry.data.get(CONF_FOLDER, "").strip("/"),
+        entry.options.get(CONF_INCLUDE_SUBFOLDERS, DEFAULT_INCLUDE_SUBFOLDERS),
+        parse_patterns(entry.options.get(CONF_BACKUP_PATTERN, DEFAULT_BACKUP_PATTERN)),
+    )
+
+
+def parse_patterns(value: str) -> list[str]:
+    """Parse comma-separated file name patterns such as ``"*.tar, *.tgz"``."""
+    return [pattern.strip().lower() for pattern in value.split(",") if pattern.strip()]
+
+
+def _matches(name: str, patterns: list[str]) -> bool:
+    """Return True if ``name`` matches one of ``patterns``, ignoring case.
+
+    Without patterns every name matches.
+    """
+    name = name.lower()
+    return not patterns or any(
+        fnmatch.fnmatchcase(name, pattern) for pattern in patterns
+    )
+
+
+def _modified_at(entry) -> float:
+    """Return when Dropbox last modified a file, as a timestamp."""
+    # The SDK reports server_modified as a naive UTC datetime
+    return entry.server_modified.replace(tzinfo=UTC).timestamp()
+
+
+def _import_sdk() -> None:
+    """Import the parts of the Dropbox SDK the agent uses."""
+    from dropbox import exceptions, files  # noqa: F401
+
+
+def _read_and_close(response) -> bytes:
+    """Read a whole streamed response body, then release the connection."""
+    try:
+        return response.content
+    finally:
+        response.close()
+
+
+def _is_not_found(err: Exception) -> bool:
+    """Return True if a Dropbox path lookup failed because nothing is there."""
+    error = getattr(err, "error", None)
+    return (
+        hasattr(error, "is_path")
+        and error.is_path()
+        and error.get_path().is_not_found()
+    )
+
+
+def _is_cursor_reset(err: Exception) -> bool:
+    """Return True if Dropbox invalidated a list_folder cursor."""
+    error = getattr(err, "error", None)
+    return hasattr(error, "is_reset") and error.is_reset()
+
+
+def _correct_offset(err: Exception) -> int | None:
+    """Return the server's offset if ``err`` is Dropbox's incorrect_offset."""
+    from dropbox.exceptions import ApiError
+
+    if not isinstance(err, ApiError):
+        return None
+    error = err.error
+    if hasattr(error, "is_lookup_failed") and error.is_lookup_failed():
+        error = error.get_lookup_failed()
+    if hasattr(error, "is_incorrect_offset") and error.is_incorrect_offset():
+        return error.get_incorrect_offset().correct_offset
+    return None
+
+
+@callback
+def async_get_agent(
+    hass: HomeAssistant, entry, pool: WorkerPool | None
+) -> DropboxBackupAgent:
+    """Return the agent of ``entry``, reusing the one of an earlier setup."""
+    agents = hass.data.setdefault(DATA_AGENTS, {})
+    if (agent := agents.get(entry.entry_id)) is not None:
+        agent.reconfigure(entry, pool)
+        return agent
+    agent = agents[entry.entry_id] = DropboxBackupAgent(hass, entry, pool)
+    return agent
+
+
 async def async_get_backup_agents(hass: HomeAssistant):
-    """Return all configured DropboxBackupAgent instances."""
-    agents = []
-    for entry in hass.config_entries.async_entries(DOMAIN):
-        agents.append(DropboxBackupAgent(hass, entry))
-    return agents
+    """Return the DropboxBackupAgent of every set up config entry.
+
+    The backup manager asks from the listener fired at the end of setup,
+    while the entry is still being set up, so those entries count too.
+    """
+    agents = hass.data.get(DATA_AGENTS, {})
+    return [
+        agents[entry.entry_id]
+        for entry in hass.config_entries.async_entries(DOMAIN)
+        if entry.entry_id in agents and entry.state in AGENT_ENTRY_STATES
+    ]
 
 
 @callback
 def async_register_backup_agents_listener(hass: HomeAssistant, *, listener):
-    """Async call to get agaent listeners"""
+    """Register a listener called when agents are added, removed or changed."""
 
-    hass.data.setdefault(f"{DOMAIN}_listeners", []).append(listener)
+    hass.data.setdefault(DATA_BACKUP_AGENT_LISTENERS, []).append(listener)
 
     @callback
     def remove():
-        hass.data[f"{DOMAIN}_listeners"].remove(listener)
+        hass.data[DATA_BACKUP_AGENT_LISTENERS].remove(listener)
 
     return remove
@@ -0,0 +1,115 @@
+"""Bandwidth limits shared by the transfers of a config entry."""
+
+import asyncio
+import time
+from collections.abc import Callable
+from datetime import time as dt_time
+
+from homeassistant.util import dt as dt_util
+
+from .const import CONF_DOWNLOAD_LIMIT, CONF_UNLIMITED_HOURS, CONF_UPLOAD_LIMIT
+
+# Unused allowance is kept for at most this many seconds of transfer, so an
+# idle limiter cannot release a long burst.
+BURST_SECONDS = 1.0
+# A transfer waiting for its turn looks at the rate again this often, so a
+# changed limit or the start of unlimited hours applies within this time.
+RECHECK_INTERVAL = 1.0
+
+
+class TokenBucket:
+    """Pace a stream of chunks to the rate returned by ``rate``.
+
+    A chunk may go as soon as no earlier chunk is still owed, so a transfer
+    never waits for the allowance of a chunk it already holds; the next one
+    waits until the previous has been paid for. Waiting transfers are served
+    in turn. A rate of None means unlimited.
+    """
+
+    def __init__(self, rate: Callable[[], float | None]) -> None:
+        self._rate = rate
+        self._tokens = 0.0
+        self._updated = time.monotonic()
+        # Rate in force since the last update
+        self._current: float | None = None
+        self._lock = asyncio.Lock()
+
+    async def async_consume(self, size: int) -> None:
+        """Wait until ``size`` bytes may be transferred."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if self._current:
+                    self._tokens = min(
+                        self._tokens + (now - self._updated) * self._current,
+                        self._current * BURST_SECONDS,
+                    )
+                self._updated = now
+                rate = self._current = self._rate()
+                if not rate:
+                    self._tokens = 0.0
+                    return
+                if self._tokens >= 0:
+                    self._tokens -= size
+                    return
+                await asyncio.sleep(min(-self._tokens / rate, RECHECK_INTERVAL))
+
+
+class BandwidthLimiter:
+    """Upload and download caps for every operation of an entry.
+
+    Limits come from the entry's options and can be changed with
+    :meth:`configure` while transfers run.
+    """
+
+    def __init__(self, options) -> None:
+        self.upload = TokenBucket(lambda: self._rate(self._upload_limit))
+        self.download = TokenBucket(lambda: self._rate(self._download_limit))
+        self.configure(options)
+
+    def configure(self, options) -> None:
+        """Apply the limits set in ``options``."""
+        self._upload_limit = _bytes_per_second(options.get(CONF_UPLOAD_LIMIT, 0))
+        self._download_limit = _bytes_per_second(options.get(CONF_DOWNLOAD_LIMIT, 0))
+        self._unlimited = parse_windows(options.get(CONF_UNLIMITED_HOURS, ""))
+
+    def _rate(self, limit: float | None) -> float | None:
+        if limit is None:
+            return None
+        now = dt_util.now().time()
+        if any(_in_window(now, start, end) for start, end in self._unlimited):
+            return None
+        return limit
+
+    def as_dict(self) -> dict:
+        """Return the limits in force, in bytes per second, for diagnostics."""
+        return {
+            "upload": self._rate(self._upload_limit),
+            "download": self._rate(self._download_limit),
+        }
+
+
+def parse_windows(value: str) -> list[tuple[dt_time, dt_time]]:
+    """Parse time-of-day windows such as ``"01:00-06:00, 22:30-23:30"``.
+
+    A window may run past midnight, such as ``"22:00-06:00"``. Raises
+    ValueError if ``value`` is not a comma-separated list of windows.
+    """
+    windows = []
+    for window in filter(None, (part.strip() for part in value.split(","))):
+        start, end = window.split("-")
+        windows.append(
+            (dt_time.fromisoformat(start.strip()), dt_time.fromisoformat(end.strip()))
+        )
+    return windows
+
+
+def _in_window(now: dt_time, start: dt_time, end: dt_time) -> bool:
+    if start <= end:
+        return start <= now < end
+    return now >= start or now < end
+
+
+def _bytes_per_second(mbit: float) -> float | None:
+    """Convert a limit in Mbit/s to bytes per second, None for no limit."""
+    return mbit * 1_000_000 / 8 if mbit else None
@@ -0,0 +1,210 @@
+"""Local disk cache of recently uploaded backups."""
+
+import hashlib
+import json
+import os
+import tempfile
+import threading
+import time
+
+from .content_hash import ContentHasher
+
+# Home Assistant leaves this folder of the config directory, and the .tar
+# files directly in it, out of its own backups
+CACHE_FOLDER = "tmp_backups"
+# Cached backups are read back in pieces of this size
+CACHE_READ_SIZE = 1024 * 1024
+
+
+class CacheWriter:
+    """A backup being written to the cache while it uploads.
+
+    The upload may read its stream more than once, so :meth:`restart`
+    starts the file over. The Dropbox content hash of what was written is
+    kept, so a cached copy can be checked when it is read back.
+    """
+
+    def __init__(self, directory: str, prefix: str) -> None:
+        self._directory = directory
+        self._prefix = prefix
+        self._file = None
+        self.path: str | None = None
+        self.size = 0
+        self._hasher = ContentHasher()
+
+    def restart(self) -> None:
+        """Start the file over, creating it on first use."""
+        if self._file is None:
+            os.makedirs(self._directory, exist_ok=True)
+            # A .tar name keeps the partial file out of Home Assistant backups
+            fd, self.path = tempfile.mkstemp(
+                suffix=".part.tar", prefix=f"{self._prefix}_", dir=self._directory
+            )
+            self._file = os.fdopen(fd, "wb")
+        self._file.seek(0)
+        self._file.truncate()
+        self.size = 0
+        self._hasher = ContentHasher()
+
+    def write(self, data: bytes) -> None:
+        self._file.write(data)
+        self._hasher.update(data)
+        self.size += len(data)
+
+    def finish(self) -> str:
+        """Close the file and return the content hash of what was written."""
+        self._file.close()
+        return self._hasher.hexdigest()
+
+    def discard(self) -> None:
+        """Close and delete the file."""
+        if self._file is not None:
+            self._file.close()
+            _remove(self.path)
+
+
+class BackupCache:
+    """Recent backups kept on local disk to restore without downloading them.
+
+    The files of one cache sit side by side in ``directory``, named after
+    ``prefix``, so the directory can be one Home Assistant keeps out of its
+    backups. Entries are keyed by backup id and remember the Dropbox
+    ``content_hash`` and ``server_modified`` of the stored file, so a backup
+    replaced on Dropbox is not served from a stale copy. Once there are more
+    than ``max_backups`` entries, or they take more than ``max_bytes``, the
+    least recently used are evicted; a limit of 0 is no limit, and with both
+    at 0 the cache is off. Every method blocks and runs on a worker thread.
+    """
+
+    def __init__(
+        self, directory: str, prefix: str, max_backups: int, max_bytes: int
+    ) -> None:
+        self.directory = directory
+        self.prefix = prefix
+        self.max_backups = max_backups
+        self.max_bytes = max_bytes
+        self._entries: dict[str, dict] | None = None
+        self._lock = threading.Lock()
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.max_backups or self.max_bytes)
+
+    def writer(self) -> CacheWriter:
+        """Return a writer for a backup about to be uploaded."""
+        return CacheWriter(self.directory, self.prefix)
+
+    def add(
+        self, key: str, writer: CacheWriter, content_hash: str, server_modified: str
+    ) -> None:
+        """Keep the backup ``writer`` wrote as ``key``, then evict to fit."""
+        local_hash = writer.finish()
+        if self.max_bytes and writer.size > self.max_bytes:
+            _remove(writer.path)
+            return
+        with self._lock:
+            entries = self._load()
+            path = os.path.join(self.directory, self._file_name(key))
+            os.replace(writer.path, path)
+            entries[key] = {
+                "file": os.path.basename(path),
+                "size": writer.size,
+                "content_hash": content_hash,
+                "server_modified": server_modified,
+                "local_hash": local_hash,
+                "used": time.time(),
+            }
+            self._evict(entries)
+            self._save(entries)
+
+    def lookup(self, key: str, content_hash: str, server_modified: str) -> dict | None:
+        """Return the entry for ``key`` if it matches the file on Dropbox.
+
+        The entry's ``path`` is set to the cached file. A stale entry is
+        dropped.
+        """
+        with self._lock:
+            entries = self._load()
+            if (entry := entries.get(key)) is None:
+                return None
+            path = os.path.join(self.directory, entry["file"])
+            if (
+                entry["content_hash"] != content_hash
+                or entry["server_modified"] != server_modified
+                or not os.path.exists(path)
+            ):
+                self._drop(entries, key)
+                self._save(entries)
+                return None
+            entry["used"] = time.time()
+            self._save(entries)
+            return {**entry, "path": path}
+
+    def remove(self, key: str) -> None:
+        """Drop ``key`` from the cache, if it is there."""
+        with self._lock:
+            entries = self._load()
+            if key in entries:
+                self._drop(entries, key)
+                self._save(entries)
+
+    def clear(self) -> None:
+        """Delete every file of the cache."""
+        with self._lock:
+            try:
+                names = os.listdir(self.directory)
+            except FileNotFoundError:
+                names = []
+            for name in names:
+                if name.startswith(f"{self.prefix}_"):
+                    _remove(os.path.join(self.directory, name))
+            self._entries = {}
+
+    def _evict(self, entries: dict[str, dict]) -> None:
+        """Drop least recently used entries until the limits are met."""
+        by_use = sorted(entries, key=lambda key: entries[key]["used"])
+        total = sum(entry["size"] for entry in entries.values())
+        for key in by_use:
+            over_count = self.max_backups and len(entries) > self.max_backups
+            over_size = self.max_bytes and total > self.max_bytes
+            if not (over_count or over_size):
+                break
+            total -= entries[key]["size"]
+            self._drop(entries, key)
+
+    def _drop(self, entries: dict[str, dict], key: str) -> None:
+        entry = entries.pop(key)
+        _remove(os.path.join(self.directory, entry["file"]))
+
+    def _load(self) -> dict[str, dict]:
+        """Return the cache index, reading it on first use."""
+        if self._entries is None:
+            try:
+                with open(self._index_path, "rb") as file:
+                    self._entries = json.load(file)
+            except (OSError, ValueError):
+                self._entries = {}
+        return self._entries
+
+    def _save(self, entries: dict[str, dict]) -> None:
+        """Write the cache index, replacing the old one in a single step."""
+        os.makedirs(self.directory, exist_ok=True)
+        path = self._index_path
+        with open(f"{path}.tmp", "w", encoding="utf-8") as file:
+            json.dump(entries, file)
+        os.replace(f"{path}.tmp", path)
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.directory, f"{self.prefix}_index.json")
+
+    def _file_name(self, key: str) -> str:
+        """Return the name of the cached file for backup ``key``."""
+        return f"{self.prefix}_{hashlib.sha256(key.encode()).hexdigest()[:32]}.tar"
+
+
+def _remove(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
@@ -0,0 +1,57 @@
+"""Upload chunk sizing from measured throughput."""
+
+# Upload session chunks other than the last must be a multiple of 4 MiB, and
+# Dropbox accepts at most 150 MiB per request.
+CHUNK_ALIGNMENT = 4 * 1024 * 1024
+MAX_REQUEST_SIZE = 150 * 1024 * 1024
+# Aim for each request to take about this long: long enough that latency is
+# a small share of it, short enough that retrying it is cheap.
+TARGET_CHUNK_SECONDS = 5.0
+# Weight of the newest sample in the moving average of the throughput.
+SMOOTHING = 0.5
+
+
+class ChunkSizer:
+    """Pick the size of the next upload chunk from how the last ones went.
+
+    The size follows the measured throughput so that a chunk takes about
+    TARGET_CHUNK_SECONDS to send. It shrinks as soon as the link slows down,
+    grows at most twofold per chunk, and is halved whenever sending a chunk
+    needed a retry. It always stays a multiple of 4 MiB between ``minimum``
+    and ``maximum``.
+    """
+
+    def __init__(self, initial: int, minimum: int, maximum: int) -> None:
+        self.minimum = _align(minimum)
+        self.maximum = max(self.minimum, min(_align(maximum), _align(MAX_REQUEST_SIZE)))
+        self.chunk_size = self._clamp(_align(initial))
+        # Smoothed bytes per second, None until the first chunk is measured
+        self.rate: float | None = None
+
+    def record(self, size: int, seconds: float, failed: bool = False) -> int:
+        """Account for a chunk of ``size`` bytes sent in ``seconds``.
+
+        Returns the size to use for the next chunk.
+        """
+        if failed:
+            self.chunk_size = self._clamp(_align(self.chunk_size // 2))
+            return self.chunk_size
+        if seconds <= 0:
+            return self.chunk_size
+        rate = size / seconds
+        # A slowdown takes effect at once; a speedup is averaged in
+        if self.rate is None or rate < self.rate:
+            self.rate = rate
+        else:
+            self.rate = SMOOTHING * rate + (1 - SMOOTHING) * self.rate
+        target = _align(self.rate * TARGET_CHUNK_SECONDS)
+        self.chunk_size = self._clamp(min(target, self.chunk_size * 2))
+        return self.chunk_size
+
+    def _clamp(self, size: int) -> int:
+        return min(self.maximum, max(self.minimum, size))
+
+
+def _align(size: float) -> int:
+    """Round ``size`` down to a multiple of 4 MiB, but not below 4 MiB."""
+    return max(CHUNK_ALIGNMENT, int(size) // CHUNK_ALIGNMENT * CHUNK_ALIGNMENT)
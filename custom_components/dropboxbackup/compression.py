@@ -0,0 +1,137 @@
+"""Streaming compression of backup archives stored in Dropbox."""
+
+import zlib
+
+from homeassistant.components.backup import BackupAgentError
+
+CODEC_NONE = "none"
+CODEC_GZIP = "gzip"
+CODEC_ZSTD = "zstd"
+CODECS = (CODEC_NONE, CODEC_GZIP, CODEC_ZSTD)
+# Leading bytes of each codec's output. A Home Assistant backup is a plain
+# tar archive, which starts with a member name and never with these.
+MAGIC = {CODEC_GZIP: b"\x1f\x8b", CODEC_ZSTD: b"\x28\xb5\x2f\xfd"}
+GZIP_MAX_LEVEL = 9
+# Input is compressed in blocks of this size, so each job handed to a worker
+# thread is worth the hand-off.
+COMPRESS_BLOCK_SIZE = 1024 * 1024
+# Compressed data is fed to the decompressor in slices of this size, which
+# bounds the output of each step to this times the compression ratio.
+DECOMPRESS_SLICE_SIZE = 64 * 1024
+
+
+def compressor(codec: str, level: int):
+    """Return an object with ``compress(data)`` and ``flush()`` for ``codec``.
+
+    Both codecs produce the same output for the same input and level, so a
+    compressed archive can be recognised by its content hash.
+    """
+    if codec == CODEC_ZSTD:
+        import zstandard
+
+        return zstandard.ZstdCompressor(level=level).compressobj()
+    if codec == CODEC_GZIP:
+        # wbits 31 writes a gzip header with a zero timestamp
+        return zlib.compressobj(min(level, GZIP_MAX_LEVEL), zlib.DEFLATED, 31)
+    raise ValueError(f"Unknown compression codec {codec}")
+
+
+def compress_bytes(data: bytes, codec: str, level: int) -> bytes:
+    """Return ``data`` compressed with ``codec`` as one complete stream."""
+    compressobj = compressor(codec, level)
+    return compressobj.compress(data) + compressobj.flush()
+
+
+def decompressor(codec: str):
+    """Return an object with ``decompress(data)`` for ``codec``."""
+    if codec == CODEC_ZSTD:
+        import zstandard
+
+        return zstandard.ZstdDecompressor().decompressobj()
+    if codec == CODEC_GZIP:
+        return zlib.decompressobj(31)
+    raise ValueError(f"Unknown compression codec {codec}")
+
+
+def detect_codec(head: bytes) -> str | None:
+    """Return the codec ``head`` was compressed with, or None if it was not."""
+    for codec, magic in MAGIC.items():
+        if head.startswith(magic):
+            return codec
+    return None
+
+
+def decompress_head(data: bytes, limit: int) -> bytes:
+    """Return at most ``limit`` bytes from the start of a possibly compressed file.
+
+    ``data`` may be cut off anywhere; whatever decompresses is returned.
+    """
+    if (codec := detect_codec(data)) is None:
+        return data[:limit]
+    decompressobj = decompressor(codec)
+    parts = []
+    size = 0
+    for start in range(0, len(data), DECOMPRESS_SLICE_SIZE):
+        part = decompressobj.decompress(data[start : start + DECOMPRESS_SLICE_SIZE])
+        parts.append(part)
+        size += len(part)
+        if size >= limit:
+            break
+    return b"".join(parts)[:limit]
+
+
+async def compress_stream(stream, codec: str, level: int, run):
+    """Yield ``stream`` compressed with ``codec``.
+
+    Compression is CPU bound, so each block goes through ``run``, which runs
+    it on a worker thread. At most one block is held at a time.
+    """
+    compressobj = compressor(codec, level)
+    parts: list[bytes] = []
+    size = 0
+    async for data in stream:
+        parts.append(data)
+        size += len(data)
+        if size >= COMPRESS_BLOCK_SIZE:
+            if output := await run(compressobj.compress, b"".join(parts)):
+                yield output
+            parts.clear()
+            size = 0
+    if parts and (output := await run(compressobj.compress, b"".join(parts))):
+        yield output
+    if output := await run(compressobj.flush):
+        yield output
+
+
+async def decompress_stream(chunks, codec: str | None, run):
+    """Yield ``chunks`` decompressed with ``codec``, or unchanged if it is None.
+
+    The codec comes from the sidecar index, so only archives stored
+    compressed are decompressed. One replaced on Dropbox since, which no
+    longer starts with the codec's magic bytes, is passed through as it is.
+    A stream that ends inside the compressed data, or goes on past its end,
+    raises BackupAgentError rather than restoring a short archive.
+    """
+    decompressobj = None
+    first = True
+    try:
+        async for chunk in chunks:
+            if first:
+                first = False
+                if codec is not None and detect_codec(chunk) == codec:
+                    decompressobj = decompressor(codec)
+            if decompressobj is None:
+                yield chunk
+                continue
+            view = memoryview(chunk)
+            for start in range(0, len(view), DECOMPRESS_SLICE_SIZE):
+                piece = view[start : start + DECOMPRESS_SLICE_SIZE]
+                if output := await run(decompressobj.decompress, piece):
+                    yield output
+        if decompressobj is not None:
+            if not decompressobj.eof:
+                raise BackupAgentError(f"The {codec} archive is truncated")
+            if decompressobj.unused_data:
+                raise BackupAgentError(f"The {codec} archive has data past its end")
+    finally:
+        await chunks.aclose()
@@ -1,10 +1,48 @@
 """Config flow for Dropbox integration."""
 
 import logging
+
+import voluptuous as vol
 from homeassistant import config_entries
-from homeassistant.core import HomeAssistant
+from homeassistant.core import HomeAssistant, callback
 from homeassistant.helpers.config_entry_oauth2_flow import AbstractOAuth2FlowHandler
-from .const import DOMAIN
+from .bandwidth import parse_windows
+from .compression import CODECS
+from .const import (
+    CONF_BACKUP_PATTERN,
+    CONF_CACHE_BACKUPS,
+    CONF_CACHE_SIZE,
+    CONF_COMPRESSION,
+    CONF_COMPRESSION_LEVEL,
+    CONF_DEDUPLICATE,
+    CONF_DOWNLOAD_CHUNK_SIZE,
+    CONF_DOWNLOAD_CONCURRENCY,
+    CONF_DOWNLOAD_LIMIT,
+    CONF_INCLUDE_SUBFOLDERS,
+    CONF_IO_WORKERS,
+    CONF_KEEP_DAILY,
+    CONF_KEEP_LAST,
+    CONF_KEEP_MONTHLY,
+    CONF_KEEP_WEEKLY,
+    CONF_MAX_CHUNK_SIZE,
+    CONF_MAX_TOTAL_SIZE,
+    CONF_MIN_CHUNK_SIZE,
+    CONF_UNLIMITED_HOURS,
+    CONF_UPLOAD_CONCURRENCY,
+    CONF_UPLOAD_LIMIT,
+    DEFAULT_BACKUP_PATTERN,
+    DEFAULT_COMPRESSION,
+    DEFAULT_COMPRESSION_LEVEL,
+    DEFAULT_DEDUPLICATE,
+    DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    DEFAULT_DOWNLOAD_CONCURRENCY,
+    DEFAULT_INCLUDE_SUBFOLDERS,
+    DEFAULT_IO_WORKERS,
+    DEFAULT_MAX_CHUNK_SIZE,
+    DEFAULT_MIN_CHUNK_SIZE,
+    DEFAULT_UPLOAD_CONCURRENCY,
+    DOMAIN,
+)
 
 _LOGGER = logging.getLogger(__name__)
 
@@ -13,6 +51,8 @@ class DropboxOAuth2FlowHandler(AbstractOAuth2FlowHandler, domain=DOMAIN):
     """Handle OAuth2 for Dropbox Backup via Application Credentials."""
 
     DOMAIN = DOMAIN
+    # Minor version 2 gives each entry a backup agent id of its own
+    MINOR_VERSION = 2
     CLIENT_ID = "dropbox"  # must match the entry in application_credentials
     SCOPE = [
         "files.content.read",
@@ -45,6 +85,12 @@ class DropboxOAuth2FlowHandler(AbstractOAuth2FlowHandler, domain=DOMAIN):
         # Return True → Home Assistant continues setting up the entry
         return True
 
+    @staticmethod
+    @callback
+    def async_get_options_flow(config_entry: config_entries.ConfigEntry):
+        """Return the options flow for transfer settings."""
+        return DropboxOptionsFlowHandler()
+
     @property
     def logger(self) -> logging.Logger:
         """Return the logger for this flow."""
@@ -54,3 +100,85 @@ class DropboxOAuth2FlowHandler(AbstractOAuth2FlowHandler, domain=DOMAIN):
     def is_matching(cls, hass, config_entry):
         """Check if the config entry matches this handler."""
         return config_entry.domain == cls.DOMAIN
+
+
+OPTIONS_SCHEMA = vol.Schema(
+    {
+        vol.Optional(
+            CONF_DOWNLOAD_CONCURRENCY, default=DEFAULT_DOWNLOAD_CONCURRENCY
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+        vol.Optional(
+            CONF_DOWNLOAD_CHUNK_SIZE, default=DEFAULT_DOWNLOAD_CHUNK_SIZE
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=64)),
+        vol.Optional(
+            CONF_UPLOAD_CONCURRENCY, default=DEFAULT_UPLOAD_CONCURRENCY
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=16)),
+        vol.Optional(CONF_MIN_CHUNK_SIZE, default=DEFAULT_MIN_CHUNK_SIZE): vol.All(
+            vol.Coerce(int), vol.Range(min=4, max=148)
+        ),
+        vol.Optional(CONF_MAX_CHUNK_SIZE, default=DEFAULT_MAX_CHUNK_SIZE): vol.All(
+            vol.Coerce(int), vol.Range(min=4, max=148)
+        ),
+        vol.Optional(CONF_COMPRESSION, default=DEFAULT_COMPRESSION): vol.In(CODECS),
+        vol.Optional(
+            CONF_COMPRESSION_LEVEL, default=DEFAULT_COMPRESSION_LEVEL
+        ): vol.All(vol.Coerce(int), vol.Range(min=1, max=19)),
+        vol.Optional(CONF_DEDUPLICATE, default=DEFAULT_DEDUPLICATE): bool,
+        vol.Optional(CONF_UPLOAD_LIMIT, default=0): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_DOWNLOAD_LIMIT, default=0): vol.All(
+            vol.Coerce(float), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_UNLIMITED_HOURS, default=""): str,
+        vol.Optional(CONF_CACHE_BACKUPS, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=100)
+        ),
+        vol.Optional(CONF_CACHE_SIZE, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+        vol.Optional(CONF_INCLUDE_SUBFOLDERS, default=DEFAULT_INCLUDE_SUBFOLDERS): bool,
+        vol.Optional(CONF_BACKUP_PATTERN, default=DEFAULT_BACKUP_PATTERN): str,
+        vol.Optional(CONF_IO_WORKERS, default=DEFAULT_IO_WORKERS): vol.All(
+            vol.Coerce(int), vol.Range(min=1, max=8)
+        ),
+        vol.Optional(CONF_KEEP_LAST, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=1000)
+        ),
+        vol.Optional(CONF_KEEP_DAILY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=366)
+        ),
+        vol.Optional(CONF_KEEP_WEEKLY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=520)
+        ),
+        vol.Optional(CONF_KEEP_MONTHLY, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0, max=240)
+        ),
+        vol.Optional(CONF_MAX_TOTAL_SIZE, default=0): vol.All(
+            vol.Coerce(int), vol.Range(min=0)
+        ),
+    }
+)
+
+
+class DropboxOptionsFlowHandler(config_entries.OptionsFlow):
+    """Handle transfer options for Dropbox Backup."""
+
+    async def async_step_init(self, user_input=None):
+        """Manage the transfer options."""
+        errors = {}
+        if user_input is not None:
+            try:
+                parse_windows(user_input.get(CONF_UNLIMITED_HOURS, ""))
+            except ValueError:
+                errors[CONF_UNLIMITED_HOURS] = "invalid_hours"
+            else:
+                return self.async_create_entry(data=user_input)
+
+        return self.async_show_form(
+            step_id="init",
+            data_schema=self.add_suggested_values_to_schema(
+                OPTIONS_SCHEMA, user_input or self.config_entry.options
+            ),
+            errors=errors,
+        )
@@ -2,15 +2,73 @@
 
 from __future__ import annotations
 from collections.abc import Callable
+from typing import TYPE_CHECKING
 
 from homeassistant.util.hass_dict import HassKey
 
+if TYPE_CHECKING:
+    from .backup import DropboxBackupAgent
+
 # The domain of your integration. This should match the directory name.
 DOMAIN = "dropboxbackup"  # :contentReference[oaicite:0]{index=0}
 CONF_FOLDER = "folder"
 # Default values
 DEFAULT_FOLDER = ""  # Root of the Dropbox app folder
 
+# Options
+CONF_DOWNLOAD_CONCURRENCY = "download_concurrency"
+CONF_DOWNLOAD_CHUNK_SIZE = "download_chunk_size"  # MiB per ranged request
+DEFAULT_DOWNLOAD_CONCURRENCY = 4
+DEFAULT_DOWNLOAD_CHUNK_SIZE = 8
+CONF_UPLOAD_CONCURRENCY = "upload_concurrency"
+DEFAULT_UPLOAD_CONCURRENCY = 1
+# Bounds of the adaptive upload chunk size, in MiB
+CONF_MIN_CHUNK_SIZE = "min_chunk_size"
+CONF_MAX_CHUNK_SIZE = "max_chunk_size"
+DEFAULT_MIN_CHUNK_SIZE = 4
+DEFAULT_MAX_CHUNK_SIZE = 32
+CONF_IO_WORKERS = "io_workers"  # Threads for blocking Dropbox work
+DEFAULT_IO_WORKERS = 2
+# Retention rules applied after each upload; 0 turns a rule off
+CONF_KEEP_LAST = "keep_last"
+CONF_KEEP_DAILY = "keep_daily"
+CONF_KEEP_WEEKLY = "keep_weekly"
+CONF_KEEP_MONTHLY = "keep_monthly"
+CONF_MAX_TOTAL_SIZE = "max_total_size"  # GiB
+# Compression of uploaded archives: "none", "gzip" or "zstd"
+CONF_COMPRESSION = "compression"
+CONF_COMPRESSION_LEVEL = "compression_level"
+DEFAULT_COMPRESSION = "none"
+DEFAULT_COMPRESSION_LEVEL = 3
+# Store backups as deduplicated chunks shared between backups
+CONF_DEDUPLICATE = "deduplicate"
+DEFAULT_DEDUPLICATE = False
+# Bandwidth caps in Mbit/s, 0 for none, lifted during the unlimited hours,
+# such as "01:00-06:00"
+CONF_UPLOAD_LIMIT = "upload_limit"
+CONF_DOWNLOAD_LIMIT = "download_limit"
+CONF_UNLIMITED_HOURS = "unlimited_hours"
+# Local cache of recent uploads: most backups and GiB kept, 0 for no limit;
+# with both at 0 there is no cache
+CONF_CACHE_BACKUPS = "cache_backups"
+CONF_CACHE_SIZE = "cache_size"
+# Look for backups in subfolders of the folder too
+CONF_INCLUDE_SUBFOLDERS = "include_subfolders"
+DEFAULT_INCLUDE_SUBFOLDERS = False
+# Only files with names matching one of these comma-separated patterns, such
+# as "*.tar", are listed as backups
+CONF_BACKUP_PATTERN = "backup_pattern"
+DEFAULT_BACKUP_PATTERN = "*"
+
+# Backup agent id kept in the entry data. Entries from before each entry had
+# an agent of its own carry the id of the one shared agent, so backup
+# settings that name it keep pointing at the same Dropbox folder.
+CONF_AGENT_ID = "agent_id"
+LEGACY_AGENT_ID = "dropbox_backup"
+
+# Agents by config entry id, kept across reloads of their entry
+DATA_AGENTS: HassKey[dict[str, DropboxBackupAgent]] = HassKey(f"{DOMAIN}.agents")
+
 DATA_BACKUP_AGENT_LISTENERS: HassKey[list[Callable[[], None]]] = HassKey(
     f"{DOMAIN}.backup_agent_listeners"
 )
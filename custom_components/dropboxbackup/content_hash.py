@@ -0,0 +1,39 @@
+"""Dropbox content hash, computed as data streams past."""
+
+import hashlib
+
+# Dropbox hashes files in blocks of this size.
+BLOCK_SIZE = 4 * 1024 * 1024
+
+
+class ContentHasher:
+    """Compute Dropbox's content_hash from data fed in pieces of any size.
+
+    Each 4 MiB block is hashed with SHA-256, and the content hash is the
+    SHA-256 of the concatenated block digests.
+    """
+
+    def __init__(self) -> None:
+        self._overall = hashlib.sha256()
+        self._block = hashlib.sha256()
+        self._block_size = 0
+
+    def update(self, data) -> None:
+        """Add the next piece of the file."""
+        view = memoryview(data)
+        while view:
+            if self._block_size == BLOCK_SIZE:
+                self._overall.update(self._block.digest())
+                self._block = hashlib.sha256()
+                self._block_size = 0
+            take = min(len(view), BLOCK_SIZE - self._block_size)
+            self._block.update(view[:take])
+            self._block_size += take
+            view = view[take:]
+
+    def hexdigest(self) -> str:
+        """Return the content hash of everything fed so far."""
+        overall = self._overall.copy()
+        if self._block_size:
+            overall.update(self._block.digest())
+        return overall.hexdigest()
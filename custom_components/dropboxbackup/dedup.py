@@ -0,0 +1,122 @@
+"""Content-defined chunking and manifests for deduplicated backups.
+
+In dedup mode an archive is stored as chunks named by their SHA-256 in a
+chunk folder shared by every backup, plus a small manifest at the backup's
+own path listing its chunks in order. Successive backups share every chunk
+whose content did not change, so only new chunks are uploaded.
+"""
+
+import hashlib
+import json
+import re
+
+from .compression import decompressor, detect_codec
+
+# Chunks of every backup in the folder live in this subfolder
+CHUNK_FOLDER = ".chunks"
+MIN_CHUNK_SIZE = 512 * 1024
+MAX_CHUNK_SIZE = 8 * 1024 * 1024
+# A chunk ends after the first boundary marker past MIN_CHUNK_SIZE: two fixed
+# bytes followed by one below 8. It turns up about every 2 MiB in compressed
+# or encrypted data, the bulk of a backup, is never valid UTF-8, and the regex
+# engine finds it far faster than Python could roll a hash over every byte.
+# As the boundaries depend only on the bytes around them, data inserted into
+# one chunk leaves the chunks after it unchanged.
+_BOUNDARY = re.compile(rb"\x8f\xd1[\x00-\x07]")
+_BOUNDARY_LENGTH = 3
+MANIFEST_VERSION = 1
+# Manifests are JSON that starts with this, which no tar archive does
+_MANIFEST_PREFIX = b'{"manifest":'
+
+
+class ContentChunker:
+    """Split a byte stream into content-defined chunks.
+
+    Data goes in with :meth:`feed` and comes out as chunks of MIN_CHUNK_SIZE
+    to MAX_CHUNK_SIZE bytes; :meth:`flush` returns whatever is left.
+    """
+
+    def __init__(
+        self, min_size: int = MIN_CHUNK_SIZE, max_size: int = MAX_CHUNK_SIZE
+    ) -> None:
+        self._min_size = min_size
+        self._max_size = max_size
+        self._buffer = bytearray()
+        # Where the search for the next boundary resumes
+        self._scanned = 0
+
+    def feed(self, data: bytes) -> list[bytes]:
+        """Add ``data`` and return the chunks it completed."""
+        self._buffer += data
+        chunks = []
+        while (end := self._boundary()) is not None:
+            chunks.append(bytes(self._buffer[:end]))
+            del self._buffer[:end]
+            self._scanned = 0
+        return chunks
+
+    def flush(self) -> bytes | None:
+        """Return the last, possibly short, chunk."""
+        if not self._buffer:
+            return None
+        chunk = bytes(self._buffer)
+        self._buffer.clear()
+        self._scanned = 0
+        return chunk
+
+    def _boundary(self) -> int | None:
+        """Return where the buffered chunk ends, None if that is not known yet."""
+        start = max(self._scanned, self._min_size)
+        if (match := _BOUNDARY.search(self._buffer, start, self._max_size)) is not None:
+            return match.end()
+        if len(self._buffer) >= self._max_size:
+            return self._max_size
+        # A marker may begin in the last bytes and end in the next data
+        self._scanned = max(len(self._buffer) - _BOUNDARY_LENGTH + 1, 0)
+        return None
+
+
+def chunk_id(data: bytes) -> str:
+    """Return the name of the chunk holding ``data``."""
+    return hashlib.sha256(data).hexdigest()
+
+
+def restore_chunk(name: str, data: bytes) -> bytes:
+    """Return the content of a downloaded chunk, checked against its name.
+
+    Chunks may be stored compressed. A chunk is only decompressed if it does
+    not match as stored, as raw backup data can begin with a codec's magic.
+    """
+    if chunk_id(data) == name:
+        return data
+    if (codec := detect_codec(data)) is not None:
+        data = decompressor(codec).decompress(data)
+        if chunk_id(data) == name:
+            return data
+    raise ValueError(f"Chunk {name} does not match its content")
+
+
+def dump_manifest(backup: dict, chunks: list[tuple[str, int]]) -> bytes:
+    """Serialize the manifest of a backup made of ``chunks``.
+
+    ``backup`` is its sidecar index entry, so the index can be rebuilt from
+    the manifests as it is from archives.
+    """
+    return json.dumps(
+        {"manifest": MANIFEST_VERSION, "backup": backup, "chunks": chunks},
+        separators=(",", ":"),
+    ).encode()
+
+
+def is_manifest(head: bytes) -> bool:
+    """Return True if a stored file starting with ``head`` is a manifest."""
+    return head.startswith(_MANIFEST_PREFIX)
+
+
+def load_manifest(data: bytes) -> dict:
+    """Return a manifest, with ``size`` set to the size of the backup."""
+    manifest = json.loads(data)
+    if manifest.get("manifest") != MANIFEST_VERSION:
+        raise ValueError(f"Unsupported manifest version {manifest.get('manifest')}")
+    manifest["size"] = sum(size for _name, size in manifest["chunks"])
+    return manifest
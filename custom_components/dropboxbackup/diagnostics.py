@@ -0,0 +1,26 @@
+"""Diagnostics for Dropbox Backup."""
+
+from typing import Any
+
+from homeassistant.components.diagnostics import async_redact_data
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.core import HomeAssistant
+
+TO_REDACT = {"token"}
+
+
+async def async_get_config_entry_diagnostics(
+    hass: HomeAssistant, entry: ConfigEntry
+) -> dict[str, Any]:
+    """Return the entry's settings and the agent's transfer metrics."""
+    agent = entry.runtime_data
+    return {
+        "entry": {
+            "data": async_redact_data(dict(entry.data), TO_REDACT),
+            "options": dict(entry.options),
+        },
+        "stored_bytes": agent.stored_bytes,
+        "operations": agent.metrics.as_dict(),
+        "worker_pool": agent.pool.stats() if agent.pool is not None else None,
+        "bandwidth_limits": agent.limiter.as_dict(),
+    }
@@ -0,0 +1,66 @@
+"""Backup metadata stored next to the archives in Dropbox."""
+
+import json
+import tarfile
+
+# One file in the backup folder holds the AgentBackup details of every archive
+INDEX_FILE = ".backup_index.json"
+INDEX_VERSION = 1
+# backup.json is the first member of a Home Assistant archive; give up looking
+# for it past this many bytes rather than read through a whole backup.
+ARCHIVE_HEADER_LIMIT = 1024 * 1024
+
+
+def dump_index(backups: dict[str, dict]) -> bytes:
+    """Serialize the metadata of ``backups`` for the index file."""
+    return json.dumps(
+        {"version": INDEX_VERSION, "backups": backups}, separators=(",", ":")
+    ).encode()
+
+
+def load_index(data: bytes) -> dict[str, dict]:
+    """Return the backup metadata held in an index file."""
+    index = json.loads(data)
+    if index.get("version") != INDEX_VERSION:
+        raise ValueError(f"Unsupported backup index version {index.get('version')}")
+    return index["backups"]
+
+
+def read_archive_metadata(fileobj) -> dict:
+    """Read backup.json from the start of a streamed backup archive.
+
+    Returns the backup in the form of ``AgentBackup.as_dict()``, following
+    how Home Assistant reads a local backup, without ``backup_id`` and
+    ``size``, which come from the Dropbox file instead.
+    """
+    data = None
+    with tarfile.open(fileobj=fileobj, mode="r|") as archive:
+        for member in archive:
+            if member.offset > ARCHIVE_HEADER_LIMIT:
+                break
+            if member.name in ("./backup.json", "backup.json"):
+                data = json.loads(archive.extractfile(member).read())
+                break
+    if data is None:
+        raise KeyError("backup.json not found at the start of the archive")
+
+    homeassistant = data.get("homeassistant") or {}
+    homeassistant_included = "version" in homeassistant
+    extra_metadata = data.get("extra", {})
+    return {
+        "addons": [
+            {"name": addon["name"], "slug": addon["slug"], "version": addon["version"]}
+            for addon in data.get("addons", [])
+        ],
+        "date": extra_metadata.get("supervisor.backup_request_date", data["date"]),
+        "database_included": homeassistant_included
+        and not homeassistant.get("exclude_database", False),
+        "extra_metadata": extra_metadata,
+        "folders": [
+            folder for folder in data.get("folders", []) if folder != "homeassistant"
+        ],
+        "homeassistant_included": homeassistant_included,
+        "homeassistant_version": homeassistant.get("version"),
+        "name": data["name"],
+        "protected": data.get("protected", False),
+    }
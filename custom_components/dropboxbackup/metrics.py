@@ -0,0 +1,164 @@
+"""Timings and counters of the agent's Dropbox operations."""
+
+import time
+from collections.abc import Callable
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import asdict, dataclass, field
+
+from .retry import retries_spent
+
+# Operations the agent records
+OPERATIONS = (
+    "list",
+    "get",
+    "upload",
+    "upload_chunk",
+    "download",
+    "delete",
+    "token_refresh",
+    "warm_up",
+)
+
+
+@dataclass
+class OperationRecord:
+    """What one operation cost."""
+
+    operation: str
+    started: float = field(default_factory=time.monotonic)
+    duration: float = 0.0
+    bytes: int = 0
+    api_calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+    failed: bool = False
+
+    @property
+    def bytes_per_second(self) -> float | None:
+        """Return the transfer rate, if bytes were moved."""
+        if not self.bytes or self.duration <= 0:
+            return None
+        return self.bytes / self.duration
+
+    def as_dict(self) -> dict:
+        """Return the record for diagnostics."""
+        record = asdict(self)
+        del record["started"]
+        record["bytes_per_second"] = self.bytes_per_second
+        return record
+
+
+@dataclass
+class OperationTotals:
+    """Sums over every record of one operation."""
+
+    count: int = 0
+    failures: int = 0
+    duration: float = 0.0
+    bytes: int = 0
+    api_calls: int = 0
+    retries: int = 0
+    throttled: int = 0
+
+    def add(self, record: OperationRecord) -> None:
+        self.count += 1
+        self.failures += record.failed
+        self.duration += record.duration
+        self.bytes += record.bytes
+        self.api_calls += record.api_calls
+        self.retries += record.retries
+        self.throttled += record.throttled
+
+
+# Like the retry budget, the record of the running operation is found through
+# the context, so requests made deep inside it are counted against it.
+_current: ContextVar[OperationRecord | None] = ContextVar(
+    "dropboxbackup_operation", default=None
+)
+
+
+def count_api_call() -> None:
+    """Count a request against the current operation."""
+    if (record := _current.get()) is not None:
+        record.api_calls += 1
+
+
+def count_throttled() -> None:
+    """Count a rate-limited request against the current operation."""
+    if (record := _current.get()) is not None:
+        record.throttled += 1
+
+
+class TransferMetrics:
+    """Last and total cost of each operation, kept in memory.
+
+    Recording is a few additions per operation, so it always runs. Listeners
+    are called when an operation finishes.
+    """
+
+    def __init__(self) -> None:
+        self.last: dict[str, OperationRecord] = {}
+        self.totals: dict[str, OperationTotals] = {
+            operation: OperationTotals() for operation in OPERATIONS
+        }
+        self._listeners: list[Callable[[], None]] = []
+
+    def start(self, operation: str) -> OperationRecord:
+        """Return a new record of ``operation``.
+
+        Requests count against it only inside ``counting``, so a record that
+        is never finished is not left current.
+        """
+        return OperationRecord(operation)
+
+    @contextmanager
+    def counting(self, record: OperationRecord):
+        """Count the requests made in the ``with`` block against ``record``."""
+        token = _current.set(record)
+        try:
+            yield record
+        finally:
+            _current.reset(token)
+
+    def finish(self, record: OperationRecord, failed: bool = False) -> None:
+        """Record a finished operation and tell the listeners."""
+        record.duration = time.monotonic() - record.started
+        record.retries = retries_spent()
+        record.failed = failed
+        self.add(record)
+        self.notify()
+
+    @contextmanager
+    def operation(self, operation: str):
+        """Record the operation run in the ``with`` block."""
+        record = self.start(operation)
+        try:
+            with self.counting(record):
+                yield record
+        except BaseException:
+            self.finish(record, failed=True)
+            raise
+        self.finish(record)
+
+    def add(self, record: OperationRecord) -> None:
+        """Record a finished ``record`` without telling the listeners."""
+        self.last[record.operation] = record
+        self.totals.setdefault(record.operation, OperationTotals()).add(record)
+
+    def async_add_listener(self, listener: Callable[[], None]) -> Callable[[], None]:
+        """Call ``listener`` when an operation finishes; returns a remover."""
+        self._listeners.append(listener)
+        return lambda: self._listeners.remove(listener)
+
+    def notify(self) -> None:
+        """Call the listeners."""
+        for listener in list(self._listeners):
+            listener()
+
+    def as_dict(self) -> dict:
+        """Return the metrics for diagnostics."""
+        return {
+            "last": {name: record.as_dict() for name, record in self.last.items()},
+            "totals": {name: asdict(totals) for name, totals in self.totals.items()},
+        }
@@ -0,0 +1,69 @@
+"""Retention rules for the backups kept in Dropbox."""
+
+from datetime import UTC, datetime
+
+from homeassistant.components.backup import AgentBackup
+from homeassistant.util import dt as dt_util
+
+
+def expired_backups(
+    backups: list[AgentBackup],
+    *,
+    keep_last: int = 0,
+    keep_daily: int = 0,
+    keep_weekly: int = 0,
+    keep_monthly: int = 0,
+    max_total_bytes: int = 0,
+) -> list[str]:
+    """Return the ids of backups that no retention rule keeps.
+
+    The newest ``keep_last`` backups are kept, plus the newest backup of each
+    of the last ``keep_daily`` days, ``keep_weekly`` ISO weeks and
+    ``keep_monthly`` months that have one. With no count rule set, every
+    backup is kept by count. ``max_total_bytes`` then drops the oldest kept
+    backups until the rest fit. The newest backup is never expired. A rule
+    set to 0 is off.
+    """
+    newest_first = sorted(backups, key=lambda backup: _local_date(backup), reverse=True)
+    if not newest_first:
+        return []
+
+    if keep_last or keep_daily or keep_weekly or keep_monthly:
+        keep = {backup.backup_id for backup in newest_first[:keep_last]}
+        for count, bucket in (
+            (keep_daily, lambda date: date.date()),
+            (keep_weekly, lambda date: date.isocalendar()[:2]),
+            (keep_monthly, lambda date: (date.year, date.month)),
+        ):
+            seen = set()
+            for backup in newest_first:
+                if len(seen) >= count:
+                    break
+                if (key := bucket(_local_date(backup))) not in seen:
+                    seen.add(key)
+                    keep.add(backup.backup_id)
+    else:
+        keep = {backup.backup_id for backup in newest_first}
+
+    if max_total_bytes:
+        total = 0
+        for backup in newest_first:
+            if backup.backup_id not in keep:
+                continue
+            total += backup.size
+            if total > max_total_bytes and backup is not newest_first[0]:
+                keep.discard(backup.backup_id)
+
+    keep.add(newest_first[0].backup_id)
+    return [backup.backup_id for backup in newest_first if backup.backup_id not in keep]
+
+
+def _local_date(backup: AgentBackup) -> datetime:
+    """Return when ``backup`` was made, in Home Assistant's time zone."""
+    date = backup.date
+    if not isinstance(date, datetime):
+        date = datetime.fromisoformat(date)
+    if date.tzinfo is None:
+        # Dropbox reports server_modified as naive UTC
+        date = date.replace(tzinfo=UTC)
+    return dt_util.as_local(date)
@@ -0,0 +1,112 @@
+"""Retry policy for Dropbox requests."""
+
+import random
+from contextvars import ContextVar
+
+import aiohttp
+
+# Attempts for a single request before its error is raised.
+REQUEST_ATTEMPTS = 5
+# Retries shared by every request of one backup operation.
+OPERATION_RETRY_BUDGET = 20
+# Base of the exponential backoff in seconds, and its ceiling.
+RETRY_BASE_DELAY = 1.0
+RETRY_MAX_DELAY = 60.0
+# Used when Dropbox rate limits a request without saying how long to wait.
+RATE_LIMIT_DELAY = 5.0
+
+
+class RetryBudget:
+    """Number of retries an operation may still spend across its requests."""
+
+    def __init__(self, retries: int = OPERATION_RETRY_BUDGET) -> None:
+        self.remaining = retries
+        self.spent = 0
+
+    def take(self) -> bool:
+        """Spend one retry, returning False once the budget is exhausted."""
+        if self.remaining <= 0:
+            return False
+        self.remaining -= 1
+        self.spent += 1
+        return True
+
+
+# Tasks copy the context they are created in, so the chunk and range tasks of
+# an operation draw from the same budget as the operation itself.
+_budget: ContextVar[RetryBudget | None] = ContextVar(
+    "dropboxbackup_retry_budget", default=None
+)
+
+
+def start_operation(retries: int = OPERATION_RETRY_BUDGET) -> RetryBudget:
+    """Give the current operation a fresh retry budget."""
+    budget = RetryBudget(retries)
+    _budget.set(budget)
+    return budget
+
+
+def take_retry() -> bool:
+    """Spend a retry from the current operation's budget, if it has one."""
+    budget = _budget.get()
+    return budget is None or budget.take()
+
+
+def retries_spent() -> int:
+    """Return how many retries the current operation has spent so far."""
+    budget = _budget.get()
+    return budget.spent if budget is not None else 0
+
+
+def backoff_delay(attempt: int, retry_after: float | None = None) -> float:
+    """Return how long to wait before retry number ``attempt``.
+
+    A delay requested by the server is honoured as is; otherwise the delay is
+    drawn uniformly up to an exponentially growing cap ("full jitter") so that
+    parallel requests failing together do not retry in lockstep.
+    """
+    if retry_after is not None:
+        return max(retry_after, 0.0)
+    cap = min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2 ** (attempt - 1))
+    return random.uniform(0, cap)
+
+
+def retry_delay(err: Exception, attempt: int) -> float | None:
+    """Return the delay before retrying a request that raised ``err``.
+
+    Returns None if the error is not transient and retrying cannot help.
+    """
+    import requests
+    from dropbox.exceptions import HttpError, InternalServerError, RateLimitError
+
+    if isinstance(err, RateLimitError):
+        # The SDK reads the Retry-After header into ``backoff``
+        backoff = err.backoff if err.backoff is not None else RATE_LIMIT_DELAY
+        return backoff_delay(attempt, backoff)
+    if isinstance(err, InternalServerError) or (
+        isinstance(err, HttpError) and err.status_code in (429, 502, 503, 504)
+    ):
+        return backoff_delay(attempt)
+    if isinstance(
+        err,
+        (
+            requests.exceptions.ConnectionError,
+            requests.exceptions.Timeout,
+            requests.exceptions.ChunkedEncodingError,
+            aiohttp.ClientConnectionError,
+            aiohttp.ClientPayloadError,
+            TimeoutError,
+        ),
+    ):
+        return backoff_delay(attempt)
+    return None
+
+
+def parse_retry_after(value: str | None) -> float | None:
+    """Return the seconds in a Retry-After header, if it holds a number."""
+    if value is None:
+        return None
+    try:
+        return float(value)
+    except ValueError:
+        return None
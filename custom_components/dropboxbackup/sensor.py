@@ -0,0 +1,115 @@
+"""Sensors reporting how the Dropbox backups are transferring."""
+
+from collections.abc import Callable
+from dataclasses import dataclass
+
+from homeassistant.components.sensor import (
+    SensorDeviceClass,
+    SensorEntity,
+    SensorEntityDescription,
+    SensorStateClass,
+)
+from homeassistant.config_entries import ConfigEntry
+from homeassistant.const import UnitOfDataRate, UnitOfInformation, UnitOfTime
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.device_registry import DeviceEntryType, DeviceInfo
+from homeassistant.helpers.entity_platform import AddEntitiesCallback
+
+from .backup import DropboxBackupAgent
+from .const import DOMAIN
+
+
+@dataclass(frozen=True, kw_only=True)
+class DropboxSensorEntityDescription(SensorEntityDescription):
+    """Describes a Dropbox Backup sensor."""
+
+    value_fn: Callable[[DropboxBackupAgent], float | int | None]
+
+
+def _upload_throughput(agent: DropboxBackupAgent) -> float | None:
+    record = agent.metrics.last.get("upload")
+    return record.bytes_per_second if record else None
+
+
+def _upload_duration(agent: DropboxBackupAgent) -> float | None:
+    record = agent.metrics.last.get("upload")
+    return record.duration if record else None
+
+
+SENSORS = (
+    DropboxSensorEntityDescription(
+        key="last_upload_throughput",
+        translation_key="last_upload_throughput",
+        device_class=SensorDeviceClass.DATA_RATE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfDataRate.BYTES_PER_SECOND,
+        suggested_unit_of_measurement=UnitOfDataRate.MEBIBYTES_PER_SECOND,
+        suggested_display_precision=1,
+        value_fn=_upload_throughput,
+    ),
+    DropboxSensorEntityDescription(
+        key="last_backup_duration",
+        translation_key="last_backup_duration",
+        device_class=SensorDeviceClass.DURATION,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfTime.SECONDS,
+        suggested_display_precision=0,
+        value_fn=_upload_duration,
+    ),
+    DropboxSensorEntityDescription(
+        key="stored_bytes",
+        translation_key="stored_bytes",
+        device_class=SensorDeviceClass.DATA_SIZE,
+        state_class=SensorStateClass.MEASUREMENT,
+        native_unit_of_measurement=UnitOfInformation.BYTES,
+        suggested_unit_of_measurement=UnitOfInformation.GIBIBYTES,
+        suggested_display_precision=2,
+        value_fn=lambda agent: agent.stored_bytes,
+    ),
+)
+
+
+async def async_setup_entry(
+    hass: HomeAssistant, entry: ConfigEntry, async_add_entities: AddEntitiesCallback
+) -> None:
+    """Set up the transfer sensors of a Dropbox Backup entry."""
+    async_add_entities(
+        DropboxBackupSensor(entry, entry.runtime_data, description)
+        for description in SENSORS
+    )
+
+
+class DropboxBackupSensor(SensorEntity):
+    """A figure from the agent's transfer metrics.
+
+    The state is written whenever an operation finishes, so nothing polls.
+    """
+
+    entity_description: DropboxSensorEntityDescription
+    _attr_has_entity_name = True
+    _attr_should_poll = False
+
+    def __init__(
+        self,
+        entry: ConfigEntry,
+        agent: DropboxBackupAgent,
+        description: DropboxSensorEntityDescription,
+    ) -> None:
+        self.entity_description = description
+        self._agent = agent
+        self._attr_unique_id = f"{entry.entry_id}_{description.key}"
+        self._attr_device_info = DeviceInfo(
+            identifiers={(DOMAIN, entry.entry_id)},
+            name=entry.title,
+            manufacturer="Dropbox",
+            entry_type=DeviceEntryType.SERVICE,
+        )
+
+    @property
+    def native_value(self) -> float | int | None:
+        return self.entity_description.value_fn(self._agent)
+
+    async def async_added_to_hass(self) -> None:
+        self.async_on_remove(
+            self._agent.metrics.async_add_listener(self.async_write_ha_state)
+        )
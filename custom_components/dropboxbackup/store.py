@@ -0,0 +1,69 @@
+"""Persistent state for the Dropbox Backup integration."""
+
+import time
+
+from homeassistant.core import HomeAssistant
+from homeassistant.helpers.storage import Store
+
+from .const import DOMAIN
+
+STORAGE_VERSION = 1
+# Saved upload sessions older than this are discarded rather than resumed;
+# Dropbox keeps an unfinished session for up to a week.
+UPLOAD_SESSION_MAX_AGE = 2 * 24 * 60 * 60
+# Offsets acknowledged after each chunk are written at most this often, in
+# seconds. A lost offset is recovered from Dropbox when the upload resumes.
+SAVE_DELAY = 10
+
+
+class UploadSessionStore:
+    """Remember open upload sessions so an interrupted upload can resume.
+
+    Sessions are keyed by destination path and hold the Dropbox session id,
+    the last offset Dropbox acknowledged and a fingerprint of the backup.
+    A session is saved at once when it opens and when it closes; offsets in
+    between are saved with a delay.
+    """
+
+    def __init__(self, hass: HomeAssistant, entry_id: str) -> None:
+        self._store = Store(
+            hass, STORAGE_VERSION, f"{DOMAIN}.{entry_id}.upload_sessions"
+        )
+        self._sessions: dict[str, dict] | None = None
+
+    async def _async_sessions(self) -> dict[str, dict]:
+        """Return the stored sessions, loading them on first use."""
+        if self._sessions is None:
+            sessions = await self._store.async_load() or {}
+            # Sessions too old to resume are dropped as they are loaded
+            cutoff = time.time() - UPLOAD_SESSION_MAX_AGE
+            self._sessions = {
+                path: session
+                for path, session in sessions.items()
+                if session.get("started", 0) >= cutoff
+            }
+            if len(self._sessions) < len(sessions):
+                await self._store.async_save(self._sessions)
+        return self._sessions
+
+    async def async_get(self, path: str) -> dict | None:
+        """Return the saved session for ``path``, if any."""
+        return (await self._async_sessions()).get(path)
+
+    async def async_set(self, path: str, session: dict) -> None:
+        """Save the session for ``path``."""
+        sessions = await self._async_sessions()
+        sessions[path] = session
+        await self._store.async_save(sessions)
+
+    async def async_update(self, path: str, session: dict) -> None:
+        """Update the session for ``path``, saving it after SAVE_DELAY."""
+        sessions = await self._async_sessions()
+        sessions[path] = session
+        self._store.async_delay_save(lambda: sessions, SAVE_DELAY)
+
+    async def async_remove(self, path: str) -> None:
+        """Forget the session for ``path``."""
+        sessions = await self._async_sessions()
+        if sessions.pop(path, None) is not None:
+            await self._store.async_save(sessions)
@@ -0,0 +1,72 @@
+"""Worker threads for the integration's blocking work."""
+
+import asyncio
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+
+class WorkerPool:
+    """Run blocking Dropbox work on threads of its own.
+
+    Keeping it off Home Assistant's shared executor means a long backup
+    cannot hold up other integrations' jobs. Queue depth and time spent
+    waiting for a free worker are tracked for diagnostics.
+    """
+
+    def __init__(self, workers: int, name: str) -> None:
+        self.workers = workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=workers, thread_name_prefix=name
+        )
+        # Jobs submitted and not yet finished
+        self.in_flight = 0
+        self.peak_queue_depth = 0
+        self.jobs = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """Return the number of jobs waiting for a free worker."""
+        return max(0, self.in_flight - self.workers)
+
+    async def async_run(self, func, *args):
+        """Run ``func(*args)`` on a worker thread and return its result."""
+        submitted = started = time.monotonic()
+
+        def _job():
+            nonlocal started
+            started = time.monotonic()
+            return func(*args)
+
+        self.in_flight += 1
+        self.peak_queue_depth = max(self.peak_queue_depth, self.queue_depth)
+        try:
+            return await asyncio.get_running_loop().run_in_executor(
+                self._executor, _job
+            )
+        finally:
+            self.in_flight -= 1
+            wait = started - submitted
+            self.jobs += 1
+            self.wait_total += wait
+            self.wait_max = max(self.wait_max, wait)
+
+    def stats(self) -> dict:
+        """Return the pool's queue and wait-time metrics."""
+        return {
+            "workers": self.workers,
+            "in_flight": self.in_flight,
+            "queue_depth": self.queue_depth,
+            "peak_queue_depth": self.peak_queue_depth,
+            "jobs": self.jobs,
+            "average_wait": self.wait_total / self.jobs if self.jobs else 0.0,
+            "max_wait": self.wait_max,
+        }
+
+    def shutdown(self) -> None:
+        """Stop the worker threads once the jobs already submitted finish.
+
+        Those jobs belong to transfers still running, so they are not dropped.
+        """
+        self._executor.shutdown(wait=False)
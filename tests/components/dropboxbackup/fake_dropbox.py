@@ -0,0 +1,482 @@
+"""Local stand-in for the Dropbox API endpoints the backup agent uses.
+
+Runs an aiohttp server on 127.0.0.1 that speaks the same JSON as Dropbox for
+listing, uploads, downloads, temporary links, copies and deletes. Latency,
+bandwidth and failures can be configured, and every request is counted, so
+tests and benchmarks can drive the agent end to end without the network.
+
+Large files are not kept in memory: seeded files are generated from a fixed
+pattern, and uploaded files are only kept when they are small.
+"""
+
+import asyncio
+import json
+import random
+from collections import Counter
+from dataclasses import dataclass, field
+from itertools import count
+from typing import Self
+
+from aiohttp import web
+
+from custom_components.dropboxbackup.content_hash import ContentHasher
+
+# Seeded files repeat this 1 MiB block
+PATTERN = bytes(range(256)) * 4096
+# Uploaded files up to this size are kept so they can be downloaded again
+KEEP_CONTENT_LIMIT = 64 * 1024 * 1024
+# Pieces in which bodies are streamed and throttled
+PIECE_SIZE = 256 * 1024
+
+
+@dataclass
+class FakeFile:
+    """A file in the fake Dropbox."""
+
+    path_display: str
+    size: int
+    content: bytes | None = None
+    content_hash: str | None = None
+    id: int = 0
+
+    @property
+    def path_lower(self) -> str:
+        return self.path_display.lower()
+
+    def metadata(self) -> dict:
+        return {
+            ".tag": "file",
+            "name": self.path_display.rsplit("/", 1)[-1],
+            "id": f"id:{self.id}",
+            "client_modified": "2025-06-01T03:00:00Z",
+            "server_modified": "2025-06-01T03:00:00Z",
+            "rev": f"{self.id:016x}",
+            "size": self.size,
+            "path_lower": self.path_lower,
+            "path_display": self.path_display,
+            **({"content_hash": self.content_hash} if self.content_hash else {}),
+        }
+
+    def read(self, start: int = 0, end: int | None = None):
+        """Yield bytes ``start`` to ``end`` (inclusive) in pieces."""
+        end = self.size - 1 if end is None else min(end, self.size - 1)
+        position = start
+        while position <= end:
+            stop = min(end + 1, position + PIECE_SIZE)
+            if self.content is not None:
+                yield self.content[position:stop]
+            else:
+                offset = position % len(PATTERN)
+                stop = min(stop, position + len(PATTERN) - offset)
+                yield PATTERN[offset : offset + stop - position]
+            position = stop
+
+
+@dataclass
+class UploadSession:
+    """An open upload session."""
+
+    hasher: ContentHasher = field(default_factory=ContentHasher)
+    size: int = 0
+    parts: list[bytes] | None = None
+    # Concurrent sessions may receive appends out of order
+    pending: dict[int, bytes] = field(default_factory=dict)
+    concurrent: bool = False
+    closed: bool = False
+
+
+class FakeDropbox:
+    """Fake Dropbox server, used as ``async with FakeDropbox() as server``.
+
+    ``latency`` delays every response by that many seconds, ``bandwidth``
+    throttles request and response bodies to that many bytes per second, and
+    ``error_rate`` answers that share of API requests with a 503. Specific
+    failures are queued with :meth:`fail`.
+    """
+
+    def __init__(
+        self,
+        *,
+        latency: float = 0.0,
+        bandwidth: float | None = None,
+        error_rate: float = 0.0,
+        page_size: int = 500,
+        keep_content_limit: int = KEEP_CONTENT_LIMIT,
+        seed: int = 0,
+    ) -> None:
+        self.latency = latency
+        self.bandwidth = bandwidth
+        self.error_rate = error_rate
+        self.page_size = page_size
+        self.keep_content_limit = keep_content_limit
+        self.files: dict[str, FakeFile] = {}
+        self.requests: Counter[str] = Counter()
+        self._random = random.Random(seed)
+        self._failures: dict[str, list[tuple[int, dict | None]]] = {}
+        self._sessions: dict[str, UploadSession] = {}
+        self._jobs: dict[str, list] = {}
+        self._ids = count(1)
+        # Change log for list_folder cursors: (sequence, path_lower, file)
+        self._changes: list[tuple[int, str, FakeFile | None]] = []
+        self._sequence = 0
+        # Cursors older than this are reported as reset
+        self._cursor_floor = 0
+        self._changed = asyncio.Event()
+        self._runner: web.AppRunner | None = None
+        self.url = ""
+
+    async def __aenter__(self) -> Self:
+        app = web.Application(client_max_size=0)
+        app.router.add_post("/2/files/{route:.+}", self._handle_api)
+        app.router.add_get("/content/{file_id}", self._handle_link)
+        self._runner = web.AppRunner(app)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]
+        self.url = f"http://127.0.0.1:{port}"
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self._runner.cleanup()
+
+    @property
+    def hosts(self) -> dict[str, str]:
+        """Return the API hosts to use instead of Dropbox's."""
+        return {"api": self.url, "content": self.url}
+
+    @property
+    def longpoll_url(self) -> str:
+        """Return the list_folder/longpoll URL."""
+        return f"{self.url}/2/files/list_folder/longpoll"
+
+    def fail(self, route: str, status: int = 503, times: int = 1, error=None):
+        """Answer the next ``times`` calls of ``route`` with ``status``."""
+        self._failures.setdefault(route, []).extend([(status, error)] * times)
+
+    def add_file(
+        self, path: str, size: int, content: bytes | None = None, hashed=True
+    ) -> FakeFile:
+        """Put a file in the fake Dropbox, generated from PATTERN by default."""
+        file = FakeFile(path, size, content, id=next(self._ids))
+        if hashed:
+            hasher = ContentHasher()
+            for piece in file.read():
+                hasher.update(piece)
+            file.content_hash = hasher.hexdigest()
+        self._store(file)
+        return file
+
+    def expire_cursors(self) -> None:
+        """Make every listing cursor handed out so far report a reset."""
+        self._cursor_floor = self._sequence
+
+    def _store(self, file: FakeFile) -> None:
+        self.files[file.path_lower] = file
+        self._record(file.path_lower, file)
+
+    def _remove(self, path_lower: str) -> FakeFile | None:
+        file = self.files.pop(path_lower, None)
+        if file is not None:
+            self._record(path_lower, None)
+        return file
+
+    def _record(self, path_lower: str, file: FakeFile | None) -> None:
+        self._sequence += 1
+        self._changes.append((self._sequence, path_lower, file))
+        self._changed.set()
+        self._changed = asyncio.Event()
+
+    async def _handle_api(self, request: web.Request) -> web.StreamResponse:
+        route = request.match_info["route"]
+        self.requests[route] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        if route != "list_folder/longpoll":
+            if not request.headers.get("Authorization", "").startswith("Bearer "):
+                return _error(401, {".tag": "invalid_access_token"})
+            if failures := self._failures.get(route):
+                status, error = failures.pop(0)
+                return _failure(status, error)
+            if self._random.random() < self.error_rate:
+                return _failure(503, None)
+
+        if "Dropbox-API-Arg" in request.headers:
+            arg = json.loads(request.headers["Dropbox-API-Arg"])
+        else:
+            arg = json.loads(await request.read() or b"null")
+
+        handler = getattr(self, "_route_" + route.replace("/", "_"), None)
+        if handler is None:
+            return web.Response(status=404, text=f"Unknown route {route}")
+        return await handler(request, arg)
+
+    async def _read_body(self, request: web.Request):
+        """Yield the request body in throttled pieces."""
+        async for piece in request.content.iter_chunked(PIECE_SIZE):
+            await self._throttle(len(piece))
+            yield piece
+
+    async def _throttle(self, size: int) -> None:
+        if self.bandwidth:
+            await asyncio.sleep(size / self.bandwidth)
+
+    def _lookup(self, path: str) -> FakeFile | None:
+        return self.files.get(path.lower())
+
+    async def _route_list_folder(self, request, arg):
+        # A cursor remembers the folder and whether subfolders are included
+        scope = [arg["path"].lower(), arg.get("recursive", False)]
+        paths = sorted(path for path in self.files if _in_scope(path, scope))
+        size = min(arg.get("limit") or self.page_size, self.page_size)
+        return self._page(scope, paths, 0, self._sequence, size)
+
+    async def _route_list_folder_continue(self, request, arg):
+        kind, scope, *state = json.loads(arg["cursor"])
+        if kind == "page":
+            return self._page(scope, *state)
+        (sequence,) = state
+        if sequence < self._cursor_floor:
+            return _error(409, {".tag": "reset"})
+        entries = {}
+        for change, path, file in self._changes:
+            if change > sequence and _in_scope(path, scope):
+                entries[path] = (
+                    file.metadata()
+                    if file is not None
+                    else {
+                        ".tag": "deleted",
+                        "name": path.rsplit("/", 1)[-1],
+                        "path_lower": path,
+                        "path_display": path,
+                    }
+                )
+        return web.json_response(
+            {
+                "entries": list(entries.values()),
+                "cursor": json.dumps(["delta", scope, self._sequence]),
+                "has_more": False,
+            }
+        )
+
+    def _page(self, scope, paths, position, sequence, size):
+        page = paths[position : position + size]
+        position += len(page)
+        has_more = position < len(paths)
+        cursor = (
+            ["page", scope, paths, position, sequence, size]
+            if has_more
+            else ["delta", scope, sequence]
+        )
+        return web.json_response(
+            {
+                "entries": [
+                    self.files[path].metadata() for path in page if path in self.files
+                ],
+                "cursor": json.dumps(cursor),
+                "has_more": has_more,
+            }
+        )
+
+    async def _route_list_folder_longpoll(self, request, arg):
+        kind, _scope, *state = json.loads(arg["cursor"])
+        sequence = state[2] if kind == "page" else state[0]
+        if self._sequence <= sequence:
+            try:
+                await asyncio.wait_for(self._changed.wait(), min(arg["timeout"], 30))
+            except TimeoutError:
+                pass
+        return web.json_response({"changes": self._sequence > sequence})
+
+    async def _route_get_metadata(self, request, arg):
+        if (file := self._lookup(arg["path"])) is None:
+            return _not_found("path")
+        return web.json_response(file.metadata())
+
+    async def _route_delete_v2(self, request, arg):
+        if (file := self._remove(arg["path"].lower())) is None:
+            return _not_found("path_lookup")
+        return web.json_response({"metadata": file.metadata()})
+
+    async def _route_delete_batch(self, request, arg):
+        entries = []
+        for entry in arg["entries"]:
+            if (file := self._remove(entry["path"].lower())) is None:
+                entries.append(
+                    {
+                        ".tag": "failure",
+                        "failure": {
+                            ".tag": "path_lookup",
+                            "path_lookup": {".tag": "not_found"},
+                        },
+                    }
+                )
+            else:
+                entries.append({".tag": "success", "metadata": file.metadata()})
+        job_id = f"job{next(self._ids)}"
+        self._jobs[job_id] = entries
+        return web.json_response({".tag": "async_job_id", "async_job_id": job_id})
+
+    async def _route_delete_batch_check(self, request, arg):
+        entries = self._jobs.pop(arg["async_job_id"])
+        return web.json_response({".tag": "complete", "entries": entries})
+
+    async def _route_copy_v2(self, request, arg):
+        if (source := self._lookup(arg["from_path"])) is None:
+            return _not_found("from_lookup")
+        file = FakeFile(
+            arg["to_path"],
+            source.size,
+            source.content,
+            source.content_hash,
+            next(self._ids),
+        )
+        self._store(file)
+        return web.json_response({"metadata": file.metadata()})
+
+    async def _route_get_temporary_link(self, request, arg):
+        if (file := self._lookup(arg["path"])) is None:
+            return _not_found("path")
+        return web.json_response(
+            {"metadata": file.metadata(), "link": f"{self.url}/content/{file.id}"}
+        )
+
+    async def _route_download(self, request, arg):
+        if (file := self._lookup(arg["path"])) is None:
+            return _not_found("path")
+        resp = web.StreamResponse(
+            headers={
+                "Dropbox-API-Result": json.dumps(file.metadata()),
+                "Content-Type": "application/octet-stream",
+            }
+        )
+        resp.content_length = file.size
+        await resp.prepare(request)
+        for piece in file.read():
+            await self._throttle(len(piece))
+            await resp.write(piece)
+        await resp.write_eof()
+        return resp
+
+    async def _handle_link(self, request: web.Request) -> web.StreamResponse:
+        self.requests["temporary_link"] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+        if failures := self._failures.get("temporary_link"):
+            status, _error_body = failures.pop(0)
+            return web.Response(status=status)
+        file_id = int(request.match_info["file_id"])
+        file = next((f for f in self.files.values() if f.id == file_id), None)
+        if file is None:
+            return web.Response(status=404)
+        start, end = 0, file.size - 1
+        if (header := request.headers.get("Range")) is not None:
+            first, last = header.removeprefix("bytes=").split("-")
+            start, end = int(first), min(int(last), file.size - 1)
+        resp = web.StreamResponse(status=206 if header else 200)
+        resp.content_length = end - start + 1
+        await resp.prepare(request)
+        for piece in file.read(start, end):
+            await self._throttle(len(piece))
+            await resp.write(piece)
+        await resp.write_eof()
+        return resp
+
+    async def _route_upload(self, request, arg):
+        session = self._session()
+        async for piece in self._read_body(request):
+            self._append(session, piece)
+        return self._commit(session, arg["path"])
+
+    async def _route_upload_session_start(self, request, arg):
+        session_id = f"session{next(self._ids)}"
+        session = self._session()
+        session.concurrent = arg.get("session_type") in (
+            "concurrent",
+            {".tag": "concurrent"},
+        )
+        self._sessions[session_id] = session
+        async for piece in self._read_body(request):
+            self._append(session, piece)
+        session.closed = arg.get("close", False)
+        return web.json_response({"session_id": session_id})
+
+    async def _route_upload_session_append_v2(self, request, arg):
+        cursor = arg["cursor"]
+        if (session := self._sessions.get(cursor["session_id"])) is None:
+            return _error(409, {".tag": "not_found"})
+        offset = cursor["offset"]
+        if session.concurrent:
+            data = b"".join([piece async for piece in self._read_body(request)])
+            session.pending[offset] = data
+            while (data := session.pending.pop(session.size, None)) is not None:
+                self._append(session, data)
+        else:
+            if offset != session.size:
+                return _error(
+                    409,
+                    {
+                        ".tag": "incorrect_offset",
+                        "incorrect_offset": {"correct_offset": session.size},
+                    },
+                )
+            async for piece in self._read_body(request):
+                self._append(session, piece)
+        session.closed = arg.get("close", False)
+        return web.json_response(None)
+
+    async def _route_upload_session_finish(self, request, arg):
+        cursor = arg["cursor"]
+        if (session := self._sessions.pop(cursor["session_id"], None)) is None:
+            return _error(
+                409, {".tag": "lookup_failed", "lookup_failed": {".tag": "not_found"}}
+            )
+        async for piece in self._read_body(request):
+            self._append(session, piece)
+        return self._commit(session, arg["commit"]["path"])
+
+    def _session(self) -> UploadSession:
+        return UploadSession(parts=[] if self.keep_content_limit else None)
+
+    def _append(self, session: UploadSession, piece: bytes) -> None:
+        session.hasher.update(piece)
+        session.size += len(piece)
+        if session.parts is not None:
+            session.parts.append(piece)
+            if session.size > self.keep_content_limit:
+                session.parts = None
+
+    def _commit(self, session: UploadSession, path: str) -> web.Response:
+        content = b"".join(session.parts) if session.parts is not None else None
+        file = FakeFile(
+            path, session.size, content, session.hasher.hexdigest(), next(self._ids)
+        )
+        self._store(file)
+        return web.json_response(file.metadata())
+
+
+def _in_scope(path: str, scope: list) -> bool:
+    """Return True if a list_folder cursor with ``scope`` covers ``path``."""
+    folder, recursive = scope
+    if recursive:
+        return path.startswith(f"{folder}/")
+    return path.rsplit("/", 1)[0] == folder
+
+
+def _failure(status: int, error) -> web.Response:
+    if status == 429:
+        return web.Response(status=429, headers={"Retry-After": "0"}, text="")
+    if status == 409:
+        return _error(409, error)
+    return web.Response(status=status, text="injected failure")
+
+
+def _error(status: int, error: dict) -> web.Response:
+    return web.json_response(
+        {"error_summary": error.get(".tag", ""), "error": error}, status=status
+    )
+
+
+def _not_found(tag: str) -> web.Response:
+    return _error(409, {".tag": tag, tag: {".tag": "not_found"}})
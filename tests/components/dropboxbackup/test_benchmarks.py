@@ -0,0 +1,567 @@
+"""End-to-end benchmarks of the backup agent against a local fake Dropbox.
+
+Each benchmark drives DropboxBackupAgent through the real aiohttp transport
+and reports throughput, time to first byte, peak memory and the requests it
+made, failing when one of the budgets below is exceeded. Archive sizes are
+given in MB by DROPBOX_BENCH_SIZES (default "10,100"); "10,100,1000,5000"
+covers the full range but takes a while.
+"""
+
+import asyncio
+import contextlib
+import math
+import os
+import random
+import resource
+import subprocess
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from dataclasses import dataclass
+from pathlib import Path
+
+import aiohttp
+import pytest
+from homeassistant.core import HomeAssistant
+
+ROOT = Path(__file__).resolve().parents[3]
+if str(ROOT) not in sys.path:
+    sys.path.insert(0, str(ROOT))
+
+from homeassistant.components.backup.models import AgentBackup
+
+import custom_components.dropboxbackup.api as api_module
+import custom_components.dropboxbackup.backup as backup_module
+import custom_components.dropboxbackup.retry as retry_module
+from custom_components.dropboxbackup.backup import (
+    UPLOAD_QUEUE_DEPTH,
+    DropboxBackupAgent,
+)
+from custom_components.dropboxbackup.const import (
+    CONF_BACKUP_PATTERN,
+    CONF_CACHE_BACKUPS,
+    CONF_COMPRESSION,
+    CONF_DEDUPLICATE,
+    CONF_DOWNLOAD_CONCURRENCY,
+    CONF_INCLUDE_SUBFOLDERS,
+    CONF_MAX_CHUNK_SIZE,
+    CONF_MIN_CHUNK_SIZE,
+    CONF_UPLOAD_CONCURRENCY,
+    CONF_UPLOAD_LIMIT,
+    DEFAULT_DOWNLOAD_CHUNK_SIZE,
+    DEFAULT_DOWNLOAD_CONCURRENCY,
+    DEFAULT_MAX_CHUNK_SIZE,
+    DEFAULT_MIN_CHUNK_SIZE,
+)
+from custom_components.dropboxbackup.dedup import CHUNK_FOLDER, ContentChunker
+from custom_components.dropboxbackup.metadata import INDEX_FILE, dump_index
+from custom_components.dropboxbackup.workers import WorkerPool
+
+from .fake_dropbox import PATTERN, FakeDropbox
+from .test_dropboxbackup import (
+    MemoryUploadSessionStore,
+    _create_entry,
+    _dated_backup,
+    _fresh_token,
+)
+
+MB = 1000 * 1000
+MIB = 1024 * 1024
+BENCH_SIZES = [
+    int(size) * MB
+    for size in os.environ.get("DROPBOX_BENCH_SIZES", "10,100").split(",")
+]
+LIST_ENTRIES = 1000
+
+# Budgets. Throughput floors only catch an order-of-magnitude regression, so
+# they hold on a busy CI runner; memory budgets do not grow with the archive.
+MIN_UPLOAD_MIBPS = 10.0
+MIN_DOWNLOAD_MIBPS = 20.0
+MAX_TTFB = 2.0
+MAX_LIST_SECONDS = 5.0
+MAX_IMPORT_SECONDS = 5.0
+# Chunks queued, held back and being cut, plus three copies per request in
+# flight: the agent's, the socket buffer's and the fake server's, which
+# shares the process
+UPLOAD_MEMORY_CHUNKS = UPLOAD_QUEUE_DEPTH + 2
+UPLOAD_MEMORY_CHUNKS_PER_REQUEST = 3
+# Each parallel range is read whole, then hashed and handed on
+DOWNLOAD_MEMORY_BUDGET = (
+    3 * DEFAULT_DOWNLOAD_CONCURRENCY * DEFAULT_DOWNLOAD_CHUNK_SIZE * MIB
+)
+STREAM_MEMORY_BUDGET = 16 * MIB
+
+
+@dataclass
+class Measurement:
+    """What one benchmarked operation cost."""
+
+    name: str
+    size: int
+    seconds: float
+    peak_memory: int
+    requests: Counter
+    ttfb: float | None = None
+
+    @property
+    def mibps(self) -> float:
+        return self.size / MIB / self.seconds if self.seconds else math.inf
+
+    def report(self) -> str:
+        ttfb = f" ttfb={self.ttfb * 1000:.0f}ms" if self.ttfb is not None else ""
+        requests = ", ".join(f"{k}={v}" for k, v in sorted(self.requests.items()))
+        return (
+            f"{self.name}: {self.size / MB:.0f} MB in {self.seconds:.2f}s "
+            f"({self.mibps:.1f} MiB/s){ttfb} "
+            f"peak={self.peak_memory / MIB:.1f} MiB "
+            f"maxrss={_max_rss() / MIB:.0f} MiB requests: {requests}"
+        )
+
+
+def _max_rss() -> int:
+    """Return the process' peak resident set size in bytes."""
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports KiB, macOS bytes
+    return rss if sys.platform == "darwin" else rss * 1024
+
+
+@contextlib.asynccontextmanager
+async def _measure(name: str, size: int, server: FakeDropbox):
+    """Time the block and record its peak traced memory and requests."""
+    before = Counter(server.requests)
+    result = Measurement(name, size, 0.0, 0, Counter())
+    tracemalloc.start()
+    start = time.perf_counter()
+    try:
+        yield result
+    finally:
+        result.seconds = time.perf_counter() - start
+        result.peak_memory = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+        result.requests = server.requests - before
+
+
+@contextlib.asynccontextmanager
+async def _bench_agent(monkeypatch, tmp_path, options=None, **server_options):
+    """Yield an agent wired to a fresh fake Dropbox, and the server."""
+    hass = HomeAssistant(str(tmp_path))
+    async with (
+        FakeDropbox(**server_options) as server,
+        aiohttp.ClientSession() as session,
+    ):
+        monkeypatch.setattr(api_module, "HOSTS", server.hosts)
+        monkeypatch.setattr(backup_module, "LONGPOLL_URL", server.longpoll_url)
+        for module in (api_module, backup_module):
+            monkeypatch.setattr(module, "async_get_clientsession", lambda hass: session)
+        monkeypatch.setattr(
+            backup_module, "UploadSessionStore", MemoryUploadSessionStore
+        )
+        pool = WorkerPool(2, "bench")
+        entry = _create_entry(token=_fresh_token(), options=options)
+        try:
+            yield DropboxBackupAgent(hass, entry, pool), server
+        finally:
+            pool.shutdown()
+
+
+def _backup(backup_id: str, size: int) -> AgentBackup:
+    return _dated_backup(backup_id, "2025-06-01T03:00:00+00:00", size)
+
+
+async def _pattern_stream(size: int):
+    """Yield ``size`` bytes of the fake server's pattern, as HA streams a file."""
+    sent = 0
+    while sent < size:
+        # Whole pieces reuse PATTERN itself, so the source costs no memory
+        piece = PATTERN if size - sent >= len(PATTERN) else PATTERN[: size - sent]
+        sent += len(piece)
+        yield piece
+
+
+async def _drain(chunks, result: Measurement) -> int:
+    """Consume a download, noting when its first byte arrived."""
+    start = time.perf_counter()
+    received = 0
+    async for chunk in chunks:
+        if not received:
+            result.ttfb = time.perf_counter() - start
+        received += len(chunk)
+    return received
+
+
+def _print(capsys, result: Measurement) -> None:
+    with capsys.disabled():
+        print("\n" + result.report())
+
+
+@pytest.mark.parametrize("concurrency", [1, 4])
+@pytest.mark.parametrize("size", BENCH_SIZES)
+def test_benchmark_upload(monkeypatch, tmp_path, capsys, size, concurrency):
+    async def _run():
+        options = {CONF_UPLOAD_CONCURRENCY: concurrency}
+        async with _bench_agent(
+            monkeypatch, tmp_path, options, keep_content_limit=0
+        ) as (agent, server):
+
+            async def _open_stream():
+                return _pattern_stream(size)
+
+            name = f"upload x{concurrency}"
+            async with _measure(name, size, server) as result:
+                await agent.async_upload_backup(
+                    open_stream=_open_stream, backup=_backup("bench.tar", size)
+                )
+            assert server.files["/bench.tar"].size == size
+            return result
+
+    result = asyncio.run(_run())
+    _print(capsys, result)
+    assert result.mibps >= MIN_UPLOAD_MIBPS
+    chunks = UPLOAD_MEMORY_CHUNKS + UPLOAD_MEMORY_CHUNKS_PER_REQUEST * concurrency
+    assert result.peak_memory <= chunks * DEFAULT_MAX_CHUNK_SIZE * MIB
+    # Never more requests than minimum-size chunks, plus start and finish
+    sent = sum(
+        count
+        for route, count in result.requests.items()
+        if route.startswith("upload_session/")
+    )
+    assert sent <= math.ceil(size / (DEFAULT_MIN_CHUNK_SIZE * MIB)) + 2
+
+
+@pytest.mark.parametrize(
+    ("concurrency", "memory_budget"),
+    [(1, STREAM_MEMORY_BUDGET), (DEFAULT_DOWNLOAD_CONCURRENCY, DOWNLOAD_MEMORY_BUDGET)],
+)
+@pytest.mark.parametrize("size", BENCH_SIZES)
+def test_benchmark_download(
+    monkeypatch, tmp_path, capsys, size, concurrency, memory_budget
+):
+    async def _run():
+        options = {CONF_DOWNLOAD_CONCURRENCY: concurrency}
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+            server.add_file("/bench.tar", size)
+            name = f"download x{concurrency}"
+            async with _measure(name, size, server) as result:
+                chunks = await agent.async_download_backup("bench.tar")
+                assert await _drain(chunks, result) == size
+            return result
+
+    result = asyncio.run(_run())
+    _print(capsys, result)
+    assert result.mibps >= MIN_DOWNLOAD_MIBPS
+    assert result.ttfb <= MAX_TTFB
+    assert result.peak_memory <= memory_budget
+    if concurrency > 1:
+        range_size = DEFAULT_DOWNLOAD_CHUNK_SIZE * MIB
+        assert result.requests == Counter(
+            {"get_temporary_link": 1, "temporary_link": math.ceil(size / range_size)}
+        )
+    else:
+        assert result.requests == Counter({"download": 1})
+
+
+def test_benchmark_list_folder(monkeypatch, tmp_path, capsys):
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path) as (agent, server):
+            names = [f"backup_{number:04d}.tar" for number in range(LIST_ENTRIES + 1)]
+            stored = {name: _backup(name, 1024).as_dict() for name in names}
+            index = dump_index(stored)
+            server.add_file(f"/{INDEX_FILE}", len(index), index, hashed=False)
+            for name in names[:-1]:
+                server.add_file(f"/{name}", 1024, hashed=False)
+
+            async with _measure("list", 0, server) as full:
+                backups = await agent.async_list_backups()
+            assert len(backups) == LIST_ENTRIES
+
+            server.add_file(f"/{names[-1]}", 1024, hashed=False)
+            async with _measure("list changes", 0, server) as changes:
+                backups = await agent.async_list_backups()
+            assert len(backups) == LIST_ENTRIES + 1
+            return full, changes, server.page_size
+
+    full, changes, page_size = asyncio.run(_run())
+    _print(capsys, full)
+    _print(capsys, changes)
+    assert full.seconds <= MAX_LIST_SECONDS
+    # Every page once and the sidecar index; no archive is opened
+    assert full.requests == Counter(
+        {
+            "list_folder": 1,
+            "list_folder/continue": math.ceil((LIST_ENTRIES + 1) / page_size) - 1,
+            "download": 1,
+        }
+    )
+    assert changes.requests == Counter({"list_folder/continue": 1})
+
+
+def test_benchmark_list_nested_folders(monkeypatch, tmp_path, capsys):
+    async def _run():
+        options = {CONF_INCLUDE_SUBFOLDERS: True, CONF_BACKUP_PATTERN: "*.tar"}
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+            # Archives spread over per-year and per-host folders, each with a
+            # log file that is not a backup
+            names = [
+                f"{2020 + number % 5}/host{number % 4}/backup_{number:04d}"
+                for number in range(LIST_ENTRIES)
+            ]
+            stored = {
+                f"{name}.tar": _backup(f"{name}.tar", 1024).as_dict() for name in names
+            }
+            index = dump_index(stored)
+            server.add_file(f"/{INDEX_FILE}", len(index), index, hashed=False)
+            for name in names:
+                server.add_file(f"/{name}.tar", 1024, hashed=False)
+                server.add_file(f"/{name}.log", 16, hashed=False)
+
+            async with _measure("list nested", 0, server) as result:
+                backups = await agent.async_list_backups()
+            assert len(backups) == LIST_ENTRIES
+            return result, server.page_size
+
+    result, page_size = asyncio.run(_run())
+    _print(capsys, result)
+    assert result.seconds <= MAX_LIST_SECONDS
+    # Every page of the whole tree once and the sidecar index; no archive
+    # is opened
+    assert result.requests == Counter(
+        {
+            "list_folder": 1,
+            "list_folder/continue": math.ceil((2 * LIST_ENTRIES + 1) / page_size) - 1,
+            "download": 1,
+        }
+    )
+
+
+def test_benchmark_warm_up(monkeypatch, tmp_path, capsys):
+    # A fresh interpreter, as the SDK is already imported in this one
+    imported = subprocess.run(
+        [
+            sys.executable,
+            "-c",
+            (
+                "import time; start = time.perf_counter(); "
+                "from dropbox import exceptions, files; "
+                "print(time.perf_counter() - start)"
+            ),
+        ],
+        capture_output=True,
+        check=True,
+        text=True,
+    )
+    import_seconds = float(imported.stdout)
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path) as (agent, server):
+            names = [f"backup_{number:04d}.tar" for number in range(LIST_ENTRIES)]
+            stored = {name: _backup(name, 1024).as_dict() for name in names}
+            index = dump_index(stored)
+            server.add_file(f"/{INDEX_FILE}", len(index), index, hashed=False)
+            for name in names:
+                server.add_file(f"/{name}", 1024, hashed=False)
+
+            async with _measure("warm-up", 0, server) as warm_up:
+                await agent.async_warm_up()
+            # The folder watcher long-polls from the warm-up's cursor
+            agent._watching = True
+            async with _measure("first list", 0, server) as first:
+                backups = await agent.async_list_backups()
+            assert len(backups) == LIST_ENTRIES
+            return warm_up, first
+
+    warm_up, first = asyncio.run(_run())
+    with capsys.disabled():
+        print(f"\nimport dropbox: {import_seconds * 1000:.0f}ms")
+    _print(capsys, warm_up)
+    _print(capsys, first)
+    assert import_seconds <= MAX_IMPORT_SECONDS
+    assert warm_up.seconds <= MAX_LIST_SECONDS
+    assert not warm_up.requests["upload"]
+    # The backup page is answered from the index the warm-up built
+    assert first.requests == Counter()
+
+
+def test_round_trip_survives_injected_failures(monkeypatch, tmp_path):
+    size = 3 * 8 * MIB + 123
+    options = {
+        CONF_UPLOAD_CONCURRENCY: 1,
+        CONF_DOWNLOAD_CONCURRENCY: 1,
+        CONF_MIN_CHUNK_SIZE: 8,
+        CONF_MAX_CHUNK_SIZE: 8,
+    }
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path, options, latency=0.01) as (
+            agent,
+            server,
+        ):
+            monkeypatch.setattr(retry_module, "backoff_delay", lambda *args: 0)
+            server.fail("upload_session/append_v2", 503)
+            server.fail("upload_session/append_v2", 429)
+
+            async def _open_stream():
+                return _pattern_stream(size)
+
+            await agent.async_upload_backup(
+                open_stream=_open_stream, backup=_backup("flaky.tar", size)
+            )
+            uploaded = Counter(server.requests)
+
+            server.fail("download", 500)
+            chunks = await agent.async_download_backup("flaky.tar")
+            received = await _drain(chunks, Measurement("", 0, 0.0, 0, Counter()))
+            return uploaded, server.requests - uploaded, received
+
+    uploaded, downloaded, received = asyncio.run(_run())
+    assert received == size
+    # Each injected failure cost one repeated request, nothing more
+    assert uploaded["upload_session/append_v2"] == 3 + 2
+    assert downloaded == Counter({"download": 1 + 1})
+
+
+@pytest.mark.parametrize("codec", ["gzip", "zstd"])
+def test_compressed_round_trip(monkeypatch, tmp_path, codec):
+    size = 10 * MIB + 123
+    options = {CONF_COMPRESSION: codec, CONF_DOWNLOAD_CONCURRENCY: 1}
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+
+            async def _open_stream():
+                return _pattern_stream(size)
+
+            await agent.async_upload_backup(
+                open_stream=_open_stream, backup=_backup("packed.tar", size)
+            )
+            stored = server.files["/packed.tar"].size
+            backups = await agent.async_list_backups()
+            chunks = await agent.async_download_backup("packed.tar")
+            received = b"".join([chunk async for chunk in chunks])
+            return stored, backups, received
+
+    stored, backups, received = asyncio.run(_run())
+    assert stored < size // 10
+    # Listings show the size of the backup, not of the stored file
+    assert [backup.size for backup in backups] == [size]
+    expected = PATTERN * (size // len(PATTERN))
+    assert received == expected + PATTERN[: size - len(expected)]
+
+
+async def _bytes_stream(data: bytes):
+    for start in range(0, len(data), MIB):
+        yield data[start : start + MIB]
+
+
+def test_deduplicated_backups_share_chunks(monkeypatch, tmp_path):
+    first = random.Random(3).randbytes(16 * MIB)
+    second = first[: 6 * MIB] + b"changed" + first[6 * MIB :]
+    chunker = ContentChunker()
+    second_chunks = {*chunker.feed(second), chunker.flush()}
+    options = {
+        CONF_DEDUPLICATE: True,
+        CONF_COMPRESSION: "zstd",
+        CONF_UPLOAD_CONCURRENCY: 4,
+    }
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+
+            async def _upload(name: str, data: bytes) -> tuple[Counter, int]:
+                async def _open_stream():
+                    return _bytes_stream(data)
+
+                before = Counter(server.requests)
+                await agent.async_upload_backup(
+                    open_stream=_open_stream, backup=_backup(name, len(data))
+                )
+                return server.requests - before, agent.metrics.last["upload"].bytes
+
+            await _upload("first.tar", first)
+            requests, sent = await _upload("second.tar", second)
+            sizes = sorted(backup.size for backup in await agent.async_list_backups())
+
+            await agent.async_delete_backup("first.tar")
+            stored = [
+                path
+                for path in server.files
+                if path.rsplit("/", 1)[0].endswith(CHUNK_FOLDER)
+            ]
+            chunks = await agent.async_download_backup("second.tar")
+            restored = b"".join([chunk async for chunk in chunks])
+            # Without the sidecar index the manifest is recognised by its content
+            agent._metadata = None
+            chunks = await agent.async_download_backup("second.tar")
+            assert b"".join([chunk async for chunk in chunks]) == restored
+            return requests, sent, sizes, stored, restored
+
+    requests, sent, sizes, stored, restored = asyncio.run(_run())
+    # The changed chunk, the manifest and the sidecar index, nothing else
+    assert requests["upload"] == 3
+    assert sent < 2 * 8 * MIB
+    # Listings show the size of each backup
+    assert sizes == [len(first), len(second)]
+    # The chunk only the deleted backup used is gone
+    assert len(stored) == len(second_chunks)
+    assert restored == second
+
+
+def test_upload_limit_paces_the_upload(monkeypatch, tmp_path):
+    size = 12 * MIB
+    mbit = 80
+    options = {CONF_MIN_CHUNK_SIZE: 4, CONF_MAX_CHUNK_SIZE: 4, CONF_UPLOAD_LIMIT: mbit}
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+
+            async def _open_stream():
+                return _pattern_stream(size)
+
+            async with _measure("upload limited", size, server) as result:
+                await agent.async_upload_backup(
+                    open_stream=_open_stream, backup=_backup("limited.tar", size)
+                )
+            return result
+
+    result = asyncio.run(_run())
+    # The first chunk goes at once; the rest wait for the limit
+    assert result.seconds >= (size - 4 * MIB) / (mbit * 1_000_000 / 8)
+
+
+def test_restores_recent_uploads_from_the_local_cache(monkeypatch, tmp_path):
+    size = 12 * MIB
+    options = {CONF_CACHE_BACKUPS: 1, CONF_COMPRESSION: "gzip"}
+
+    async def _run():
+        async with _bench_agent(monkeypatch, tmp_path, options) as (agent, server):
+
+            async def _upload(name: str) -> None:
+                async def _open_stream():
+                    return _pattern_stream(size)
+
+                await agent.async_upload_backup(
+                    open_stream=_open_stream, backup=_backup(name, size)
+                )
+
+            async def _restore(name: str) -> tuple[int, Counter]:
+                before = Counter(server.requests)
+                chunks = await agent.async_download_backup(name)
+                received = await _drain(chunks, Measurement("", 0, 0.0, 0, Counter()))
+                return received, server.requests - before
+
+            await _upload("first.tar")
+            cached = await _restore("first.tar")
+            # Only the newest upload stays cached
+            await _upload("second.tar")
+            evicted = await _restore("first.tar")
+            # A backup replaced on Dropbox is not served from the cache
+            server.add_file("/second.tar", size)
+            replaced = await _restore("second.tar")
+            return cached, evicted, replaced
+
+    cached, evicted, replaced = asyncio.run(_run())
+    assert cached == (size, Counter({"get_metadata": 1}))
+    assert evicted[0] == size
+    assert evicted[1]["temporary_link"] > 0
+    assert replaced[0] == size
+    assert replaced[1]["temporary_link"] > 0
@@ -1,37 +1,115 @@
 import asyncio
-import types
-from types import MappingProxyType, SimpleNamespace
-import sys
+import hashlib
+import io
+import json
 import os
+import sys
+import tarfile
+import threading
+import time
+import tracemalloc
+import types
+from datetime import UTC, datetime
 from pathlib import Path
+from types import MappingProxyType, SimpleNamespace
 
-import pytest
-from pytest import MonkeyPatch
+import aiohttp
 
+# Load the real SDK before any test stubs out ``dropbox.files``
+import dropbox  # noqa: F401
+import pytest
+from dropbox import files as dropbox_files
+from dropbox.exceptions import (
+    ApiError,
+    AuthError,
+    InternalServerError,
+    RateLimitError,
+)
+from homeassistant.config_entries import (
+    HANDLERS,
+    ConfigEntries,
+    ConfigEntry,
+    ConfigEntryState,
+)
 from homeassistant.core import HomeAssistant
-from homeassistant.config_entries import ConfigEntries, ConfigEntry
-from homeassistant.loader import async_setup as loader_setup
 from homeassistant.helpers import config_entry_oauth2_flow
-from homeassistant.config_entries import HANDLERS
+from homeassistant.loader import async_setup as loader_setup
+from pytest import MonkeyPatch
 
 
 async def _collect(aiter):
     return [chunk async for chunk in aiter]
 
+
 ROOT = Path(__file__).resolve().parents[3]
 if str(ROOT) not in sys.path:
     sys.path.insert(0, str(ROOT))
 
-from custom_components.dropboxbackup.const import DOMAIN, DATA_BACKUP_AGENT_LISTENERS
+from unittest.mock import AsyncMock, Mock
+
+from homeassistant.components.backup.models import AgentBackup, BackupAgentError
+
 import custom_components.dropboxbackup as integration
+import custom_components.dropboxbackup.api as api_module
+import custom_components.dropboxbackup.backup as backup_module
+import custom_components.dropboxbackup.bandwidth as bandwidth_module
+import custom_components.dropboxbackup.store as store_module
+from custom_components.dropboxbackup.api import DropboxClient
 from custom_components.dropboxbackup.backup import (
-    DropboxBackupAgent,
     CHUNK_SIZE,
+    DOWNLOAD_READ_AHEAD,
     SIMPLE_UPLOAD_LIMIT,
+    UPLOAD_QUEUE_DEPTH,
+    DropboxBackupAgent,
+)
+from custom_components.dropboxbackup.bandwidth import (
+    BandwidthLimiter,
+    TokenBucket,
+    parse_windows,
+)
+from custom_components.dropboxbackup.cache import BackupCache
+from custom_components.dropboxbackup.chunk_size import ChunkSizer
+from custom_components.dropboxbackup.compression import (
+    compress_bytes,
+    decompress_stream,
 )
-from unittest.mock import Mock, AsyncMock
-from homeassistant.components.backup.models import BackupAgentError
 from custom_components.dropboxbackup.config_flow import DropboxOAuth2FlowHandler
+from custom_components.dropboxbackup.const import (
+    CONF_BACKUP_PATTERN,
+    CONF_CACHE_BACKUPS,
+    CONF_COMPRESSION,
+    CONF_DOWNLOAD_CHUNK_SIZE,
+    CONF_DOWNLOAD_CONCURRENCY,
+    CONF_INCLUDE_SUBFOLDERS,
+    CONF_KEEP_LAST,
+    CONF_MAX_CHUNK_SIZE,
+    CONF_MIN_CHUNK_SIZE,
+    CONF_UPLOAD_CONCURRENCY,
+    DATA_AGENTS,
+    DATA_BACKUP_AGENT_LISTENERS,
+    DOMAIN,
+)
+from custom_components.dropboxbackup.content_hash import ContentHasher
+from custom_components.dropboxbackup.dedup import (
+    MAX_CHUNK_SIZE as DEDUP_MAX_CHUNK_SIZE,
+)
+from custom_components.dropboxbackup.dedup import (
+    MIN_CHUNK_SIZE as DEDUP_MIN_CHUNK_SIZE,
+)
+from custom_components.dropboxbackup.dedup import (
+    ContentChunker,
+    chunk_id,
+    restore_chunk,
+)
+from custom_components.dropboxbackup.diagnostics import (
+    async_get_config_entry_diagnostics,
+)
+from custom_components.dropboxbackup.metadata import INDEX_FILE, dump_index
+from custom_components.dropboxbackup.metrics import TransferMetrics, count_api_call
+from custom_components.dropboxbackup.retention import expired_backups
+from custom_components.dropboxbackup.retry import REQUEST_ATTEMPTS, start_operation
+from custom_components.dropboxbackup.sensor import SENSORS, DropboxBackupSensor
+from custom_components.dropboxbackup.workers import WorkerPool
 
 
 @pytest.fixture
@@ -51,16 +129,16 @@ def hass(tmp_path):
     return asyncio.run(_create())
 
 
-def _create_entry():
+def _create_entry(token=None, options=None, entry_id="1"):
     return ConfigEntry(
         domain=DOMAIN,
         title="Dropbox",
-        data={"token": {}},
+        data={"token": token or {}},
         source="user",
         version=1,
         minor_version=1,
-        options={},
-        entry_id="1",
+        options=options or {},
+        entry_id=entry_id,
         unique_id=None,
         discovery_keys=MappingProxyType({}),
         subentries_data=None,
@@ -79,7 +157,28 @@ def test_migrate_entry_adds_auth_implementation(hass):
     assert result
     async_update.assert_called_once()
     data = async_update.call_args.kwargs["data"]
-    assert data["auth_implementation"] == f"{DOMAIN}_{DropboxOAuth2FlowHandler.CLIENT_ID}"
+    assert (
+        data["auth_implementation"] == f"{DOMAIN}_{DropboxOAuth2FlowHandler.CLIENT_ID}"
+    )
+
+
+def test_migrate_entry_keeps_the_shared_agent_id(hass):
+    first, second = _create_entry(), _create_entry(entry_id="2")
+
+    def update(entry, *, data, minor_version):
+        object.__setattr__(entry, "data", MappingProxyType(data))
+        object.__setattr__(entry, "minor_version", minor_version)
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(hass.config_entries, "async_update_entry", update)
+        mp.setattr(hass.config_entries, "async_entries", lambda domain: [first, second])
+        assert asyncio.run(integration.async_migrate_entry(hass, first))
+        assert asyncio.run(integration.async_migrate_entry(hass, second))
+
+    # Automatic backup settings naming the old agent still find the first
+    agents = [DropboxBackupAgent(hass, entry) for entry in (first, second)]
+    assert [agent.unique_id for agent in agents] == ["dropbox_backup", "2"]
+    assert (first.minor_version, second.minor_version) == (2, 2)
 
 
 def test_oauth_flow_external_step(hass):
@@ -102,7 +201,9 @@ def test_oauth_flow_external_step(hass):
         async def _async_refresh_token(self, token):
             return token
 
-    config_entry_oauth2_flow.async_register_implementation(hass, DOMAIN, DummyImpl(hass))
+    config_entry_oauth2_flow.async_register_implementation(
+        hass, DOMAIN, DummyImpl(hass)
+    )
 
     from homeassistant.helpers import http
 
@@ -111,7 +212,9 @@ def test_oauth_flow_external_step(hass):
 
     http.current_request.set(Req())
 
-    result = asyncio.run(hass.config_entries.flow.async_init(DOMAIN, context={"source": "user"}))
+    result = asyncio.run(
+        hass.config_entries.flow.async_init(DOMAIN, context={"source": "user"})
+    )
     assert result["type"].value == "external"
     assert result["handler"] == DOMAIN
     assert "https://example.com/auth" in result["url"]
@@ -120,24 +223,217 @@ def test_oauth_flow_external_step(hass):
 def test_setup_entry_registers_listener(hass):
     entry = _create_entry()
     called = []
+    backup_module.async_register_backup_agents_listener(
+        hass, listener=lambda: called.append(True)
+    )
+    assert len(hass.data[DATA_BACKUP_AGENT_LISTENERS]) == 1
 
-    def fake_register(hass, *, listener):
-        hass.data.setdefault(DATA_BACKUP_AGENT_LISTENERS, []).append(lambda: called.append(True))
-        return lambda: None
+    watchers = []
 
+    def fake_background_task(hass, target, name):
+        watchers.append(name)
+        target.close()
+
+    forward = AsyncMock()
     with MonkeyPatch.context() as mp:
-        mp.setattr(integration, "async_register_backup_agents_listener", fake_register)
+        mp.setattr(entry, "async_create_background_task", fake_background_task)
+        mp.setattr(hass.config_entries, "async_forward_entry_setups", forward)
         assert asyncio.run(integration.async_setup_entry(hass, entry))
 
     assert called == [True]
+    forward.assert_awaited_once_with(entry, integration.PLATFORMS)
+    assert isinstance(entry.runtime_data, DropboxBackupAgent)
+    assert isinstance(entry.runtime_data.pool, WorkerPool)
+    assert watchers == [f"{DOMAIN} warm-up", f"{DOMAIN} folder watcher"]
+    entry.runtime_data.pool.shutdown()
+
+
+def test_agents_are_kept_per_entry_across_reloads(hass):
+    entry = _create_entry()
+    agent = backup_module.async_get_agent(hass, entry, None)
+    other = backup_module.async_get_agent(hass, _create_entry(entry_id="2"), None)
+    assert agent.unique_id != other.unique_id
+    agent._list_cursor = "c1"
+    agent._files = {"backup1.tar": FileMetadata("/backup1.tar", "backup1.tar", 1)}
+    dbx = agent._dbx = Mock()
+
+    # Unloading closes the client; reloading keeps the index
+    agent.async_unload()
+    dbx.close.assert_called_once()
+    reloaded = _create_entry(options={CONF_CACHE_BACKUPS: 2})
+    assert backup_module.async_get_agent(hass, reloaded, None) is agent
+    assert agent._dbx is None
+    assert agent._list_cursor == "c1"
+    assert agent.cache.max_backups == 2
+
+    # Listing other files starts the index over
+    filtered = _create_entry(options={CONF_BACKUP_PATTERN: "*.tgz"})
+    assert backup_module.async_get_agent(hass, filtered, None) is agent
+    assert agent._list_cursor is None
+    assert agent._files == {}
+
+    asyncio.run(integration.async_remove_entry(hass, entry))
+    assert list(hass.data[DATA_AGENTS]) == ["2"]
+
+
+def test_upload_survives_reload_of_its_entry(hass):
+    entry = _create_entry()
+    pool = WorkerPool(1, "test")
+    agent = backup_module.async_get_agent(hass, entry, pool)
+    dbx = Mock()
+    dbx.files_upload.side_effect = [FileMetadata("/b.tar", "b.tar", 4), None]
+    dbx.files_download.side_effect = _not_found()
+
+    async def open_stream():
+        async def gen():
+            yield b"da"
+            # An option change unloads the entry while the backup streams
+            agent.async_unload()
+            pool.shutdown()
+            yield b"ta"
+
+        return gen()
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        backup = _dated_backup("b.tar", "2025-06-01T03:00:00+00:00", size=4)
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+
+        # The setup that follows hands the agent its new pool
+        reloaded = WorkerPool(1, "test")
+        assert backup_module.async_get_agent(hass, entry, reloaded) is agent
+    reloaded.shutdown()
+
+    assert dbx.files_upload.call_args_list[0].args[:2] == (b"data", "/b.tar")
+    assert agent.pool is reloaded
+
+
+def test_setup_entry_offers_agent_to_listener_during_setup(hass):
+    entry = _create_entry()
+    # Home Assistant runs setup with the entry in this state
+    object.__setattr__(entry, "state", ConfigEntryState.SETUP_IN_PROGRESS)
+    seen = []
+
+    def listener():
+        # The backup manager reloads agents in an eagerly started task, so
+        # the lookup runs before setup returns
+        coro = backup_module.async_get_backup_agents(hass)
+        with pytest.raises(StopIteration) as done:
+            coro.send(None)
+        seen.append(done.value.value)
+
+    backup_module.async_register_backup_agents_listener(hass, listener=listener)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(entry, "async_create_background_task", _close_task)
+        mp.setattr(hass.config_entries, "async_forward_entry_setups", AsyncMock())
+        mp.setattr(hass.config_entries, "async_entries", lambda domain: [entry])
+        assert asyncio.run(integration.async_setup_entry(hass, entry))
+
+    assert seen == [[entry.runtime_data]]
+    entry.runtime_data.pool.shutdown()
+
+
+def _close_task(hass, target, name):
+    target.close()
+
+
+def test_worker_pool_tracks_queue_depth_and_wait():
+    pool = WorkerPool(1, "test")
+    release = threading.Event()
+
+    async def _run():
+        first = asyncio.ensure_future(pool.async_run(release.wait))
+        second = asyncio.ensure_future(pool.async_run(lambda: "done"))
+        await asyncio.sleep(0.05)
+        depth = pool.queue_depth
+        release.set()
+        await first
+        return depth, await second
+
+    try:
+        depth, result = asyncio.run(_run())
+    finally:
+        pool.shutdown()
+    assert depth == 1
+    assert result == "done"
+    stats = pool.stats()
+    assert stats["jobs"] == 2
+    assert stats["peak_queue_depth"] == 1
+    assert stats["queue_depth"] == 0
+    assert stats["max_wait"] >= 0.04
 
 
 class FileMetadata:
-    def __init__(self, path_lower, name, size):
+    def __init__(self, path_lower, name, size, content_hash=None):
         self.path_lower = path_lower
         self.name = name
         self.size = size
         self.server_modified = "2024-01-01"
+        self.content_hash = content_hash
+
+
+def _dropbox_hash(data):
+    """Reference Dropbox content_hash: SHA-256 over 4 MiB block digests."""
+    block = 4 * 1024 * 1024
+    return hashlib.sha256(
+        b"".join(
+            hashlib.sha256(data[start : start + block]).digest()
+            for start in range(0, len(data), block)
+        )
+    ).hexdigest()
+
+
+class DeletedMetadata:
+    def __init__(self, path_lower):
+        self.path_lower = path_lower
+
+
+def _stub_metadata_types(mp):
+    mp.setitem(
+        sys.modules,
+        "dropbox.files",
+        types.SimpleNamespace(
+            FileMetadata=FileMetadata,
+            DeletedMetadata=DeletedMetadata,
+            WriteMode=SimpleNamespace(overwrite="overwrite"),
+        ),
+    )
+
+
+class MemoryUploadSessionStore:
+    """In-memory stand-in for the persistent upload session store."""
+
+    def __init__(self, hass, entry_id):
+        self.sessions = {}
+
+    async def async_get(self, path):
+        return self.sessions.get(path)
+
+    async def async_set(self, path, session):
+        self.sessions[path] = dict(session)
+
+    async_update = async_set
+
+    async def async_remove(self, path):
+        self.sessions.pop(path, None)
+
+
+@pytest.fixture(autouse=True)
+def memory_upload_sessions(monkeypatch):
+    monkeypatch.setattr(backup_module, "UploadSessionStore", MemoryUploadSessionStore)
+
+
+class FixedChunkSizer(ChunkSizer):
+    """Keep the initial chunk size, so upload tests see predictable chunks."""
+
+    def record(self, size, seconds, failed=False):
+        return self.chunk_size
+
+
+@pytest.fixture(autouse=True)
+def fixed_chunk_size(monkeypatch):
+    monkeypatch.setattr(backup_module, "ChunkSizer", FixedChunkSizer)
 
 
 @pytest.fixture
@@ -146,6 +442,12 @@ def agent(hass):
     return DropboxBackupAgent(hass, entry)
 
 
+@pytest.fixture
+def single_stream_agent(hass):
+    entry = _create_entry(options={CONF_DOWNLOAD_CONCURRENCY: 1})
+    return DropboxBackupAgent(hass, entry)
+
+
 def test_async_list_backups(agent, hass):
     dbx = Mock()
     file1 = FileMetadata("/backup1.tar", "backup1.tar", 1)
@@ -154,19 +456,147 @@ def test_async_list_backups(agent, hass):
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
         with mp.context():
-            mp.setitem(sys.modules, "dropbox.files", types.SimpleNamespace(FileMetadata=FileMetadata))
+            _stub_metadata_types(mp)
             backups = asyncio.run(agent.async_list_backups())
     assert backups[0].backup_id == "backup1.tar"
 
 
+def test_async_list_backups_fetches_only_changes(agent, hass):
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[
+            FileMetadata("/backup1.tar", "backup1.tar", 1),
+            FileMetadata("/backup2.tar", "backup2.tar", 2),
+        ],
+        has_more=False,
+        cursor="c1",
+    )
+    dbx.files_list_folder_continue.return_value = SimpleNamespace(
+        entries=[
+            DeletedMetadata("/backup1.tar"),
+            FileMetadata("/backup3.tar", "backup3.tar", 3),
+        ],
+        has_more=False,
+        cursor="c2",
+    )
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        asyncio.run(agent.async_list_backups())
+        backups = asyncio.run(agent.async_list_backups())
+        backup = asyncio.run(agent.async_get_backup("backup3.tar"))
+
+    dbx.files_list_folder.assert_called_once()
+    dbx.files_list_folder_continue.assert_called_once_with("c1")
+    assert sorted(b.backup_id for b in backups) == ["backup2.tar", "backup3.tar"]
+    assert backup.size == 3
+    dbx.files_get_metadata.assert_not_called()
+    assert agent._list_cursor == "c2"
+
+
+def test_async_list_backups_lists_matching_files_in_subfolders(hass):
+    options = {CONF_INCLUDE_SUBFOLDERS: True, CONF_BACKUP_PATTERN: "*.tar, *.TGZ"}
+    agent = DropboxBackupAgent(hass, _create_entry(options=options))
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[
+            FileMetadata("/top.tar", "top.tar", 1),
+            FileMetadata("/2024/host1/old.tgz", "old.tgz", 2),
+            FileMetadata("/2025/host1/new.tar", "new.tar", 3),
+            FileMetadata("/2025/host1/notes.txt", "notes.txt", 4),
+            FileMetadata("/.chunks/abc.tar", "abc.tar", 5),
+        ],
+        has_more=False,
+        cursor="c1",
+    )
+    dbx.files_list_folder_continue.return_value = SimpleNamespace(
+        entries=[DeletedMetadata("/2025")], has_more=False, cursor="c2"
+    )
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        listed = asyncio.run(agent.async_list_backups())
+        # Deleting a subfolder removes every backup in it
+        remaining = asyncio.run(agent.async_list_backups())
+
+    dbx.files_list_folder.assert_called_once_with(
+        "", recursive=True, limit=backup_module.LIST_PAGE_LIMIT
+    )
+    assert sorted(b.backup_id for b in listed) == [
+        "2024/host1/old.tgz",
+        "2025/host1/new.tar",
+        "top.tar",
+    ]
+    assert sorted(b.backup_id for b in remaining) == ["2024/host1/old.tgz", "top.tar"]
+
+
+def test_own_uploads_are_listed_whatever_the_pattern(hass):
+    agent = DropboxBackupAgent(
+        hass, _create_entry(options={CONF_BACKUP_PATTERN: "*.tar"})
+    )
+    agent._list_cursor = "c1"
+    agent._metadata = {}
+    dbx = Mock()
+    dbx.files_upload.return_value = FileMetadata("/a1b2c3d4", "a1b2c3d4", 4)
+    uploaded = FileMetadata("/a1b2c3d4", "a1b2c3d4", 4)
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[uploaded, FileMetadata("/notes.txt", "notes.txt", 1)],
+        has_more=False,
+        cursor="c2",
+    )
+    dbx.files_list_folder_continue.return_value = SimpleNamespace(
+        entries=[], has_more=False, cursor="c2"
+    )
+    dbx.files_download.side_effect = ApiError("request-id", "path", None, None)
+    backup = _dated_backup("a1b2c3d4", "2025-06-10T03:00:00+00:00", 4)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        asyncio.run(
+            agent.async_upload_backup(open_stream=_small_stream(b"data"), backup=backup)
+        )
+        assert [b.backup_id for b in asyncio.run(agent.async_list_backups())] == [
+            "a1b2c3d4"
+        ]
+        # A full listing keeps it through its sidecar index entry
+        agent._list_cursor = None
+        backups = asyncio.run(agent.async_list_backups())
+    assert [b.backup_id for b in backups] == ["a1b2c3d4"]
+
+
+def test_async_list_backups_relists_after_cursor_reset(agent, hass):
+    agent._list_cursor = "expired"
+    agent._files = {"gone.tar": FileMetadata("/gone.tar", "gone.tar", 1)}
+    dbx = Mock()
+    dbx.files_list_folder_continue.side_effect = ApiError(
+        "request-id", dropbox_files.ListFolderContinueError.reset, None, None
+    )
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[FileMetadata("/backup1.tar", "backup1.tar", 1)],
+        has_more=False,
+        cursor="c1",
+    )
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        backups = asyncio.run(agent.async_list_backups())
+
+    assert [b.backup_id for b in backups] == ["backup1.tar"]
+    assert agent._list_cursor == "c1"
+
+
 def test_async_upload_backup_small(agent, hass):
     dbx = Mock()
+    dbx.files_upload.return_value = FileMetadata("/b.tar", "b.tar", 4)
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+
         async def open_stream():
             async def gen():
                 yield b"data"
+
             return gen()
+
         backup = SimpleNamespace(size=10, backup_id="b.tar")
         asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
     dbx.files_upload.assert_called_once()
@@ -174,6 +604,7 @@ def test_async_upload_backup_small(agent, hass):
 
 def test_async_upload_backup_chunked(agent, hass):
     dbx = Mock()
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
         mp.setitem(
@@ -186,52 +617,1687 @@ def test_async_upload_backup_chunked(agent, hass):
                 CommitInfo=type("Commit", (), {"__init__": lambda self, *a, **k: None}),
             ),
         )
+
         async def open_stream():
             async def gen():
                 yield b"a" * (CHUNK_SIZE // 2)
                 yield b"b" * (CHUNK_SIZE // 2)
                 yield b"c"
+
             return gen()
+
         backup = SimpleNamespace(size=SIMPLE_UPLOAD_LIMIT + 1, backup_id="b.tar")
         asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
     dbx.files_upload_session_start.assert_called_once()
     dbx.files_upload_session_finish.assert_called_once()
 
 
-def test_async_download_backup(agent, hass):
+class StreamedResponse:
+    """Minimal stand-in for a streamed ``requests`` response."""
+
+    def __init__(self, chunks):
+        self.chunks = list(chunks)
+        self.read = 0
+        self.closed = False
+
+    def iter_content(self, chunk_size):
+        for chunk in self.chunks:
+            self.read += 1
+            yield chunk
+
+    def close(self):
+        self.closed = True
+
+
+class Cursor:
+    def __init__(self, session_id, offset):
+        self.session_id = session_id
+        self.offset = offset
+
+
+def _stub_session_types(mp):
+    mp.setitem(
+        sys.modules,
+        "dropbox.files",
+        types.SimpleNamespace(
+            UploadSessionCursor=Cursor,
+            CommitInfo=type("Commit", (), {"__init__": lambda self, *a, **k: None}),
+            UploadSessionType=SimpleNamespace(concurrent="concurrent"),
+        ),
+    )
+
+
+def test_async_upload_backup_pipelined_chunks(agent, hass):
     dbx = Mock()
-    dbx.files_download.return_value = (None, SimpleNamespace(content=b"abc"))
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
+    dbx.files_upload_session_start.return_value = SimpleNamespace(session_id="sid")
+    piece = CHUNK_SIZE * 3 // 4
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
-        stream = asyncio.run(agent.async_download_backup("backup1.tar"))
-        data = b"".join([chunk for chunk in asyncio.run(_collect(stream))])
-    assert data == b"abc"
+        _stub_session_types(mp)
+
+        async def open_stream():
+            async def gen():
+                for _ in range(3):
+                    yield b"x" * piece
 
+            return gen()
 
-def test_async_delete_backup(agent, hass):
+        backup = SimpleNamespace(size=SIMPLE_UPLOAD_LIMIT + 1, backup_id="b.tar")
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+
+    assert len(dbx.files_upload_session_start.call_args.args[0]) == CHUNK_SIZE
+    appends = [
+        (len(call.args[0]), call.args[1].offset)
+        for call in dbx.files_upload_session_append_v2.call_args_list
+    ]
+    assert appends == [
+        (CHUNK_SIZE, CHUNK_SIZE),
+        (3 * piece - 2 * CHUNK_SIZE, 2 * CHUNK_SIZE),
+    ]
+    data, cursor, _commit = dbx.files_upload_session_finish.call_args.args
+    assert data == b""
+    assert cursor.offset == 3 * piece
+
+
+def test_chunk_sizer_follows_throughput():
+    mib = 1024 * 1024
+    sizer = ChunkSizer(8 * mib, 4 * mib, 64 * mib)
+    # 80 MiB/s: grow twofold per chunk up to the maximum
+    assert sizer.record(8 * mib, 0.1) == 16 * mib
+    assert sizer.record(16 * mib, 0.2) == 32 * mib
+    assert sizer.record(32 * mib, 0.4) == 64 * mib
+    assert sizer.record(64 * mib, 0.8) == 64 * mib
+    # A retried request halves the chunk size
+    assert sizer.record(64 * mib, 0.8, failed=True) == 32 * mib
+    # A slowdown to 1 MiB/s drops straight to the minimum
+    assert sizer.record(32 * mib, 32) == 4 * mib
+    # A recovery to 3 MiB/s is averaged in; sizes are multiples of 4 MiB
+    assert sizer.record(4 * mib, 4 / 3) == 8 * mib
+    assert sizer.record(8 * mib, 8 / 3) == 12 * mib
+
+
+def test_async_upload_backup_chunks_within_configured_bounds(hass):
+    mib = 1024 * 1024
+    entry = _create_entry(options={CONF_MIN_CHUNK_SIZE: 4, CONF_MAX_CHUNK_SIZE: 4})
+    agent = DropboxBackupAgent(hass, entry)
     dbx = Mock()
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
+    dbx.files_upload_session_start.return_value = SimpleNamespace(session_id="sid")
     with MonkeyPatch.context() as mp:
+        mp.setattr(backup_module, "ChunkSizer", ChunkSizer)
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
-        asyncio.run(agent.async_delete_backup("backup1.tar"))
-    dbx.files_delete_v2.assert_called_once()
+        _stub_session_types(mp)
+
+        async def open_stream():
+            async def gen():
+                for _ in range(10):
+                    yield bytes(mib)
 
+            return gen()
 
-def test_async_get_backup(agent, hass):
+        backup = SimpleNamespace(size=10 * mib, backup_id="b.tar")
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+
+    sizes = [len(dbx.files_upload_session_start.call_args.args[0])] + [
+        len(call.args[0]) for call in dbx.files_upload_session_append_v2.call_args_list
+    ]
+    assert sizes == [4 * mib, 4 * mib, 2 * mib]
+
+
+def _resumable_stream(total):
+    async def open_stream():
+        async def gen():
+            yield b"x" * total
+
+        return gen()
+
+    return open_stream
+
+
+def test_async_upload_backup_resumes_saved_session(agent, hass):
     dbx = Mock()
-    meta = SimpleNamespace(name="backup1.tar", size=1, server_modified="2024-01-01")
-    dbx.files_get_metadata.return_value = meta
+    dbx.files_upload_session_start.return_value = SimpleNamespace(session_id="sid")
+    dbx.files_upload_session_append_v2.side_effect = [None, ConnectionError("lost")]
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
+    total = CHUNK_SIZE * 3 + 1
+    backup = SimpleNamespace(size=total, backup_id="b.tar")
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
-        result = asyncio.run(agent.async_get_backup("backup1.tar"))
-    assert result.name == "backup1.tar"
+        _stub_session_types(mp)
+        stream = _resumable_stream(total)
 
+        with pytest.raises(BackupAgentError):
+            asyncio.run(agent.async_upload_backup(open_stream=stream, backup=backup))
+        saved = agent._upload_sessions.sessions["/b.tar"]
+        assert saved["session_id"] == "sid"
+        assert saved["offset"] == 2 * CHUNK_SIZE
 
-def test_backup_agent_error(agent, hass):
+        dbx.reset_mock()
+        dbx.files_upload_session_append_v2.side_effect = None
+        asyncio.run(agent.async_upload_backup(open_stream=stream, backup=backup))
+
+    dbx.files_upload_session_start.assert_not_called()
+    appends = [
+        (len(call.args[0]), call.args[1].offset)
+        for call in dbx.files_upload_session_append_v2.call_args_list
+    ]
+    assert appends == [
+        (0, 2 * CHUNK_SIZE),
+        (CHUNK_SIZE, 2 * CHUNK_SIZE),
+        (1, 3 * CHUNK_SIZE),
+    ]
+    assert dbx.files_upload_session_finish.call_args.args[1].offset == total
+    assert "/b.tar" not in agent._upload_sessions.sessions
+
+
+def test_upload_session_store_delays_offset_saves(hass):
+    saved = {
+        "/old.tar": {"session_id": "s0", "offset": 1, "started": 0},
+        "/b.tar": {"session_id": "s1", "offset": 1, "started": time.time()},
+    }
+    store = Mock()
+    store.async_load = AsyncMock(return_value=saved)
+    store.async_save = AsyncMock()
+    with MonkeyPatch.context() as mp:
+        mp.setattr(store_module, "Store", Mock(return_value=store))
+        sessions = store_module.UploadSessionStore(hass, "1")
+
+        # Sessions too old to resume are dropped when the store loads
+        assert asyncio.run(sessions.async_get("/old.tar")) is None
+        store.async_save.assert_awaited_once_with({"/b.tar": saved["/b.tar"]})
+
+        store.async_save.reset_mock()
+        session = {**saved["/b.tar"], "offset": 2}
+        asyncio.run(sessions.async_update("/b.tar", session))
+        store.async_save.assert_not_awaited()
+        save, delay = store.async_delay_save.call_args.args
+        assert (save(), delay) == ({"/b.tar": session}, store_module.SAVE_DELAY)
+
+        asyncio.run(sessions.async_remove("/b.tar"))
+        store.async_save.assert_awaited_once_with({})
+
+
+def test_async_upload_backup_resume_resyncs_offset(agent, hass):
+    total = CHUNK_SIZE * 3
+    agent._upload_sessions.sessions["/b.tar"] = {
+        "session_id": "sid",
+        "offset": CHUNK_SIZE,
+        "fingerprint": f"b.tar:{total}",
+        "started": time.time(),
+    }
     dbx = Mock()
-    dbx.files_list_folder.side_effect = Exception
+    dbx.files_upload_session_append_v2.side_effect = [
+        ApiError(
+            "req",
+            dropbox_files.UploadSessionAppendError.incorrect_offset(
+                dropbox_files.UploadSessionOffsetError(correct_offset=2 * CHUNK_SIZE)
+            ),
+            None,
+            None,
+        ),
+        None,
+    ]
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
+    backup = SimpleNamespace(size=total, backup_id="b.tar")
     with MonkeyPatch.context() as mp:
         mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
-        with mp.context():
-            mp.setitem(sys.modules, "dropbox.files", types.SimpleNamespace(FileMetadata=FileMetadata))
-            with pytest.raises(BackupAgentError):
-                asyncio.run(agent.async_list_backups())
+        _stub_session_types(mp)
+        asyncio.run(
+            agent.async_upload_backup(
+                open_stream=_resumable_stream(total), backup=backup
+            )
+        )
+
+    dbx.files_upload_session_start.assert_not_called()
+    resumed = dbx.files_upload_session_append_v2.call_args_list[-1].args
+    assert (len(resumed[0]), resumed[1].offset) == (CHUNK_SIZE, 2 * CHUNK_SIZE)
+    assert dbx.files_upload_session_finish.call_args.args[1].offset == total
+
+
+def test_async_upload_backup_concurrent_session(hass):
+    agent = DropboxBackupAgent(
+        hass, _create_entry(options={CONF_UPLOAD_CONCURRENCY: 3})
+    )
+    dbx = Mock()
+    dbx.files_upload_session_start.return_value = SimpleNamespace(session_id="sid")
+    dbx.files_upload_session_finish.return_value = FileMetadata("/b.tar", "b.tar", 1)
+    total = CHUNK_SIZE * 9 // 2
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_session_types(mp)
+
+        async def open_stream():
+            async def gen():
+                for _ in range(9):
+                    yield b"x" * (CHUNK_SIZE // 2)
+
+            return gen()
+
+        backup = SimpleNamespace(size=SIMPLE_UPLOAD_LIMIT + 1, backup_id="b.tar")
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+
+    start = dbx.files_upload_session_start.call_args
+    assert start.args == (b"",)
+    assert start.kwargs == {"session_type": "concurrent"}
+    appends = sorted(
+        (call.args[1].offset, len(call.args[0]), call.args[2])
+        for call in dbx.files_upload_session_append_v2.call_args_list
+    )
+    assert appends == [
+        (0, CHUNK_SIZE, False),
+        (CHUNK_SIZE, CHUNK_SIZE, False),
+        (2 * CHUNK_SIZE, CHUNK_SIZE, False),
+        (3 * CHUNK_SIZE, CHUNK_SIZE, False),
+        (4 * CHUNK_SIZE, CHUNK_SIZE // 2, True),
+    ]
+    data, cursor, _commit = dbx.files_upload_session_finish.call_args.args
+    assert data == b""
+    assert cursor.offset == total
+
+
+class DiscardingDropbox:
+    """Dropbox client stand-in that keeps no reference to uploaded data."""
+
+    def files_upload_session_start(self, data, **kwargs):
+        return SimpleNamespace(session_id="sid")
+
+    def files_upload_session_append_v2(self, data, cursor, close=False):
+        pass
+
+    def files_upload_session_finish(self, data, cursor, commit):
+        return FileMetadata("/b.tar", "b.tar", cursor.offset)
+
+
+def test_async_upload_backup_memory_bounded_by_chunks(agent, hass):
+    mib = 1024 * 1024
+    size = 12 * CHUNK_SIZE
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=DiscardingDropbox()))
+        _stub_session_types(mp)
+
+        async def open_stream():
+            async def gen():
+                for _ in range(size // mib):
+                    yield bytes(mib)
+
+            return gen()
+
+        backup = SimpleNamespace(size=size, backup_id="b.tar")
+        tracemalloc.start()
+        try:
+            asyncio.run(
+                agent.async_upload_backup(open_stream=open_stream, backup=backup)
+            )
+            _current, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+    # Queued chunks, the chunk being sent and the one being assembled
+    assert peak < (UPLOAD_QUEUE_DEPTH + 4) * CHUNK_SIZE
+
+
+def test_content_hasher_matches_dropbox_reference():
+    data = os.urandom(9 * 1024 * 1024 + 5)
+    hasher = ContentHasher()
+    for start in range(0, len(data), 1024 * 1024 + 3):
+        hasher.update(data[start : start + 1024 * 1024 + 3])
+    assert hasher.hexdigest() == _dropbox_hash(data)
+    assert ContentHasher().hexdigest() == hashlib.sha256().hexdigest()
+
+
+def _small_stream(data):
+    async def open_stream():
+        async def gen():
+            yield data
+
+        return gen()
+
+    return open_stream
+
+
+def test_async_upload_backup_skips_identical_archive(agent, hass):
+    agent._files["b.tar"] = FileMetadata("/b.tar", "b.tar", 4, _dropbox_hash(b"data"))
+    dbx = Mock()
+    backup = SimpleNamespace(size=4, backup_id="b.tar")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        asyncio.run(
+            agent.async_upload_backup(open_stream=_small_stream(b"data"), backup=backup)
+        )
+    dbx.files_upload.assert_not_called()
+    dbx.files_copy_v2.assert_not_called()
+
+
+def test_async_upload_backup_copies_identical_archive(agent, hass):
+    content_hash = _dropbox_hash(b"data")
+    agent._files["old.tar"] = FileMetadata("/old.tar", "old.tar", 4, content_hash)
+    dbx = Mock()
+    dbx.files_copy_v2.return_value = SimpleNamespace(
+        metadata=FileMetadata("/b.tar", "b.tar", 4, content_hash)
+    )
+    backup = SimpleNamespace(size=4, backup_id="b.tar")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        asyncio.run(
+            agent.async_upload_backup(open_stream=_small_stream(b"data"), backup=backup)
+        )
+    dbx.files_copy_v2.assert_called_once_with("/old.tar", "/b.tar")
+    dbx.files_upload.assert_not_called()
+    assert "b.tar" in agent._files
+
+
+def test_async_upload_backup_rejects_content_hash_mismatch(agent, hass):
+    dbx = Mock()
+    dbx.files_upload.return_value = FileMetadata("/b.tar", "b.tar", 4, "0" * 64)
+    backup = SimpleNamespace(size=4, backup_id="b.tar")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        with pytest.raises(BackupAgentError):
+            asyncio.run(
+                agent.async_upload_backup(
+                    open_stream=_small_stream(b"data"), backup=backup
+                )
+            )
+    dbx.files_delete_v2.assert_called_once_with("/b.tar")
+    assert "b.tar" not in agent._files
+
+
+def test_async_upload_backup_stream_error(agent, hass):
+    dbx = Mock()
+    dbx.files_upload_session_start.return_value = SimpleNamespace(session_id="sid")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_session_types(mp)
+
+        async def open_stream():
+            async def gen():
+                yield b"x" * CHUNK_SIZE
+                raise OSError("disk error")
+
+            return gen()
+
+        backup = SimpleNamespace(size=SIMPLE_UPLOAD_LIMIT + 1, backup_id="b.tar")
+        with pytest.raises(BackupAgentError):
+            asyncio.run(
+                agent.async_upload_backup(open_stream=open_stream, backup=backup)
+            )
+    dbx.files_upload_session_finish.assert_not_called()
+
+
+def test_async_download_backup(single_stream_agent, hass):
+    agent = single_stream_agent
+    dbx = Mock()
+    response = StreamedResponse([b"a", b"b", b"c"])
+    metadata = FileMetadata("/backup1.tar", "backup1.tar", 3, _dropbox_hash(b"abc"))
+    dbx.files_download.return_value = (metadata, response)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            return await _collect(stream)
+
+        chunks = asyncio.run(_run())
+    assert b"".join(chunks) == b"abc"
+    assert response.closed
+
+
+def test_async_download_backup_bounded_read_ahead(single_stream_agent, hass):
+    agent = single_stream_agent
+    dbx = Mock()
+    response = StreamedResponse([b"x"] * 100)
+    metadata = FileMetadata("/backup1.tar", "backup1.tar", 100)
+    dbx.files_download.return_value = (metadata, response)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            first = await stream.__anext__()
+            for _ in range(10):
+                await asyncio.sleep(0)
+            await stream.aclose()
+            return first
+
+        assert asyncio.run(_run()) == b"x"
+    assert response.read <= DOWNLOAD_READ_AHEAD + 2
+    assert response.closed
+
+
+class RangeSession:
+    """Serve HTTP Range requests from bytes, failing chosen ranges once.
+
+    Ranges from ``ignore_from`` on are answered with the whole file, the
+    way a server that does not support Range does.
+    """
+
+    def __init__(self, data, fail_once=(), ignore_from=None):
+        self.data = data
+        self.fail_once = set(fail_once)
+        self.ignore_from = ignore_from
+        self.requested = []
+        self.responses = []
+
+    def get(self, url, *, headers, timeout):
+        start, end = map(int, headers["Range"].removeprefix("bytes=").split("-"))
+        self.requested.append(start)
+        if self.ignore_from is not None and start >= self.ignore_from:
+            response = RangeResponse(self.data, False, status=200)
+        else:
+            failing = start in self.fail_once
+            self.fail_once.discard(start)
+            response = RangeResponse(self.data[start : end + 1], failing)
+        self.responses.append(response)
+        return response
+
+
+class RangeResponse:
+    def __init__(self, body, failing, status=206):
+        self.body = body
+        self.failing = failing
+        self.status = status
+        self.read_count = 0
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.failing:
+            raise aiohttp.ClientConnectionError("connection reset")
+
+    async def read(self):
+        self.read_count += 1
+        return self.body
+
+
+def test_async_download_backup_parallel_ranges(hass):
+    mib = 1024 * 1024
+    data = bytes(range(256)) * (mib * 7 // 2 // 256)
+    entry = _create_entry(
+        options={CONF_DOWNLOAD_CONCURRENCY: 2, CONF_DOWNLOAD_CHUNK_SIZE: 1}
+    )
+    agent = DropboxBackupAgent(hass, entry)
+    dbx = Mock()
+    dbx.files_get_temporary_link.return_value = SimpleNamespace(
+        link="https://dl.example/backup1.tar",
+        metadata=SimpleNamespace(size=len(data), content_hash=_dropbox_hash(data)),
+    )
+    session = RangeSession(data, fail_once={mib})
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module, "async_get_clientsession", lambda hass: session)
+        mp.setattr(backup_module, "backoff_delay", lambda *args: 0)
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            return await _collect(stream)
+
+        chunks = asyncio.run(_run())
+    assert b"".join(chunks) == data
+    assert len(chunks) == 4
+    # Only the failed range was fetched twice
+    assert sorted(session.requested) == [0, mib, mib, 2 * mib, 3 * mib]
+    dbx.files_download.assert_not_called()
+
+
+def test_async_download_backup_falls_back_when_ranges_are_ignored(hass):
+    mib = 1024 * 1024
+    data = bytes(range(256)) * (mib * 7 // 2 // 256)
+    entry = _create_entry(
+        options={CONF_DOWNLOAD_CONCURRENCY: 2, CONF_DOWNLOAD_CHUNK_SIZE: 1}
+    )
+    agent = DropboxBackupAgent(hass, entry)
+    dbx = Mock()
+    dbx.files_get_temporary_link.return_value = SimpleNamespace(
+        link="https://dl.example/backup1.tar",
+        metadata=SimpleNamespace(size=len(data), content_hash=_dropbox_hash(data)),
+    )
+    response = StreamedResponse([data[i : i + mib] for i in range(0, len(data), mib)])
+    dbx.files_download.return_value = (None, response)
+    # The first range is honoured, then a proxy starts sending the whole file
+    session = RangeSession(data, ignore_from=mib)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module, "async_get_clientsession", lambda hass: session)
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            return await _collect(stream)
+
+        chunks = asyncio.run(_run())
+    assert b"".join(chunks) == data
+    # Whole-file answers are not read, and not retried
+    assert session.requested == [0, mib]
+    assert [resp.read_count for resp in session.responses] == [1, 0]
+    dbx.files_download.assert_called_once_with("/backup1.tar")
+
+
+def test_async_download_backup_detects_corruption(single_stream_agent, hass):
+    agent = single_stream_agent
+    dbx = Mock()
+    response = StreamedResponse([b"a", b"x", b"c"])
+    metadata = FileMetadata("/backup1.tar", "backup1.tar", 3, _dropbox_hash(b"abc"))
+    dbx.files_download.return_value = (metadata, response)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            return await _collect(stream)
+
+        with pytest.raises(BackupAgentError):
+            asyncio.run(_run())
+    assert response.closed
+
+
+def _batch_result(*errors):
+    return SimpleNamespace(
+        entries=[
+            SimpleNamespace(
+                is_success=lambda error=error: error is None,
+                get_failure=lambda error=error: error,
+            )
+            for error in errors
+        ]
+    )
+
+
+def _batch_launch(*errors):
+    return SimpleNamespace(
+        is_complete=lambda: True, get_complete=lambda: _batch_result(*errors)
+    )
+
+
+def test_async_delete_backup(agent, hass):
+    dbx = Mock()
+    dbx.files_delete_batch.return_value = _batch_launch(None)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module, "DELETE_BATCH_DELAY", 0)
+        agent._files["backup1.tar"] = FileMetadata("/backup1.tar", "backup1.tar", 1)
+        asyncio.run(agent.async_delete_backup("backup1.tar"))
+    (entries,) = dbx.files_delete_batch.call_args.args
+    assert [entry.path for entry in entries] == ["/backup1.tar"]
+    assert "backup1.tar" not in agent._files
+
+
+def test_async_delete_backup_answers_when_the_index_update_fails(agent, hass):
+    dbx = Mock()
+    dbx.files_delete_batch.return_value = _batch_launch(None)
+    agent._files["backup1.tar"] = FileMetadata("/backup1.tar", "backup1.tar", 1)
+
+    async def _run():
+        await asyncio.wait_for(agent.async_delete_backup("backup1.tar"), 5)
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module, "DELETE_BATCH_DELAY", 0)
+        mp.setattr(
+            agent,
+            "_async_update_metadata",
+            AsyncMock(side_effect=RuntimeError("index write failed")),
+        )
+        # The archive is gone, so the delete succeeds all the same
+        asyncio.run(_run())
+    dbx.files_delete_batch.assert_called_once()
+
+
+def test_async_delete_backup_coalesces_burst_into_one_batch(agent, hass):
+    dbx = Mock()
+    dbx.files_delete_batch.return_value = SimpleNamespace(
+        is_complete=lambda: False, get_async_job_id=lambda: "job"
+    )
+    dbx.files_delete_batch_check.side_effect = [
+        SimpleNamespace(is_complete=lambda: False, is_failed=lambda: False),
+        SimpleNamespace(
+            is_complete=lambda: True,
+            get_complete=lambda: _batch_result(None, "path_lookup", None),
+        ),
+    ]
+    for name in ("a.tar", "b.tar", "c.tar"):
+        agent._files[name] = FileMetadata(f"/{name}", name, 1)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module, "DELETE_POLL_INTERVAL", 0)
+
+        async def _run():
+            return await asyncio.gather(
+                *(
+                    agent.async_delete_backup(name)
+                    for name in ("a.tar", "b.tar", "c.tar")
+                ),
+                return_exceptions=True,
+            )
+
+        results = asyncio.run(_run())
+    dbx.files_delete_batch.assert_called_once()
+    assert dbx.files_delete_batch_check.call_count == 2
+    assert results[0] is None and results[2] is None
+    assert isinstance(results[1], BackupAgentError)
+    assert list(agent._files) == ["b.tar"]
+
+
+def _dated_backup(backup_id, date, size=1):
+    return AgentBackup(
+        addons=[],
+        backup_id=backup_id,
+        date=date,
+        database_included=True,
+        extra_metadata={},
+        folders=[],
+        homeassistant_included=True,
+        homeassistant_version="2025.6.0",
+        name=backup_id,
+        protected=False,
+        size=size,
+    )
+
+
+def test_expired_backups_applies_gfs_and_size_rules():
+    backups = [
+        _dated_backup("d1", "2025-06-10T03:00:00+00:00"),
+        _dated_backup("d1-early", "2025-06-10T01:00:00+00:00"),
+        _dated_backup("d2", "2025-06-09T03:00:00+00:00"),
+        _dated_backup("w-prev", "2025-06-04T03:00:00+00:00"),
+        _dated_backup("m-prev", "2025-05-20T03:00:00+00:00"),
+        _dated_backup("old", "2025-03-01T03:00:00+00:00"),
+    ]
+    assert expired_backups(backups) == []
+    assert expired_backups(backups, keep_last=2) == [
+        "d2",
+        "w-prev",
+        "m-prev",
+        "old",
+    ]
+    assert expired_backups(backups, keep_daily=2, keep_weekly=2, keep_monthly=2) == [
+        "d1-early",
+        "old",
+    ]
+    assert expired_backups(backups, keep_last=6, max_total_bytes=3) == [
+        "w-prev",
+        "m-prev",
+        "old",
+    ]
+    # The newest backup survives even a limit it exceeds on its own
+    newest = _dated_backup("big", "2025-06-10T03:00:00", size=10)
+    assert expired_backups([newest], max_total_bytes=1) == []
+
+
+def test_async_upload_backup_applies_retention(hass):
+    agent = DropboxBackupAgent(hass, _create_entry(options={CONF_KEEP_LAST: 1}))
+    agent._list_cursor = "c1"
+    agent._files = {
+        "old.tar": FileMetadata("/old.tar", "old.tar", 4),
+        # Neither is known to be a backup, so retention leaves them alone
+        "notes.txt": FileMetadata("/notes.txt", "notes.txt", 4),
+        "broken.tar": FileMetadata("/broken.tar", "broken.tar", 4),
+    }
+    agent._metadata = {
+        "old.tar": _dated_backup("old.tar", "2025-06-01T03:00:00+00:00", 4).as_dict()
+    }
+    agent._unreadable = {"broken.tar"}
+    dbx = Mock()
+    dbx.files_upload.return_value = FileMetadata("/new.tar", "new.tar", 4)
+    dbx.files_delete_batch.return_value = _batch_launch(None)
+    backup = _dated_backup("new.tar", "2025-06-10T03:00:00+00:00", 4)
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        asyncio.run(
+            agent.async_upload_backup(open_stream=_small_stream(b"data"), backup=backup)
+        )
+
+    (entries,) = dbx.files_delete_batch.call_args.args
+    assert [entry.path for entry in entries] == ["/old.tar"]
+    assert sorted(agent._files) == ["broken.tar", "new.tar", "notes.txt"]
+
+
+def test_async_get_backup(agent, hass):
+    dbx = Mock()
+    meta = SimpleNamespace(name="backup1.tar", size=1, server_modified="2024-01-01")
+    dbx.files_get_metadata.return_value = meta
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        result = asyncio.run(agent.async_get_backup("backup1.tar"))
+    assert result.name == "backup1.tar"
+
+
+def test_backup_agent_error(agent, hass):
+    dbx = Mock()
+    dbx.files_list_folder.side_effect = Exception
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        with mp.context():
+            mp.setitem(
+                sys.modules,
+                "dropbox.files",
+                types.SimpleNamespace(FileMetadata=FileMetadata),
+            )
+            with pytest.raises(BackupAgentError):
+                asyncio.run(agent.async_list_backups())
+
+
+def _fresh_token(access_token="token", ttl=3600):
+    return {
+        "access_token": access_token,
+        "refresh_token": "refresh",
+        "expires_at": time.time() + ttl,
+    }
+
+
+def _store_entry_data(entry):
+    def update(_entry, *, data):
+        object.__setattr__(entry, "data", MappingProxyType(data))
+
+    return update
+
+
+def test_get_dbx_reuses_client_while_token_fresh(hass):
+    agent = DropboxBackupAgent(hass, _create_entry(_fresh_token()))
+    get_impl = AsyncMock()
+    with MonkeyPatch.context() as mp:
+        mp.setattr(backup_module, "async_get_config_entry_implementation", get_impl)
+
+        async def _run():
+            return await agent._get_dbx(), await agent._get_dbx()
+
+        first, second = asyncio.run(_run())
+    assert first is second
+    get_impl.assert_not_called()
+
+
+def test_get_dbx_refreshes_expiring_token_once(hass):
+    entry = _create_entry(_fresh_token("old", ttl=5))
+    agent = DropboxBackupAgent(hass, entry)
+    old = agent._dbx = Mock()
+    agent._dbx_token = "old"
+    impl = Mock()
+    impl.async_refresh_token = AsyncMock(return_value=_fresh_token("new"))
+    hass.config_entries.async_update_entry = Mock(side_effect=_store_entry_data(entry))
+    with MonkeyPatch.context() as mp:
+        mp.setattr(
+            backup_module,
+            "async_get_config_entry_implementation",
+            AsyncMock(return_value=impl),
+        )
+
+        async def _run():
+            return await asyncio.gather(*(agent._get_dbx() for _ in range(3)))
+
+        clients = asyncio.run(_run())
+    impl.async_refresh_token.assert_awaited_once()
+    assert len({id(client) for client in clients}) == 1
+    assert clients[0] is not old
+    old.close.assert_called_once()
+    assert entry.data["token"]["access_token"] == "new"
+
+
+def test_async_call_refreshes_token_on_auth_error(agent, hass):
+    stale, fresh = Mock(), Mock()
+    stale.files_get_metadata.side_effect = AuthError("request-id", None)
+    fresh.files_get_metadata.return_value = FileMetadata(
+        "/backup1.tar", "backup1.tar", 1
+    )
+    get_dbx = AsyncMock(side_effect=[stale, fresh])
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", get_dbx)
+        asyncio.run(agent.async_get_backup("backup1.tar"))
+    fresh.files_get_metadata.assert_called_once()
+    get_dbx.assert_awaited_with(stale=stale)
+
+
+def test_async_call_honours_rate_limit_backoff(agent, hass):
+    dbx = Mock()
+    dbx.files_get_metadata.side_effect = [
+        RateLimitError("request-id", backoff=7),
+        FileMetadata("/backup1.tar", "backup1.tar", 1),
+    ]
+    sleep = AsyncMock()
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module.asyncio, "sleep", sleep)
+        asyncio.run(agent.async_get_backup("backup1.tar"))
+    assert dbx.files_get_metadata.call_count == 2
+    sleep.assert_awaited_once_with(7)
+
+
+def test_async_call_gives_up_after_request_attempts(agent, hass):
+    dbx = Mock()
+    dbx.files_get_metadata.side_effect = InternalServerError("request-id", 503, "")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module.asyncio, "sleep", AsyncMock())
+        with pytest.raises(BackupAgentError):
+            asyncio.run(agent.async_get_backup("backup1.tar"))
+    assert dbx.files_get_metadata.call_count == REQUEST_ATTEMPTS
+
+
+def test_async_call_does_not_retry_api_errors(agent, hass):
+    dbx = Mock()
+    dbx.files_get_metadata.side_effect = ApiError("request-id", "path", None, None)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        with pytest.raises(BackupAgentError):
+            asyncio.run(agent.async_get_backup("backup1.tar"))
+    dbx.files_get_metadata.assert_called_once()
+
+
+def test_retry_budget_limits_an_operation(agent, hass):
+    dbx = Mock()
+    dbx.files_list_folder.side_effect = InternalServerError("request-id", 500, "")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module.asyncio, "sleep", AsyncMock())
+        mp.setattr(backup_module, "start_operation", lambda: start_operation(1))
+        with pytest.raises(BackupAgentError):
+            asyncio.run(agent.async_list_backups())
+    assert dbx.files_list_folder.call_count == 2
+
+
+def test_watch_folder_applies_remote_changes(agent, hass):
+    agent._list_cursor = "c1"
+    agent._files = {"backup1.tar": FileMetadata("/backup1.tar", "backup1.tar", 1)}
+    dbx = Mock()
+    dbx.files_list_folder_continue.side_effect = [
+        SimpleNamespace(
+            entries=[FileMetadata("/backup2.tar", "backup2.tar", 2)],
+            has_more=False,
+            cursor="c2",
+        ),
+        SimpleNamespace(entries=[], has_more=False, cursor="c3"),
+    ]
+    longpoll = AsyncMock(
+        side_effect=[(True, None), (True, None), asyncio.CancelledError]
+    )
+    on_change = Mock()
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(agent, "_async_longpoll", longpoll)
+        mp.setattr(backup_module, "async_get_clientsession", Mock())
+        _stub_metadata_types(mp)
+        with pytest.raises(asyncio.CancelledError):
+            asyncio.run(agent.async_watch_folder(on_change))
+
+    # Only the poll that changed the index notifies the backup manager
+    on_change.assert_called_once()
+    assert [call.args[1] for call in longpoll.call_args_list] == ["c1", "c2", "c3"]
+    assert set(agent._files) == {"backup1.tar", "backup2.tar"}
+    assert not agent._watching
+
+
+def test_async_list_backups_served_from_index_while_watching(agent, hass):
+    agent._list_cursor = "c1"
+    agent._watching = True
+    agent._files = {"backup1.tar": FileMetadata("/backup1.tar", "backup1.tar", 1)}
+    get_dbx = AsyncMock()
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", get_dbx)
+        backups = asyncio.run(agent.async_list_backups())
+    assert [backup.backup_id for backup in backups] == ["backup1.tar"]
+    get_dbx.assert_not_awaited()
+
+
+def test_async_list_backups_waits_for_the_warm_up(agent, hass):
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[FileMetadata("/backup1.tar", "backup1.tar", 1)],
+        has_more=False,
+        cursor="c1",
+    )
+
+    async def _run():
+        agent._warm_up = asyncio.create_task(agent.async_warm_up())
+        return await agent.async_list_backups()
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        backups = asyncio.run(_run())
+
+    # The listing made by the warm-up answers the request
+    assert [backup.backup_id for backup in backups] == ["backup1.tar"]
+    dbx.files_list_folder.assert_called_once()
+    dbx.files_list_folder_continue.assert_not_called()
+    assert agent.metrics.last["warm_up"].failed is False
+
+
+def test_async_list_backups_falls_back_to_the_last_listing(agent, hass):
+    agent._list_cursor = "c1"
+    agent._files = {"backup1.tar": FileMetadata("/backup1.tar", "backup1.tar", 1)}
+    dbx = Mock()
+    dbx.files_list_folder_continue.side_effect = Exception("offline")
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        backups = asyncio.run(agent.async_list_backups())
+    assert [backup.backup_id for backup in backups] == ["backup1.tar"]
+
+
+BACKUP_JSON = {
+    "slug": "abc123",
+    "name": "Automatic backup 2025.6.0",
+    "date": "2025-06-01T03:00:00+00:00",
+    "addons": [{"name": "Mosquitto", "slug": "core_mosquitto", "version": "6.5"}],
+    "folders": ["homeassistant", "share"],
+    "homeassistant": {"version": "2025.6.0", "exclude_database": True},
+    "protected": True,
+}
+
+
+def _archive(backup_json):
+    data = json.dumps(backup_json).encode()
+    buffer = io.BytesIO()
+    with tarfile.open(fileobj=buffer, mode="w") as archive:
+        info = tarfile.TarInfo("./backup.json")
+        info.size = len(data)
+        archive.addfile(info, io.BytesIO(data))
+        info = tarfile.TarInfo("./homeassistant.tar.gz")
+        info.size = 1024
+        archive.addfile(info, io.BytesIO(b"\0" * 1024))
+    buffer.seek(0)
+    return buffer
+
+
+def _not_found():
+    return ApiError(
+        "request-id",
+        dropbox_files.DownloadError.path(dropbox_files.LookupError.not_found),
+        None,
+        None,
+    )
+
+
+def _body(content=b"", raw=None):
+    return None, SimpleNamespace(content=content, raw=raw, close=Mock())
+
+
+def test_async_list_backups_reads_sidecar_index(agent, hass):
+    stored = {
+        "addons": [],
+        "date": "2025-06-01T03:00:00+00:00",
+        "database_included": False,
+        "extra_metadata": {"instance_id": "x"},
+        "folders": ["media"],
+        "homeassistant_included": True,
+        "homeassistant_version": "2025.6.0",
+        "name": "Nightly",
+        "protected": True,
+    }
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[
+            FileMetadata(f"/{INDEX_FILE}", INDEX_FILE, 100),
+            FileMetadata("/abc123.tar", "abc123.tar", 42),
+        ],
+        has_more=False,
+        cursor="c1",
+    )
+    dbx.files_download.return_value = _body(dump_index({"abc123.tar": stored}))
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        backups = asyncio.run(agent.async_list_backups())
+
+    # One index download, no archive reads
+    dbx.files_download.assert_called_once_with(f"/{INDEX_FILE}")
+    assert backups == [
+        AgentBackup.from_dict({**stored, "backup_id": "abc123.tar", "size": 42})
+    ]
+
+
+def test_bad_index_entry_falls_back_to_the_listing(agent, hass):
+    # An index written by a newer version may name an unknown folder
+    agent._metadata = {
+        "abc123.tar": {
+            "addons": [],
+            "date": "2025-06-01T03:00:00+00:00",
+            "database_included": True,
+            "extra_metadata": {},
+            "folders": ["unknown"],
+            "homeassistant_included": True,
+            "homeassistant_version": "2025.6.0",
+            "name": "Nightly",
+            "protected": False,
+        }
+    }
+    file = FileMetadata("/abc123.tar", "abc123.tar", 42)
+    file.server_modified = "2025-06-01T03:00:00+00:00"
+    backup = agent._metadata_to_backup(file, "abc123.tar")
+    assert (backup.name, backup.size, backup.folders) == ("abc123.tar", 42, [])
+
+
+def test_async_list_backups_rebuilds_missing_sidecar(agent, hass):
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[FileMetadata("/abc123.tar", "abc123.tar", 42)],
+        has_more=False,
+        cursor="c1",
+    )
+    dbx.files_download.side_effect = [
+        _not_found(),
+        _body(raw=_archive(BACKUP_JSON)),
+    ]
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        (backup,) = asyncio.run(agent.async_list_backups())
+
+    assert backup.name == "Automatic backup 2025.6.0"
+    assert backup.homeassistant_version == "2025.6.0"
+    assert not backup.database_included
+    assert backup.protected
+    assert [folder.value for folder in backup.folders] == ["share"]
+    assert [addon.slug for addon in backup.addons] == ["core_mosquitto"]
+    data, path = dbx.files_upload.call_args.args
+    assert path == f"/{INDEX_FILE}"
+    assert json.loads(data)["backups"]["abc123.tar"]["name"] == backup.name
+
+
+def test_rebuild_reads_archive_headers_concurrently(agent, hass):
+    agent._metadata = {}
+    agent._files = {
+        f"b{n}.tar": FileMetadata(f"/b{n}.tar", f"b{n}.tar", 42) for n in range(10)
+    }
+    running = peak = 0
+    uploads = []
+
+    async def call(method, *args, **kwargs):
+        nonlocal running, peak
+        if method == "files_upload":
+            uploads.append(args)
+            return None
+        running += 1
+        peak = max(peak, running)
+        await asyncio.sleep(0.01)
+        running -= 1
+        return _body(raw=_archive(BACKUP_JSON))
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_async_call", call)
+        _stub_metadata_types(mp)
+        asyncio.run(agent._async_rebuild_metadata())
+
+    assert peak == backup_module.METADATA_READ_CONCURRENCY
+    assert sorted(agent._metadata) == sorted(agent._files)
+    # The sidecar is written once, with every backup in it
+    (upload,) = uploads
+    assert len(json.loads(upload[0])["backups"]) == 10
+
+
+def test_async_upload_backup_records_sidecar_metadata(agent, hass):
+    backup = AgentBackup.from_dict(
+        {
+            "addons": [],
+            "backup_id": "abc123.tar",
+            "date": "2025-06-01T03:00:00+00:00",
+            "database_included": True,
+            "extra_metadata": {},
+            "folders": [],
+            "homeassistant_included": True,
+            "homeassistant_version": "2025.6.0",
+            "name": "Manual",
+            "protected": False,
+            "size": 4,
+        }
+    )
+    dbx = Mock()
+    dbx.files_upload.side_effect = [
+        FileMetadata("/abc123.tar", "abc123.tar", 4),
+        None,
+    ]
+    dbx.files_download.side_effect = _not_found()
+
+    async def open_stream():
+        async def gen():
+            yield b"data"
+
+        return gen()
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+        listed = asyncio.run(agent.async_get_backup("abc123.tar"))
+
+    data, path = dbx.files_upload.call_args.args
+    assert path == f"/{INDEX_FILE}"
+    assert json.loads(data)["backups"]["abc123.tar"]["name"] == "Manual"
+    assert listed == backup
+
+
+def test_async_upload_backup_compressed_round_trip(hass):
+    agent = DropboxBackupAgent(
+        hass,
+        _create_entry(options={CONF_COMPRESSION: "gzip", CONF_DOWNLOAD_CONCURRENCY: 1}),
+    )
+    data = b"home assistant " * 1000
+    backup = AgentBackup.from_dict(
+        {
+            "addons": [],
+            "backup_id": "abc123.tar",
+            "date": "2025-06-01T03:00:00+00:00",
+            "database_included": True,
+            "extra_metadata": {},
+            "folders": [],
+            "homeassistant_included": True,
+            "homeassistant_version": "2025.6.0",
+            "name": "Manual",
+            "protected": False,
+            "size": len(data),
+        }
+    )
+    uploaded = {}
+
+    def files_upload(body, path, **kwargs):
+        uploaded[path] = body
+        if path == "/abc123.tar":
+            return FileMetadata(path, "abc123.tar", len(body), _dropbox_hash(body))
+        return None
+
+    dbx = Mock()
+    dbx.files_upload.side_effect = files_upload
+    dbx.files_download.side_effect = _not_found()
+
+    async def open_stream():
+        async def gen():
+            yield data
+
+        return gen()
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        asyncio.run(agent.async_upload_backup(open_stream=open_stream, backup=backup))
+        listed = asyncio.run(agent.async_get_backup("abc123.tar"))
+
+        stored = uploaded["/abc123.tar"]
+        assert stored.startswith(b"\x1f\x8b")
+        assert len(stored) < len(data)
+        # Listings show the size of the backup, not of the stored archive
+        assert listed.size == len(data)
+
+        dbx.files_download.side_effect = None
+        dbx.files_download.return_value = (
+            agent._files["abc123.tar"],
+            StreamedResponse([stored]),
+        )
+
+        async def _run():
+            stream = await agent.async_download_backup("abc123.tar")
+            return await _collect(stream)
+
+        restored = b"".join(asyncio.run(_run()))
+    assert restored == data
+
+
+def test_decompress_stream_follows_the_index_and_checks_the_end():
+    data = b"home assistant " * 1000
+    packed = compress_bytes(data, "gzip", 6)
+
+    async def run(func, *args):
+        return func(*args)
+
+    async def _restore(body, codec):
+        async def chunks():
+            yield body
+
+        return b"".join(await _collect(decompress_stream(chunks(), codec, run)))
+
+    assert asyncio.run(_restore(packed, "gzip")) == data
+    # A .gz file the agent did not compress is restored as it is
+    assert asyncio.run(_restore(packed, None)) == packed
+    for body in (packed[:-8], packed + b"junk"):
+        with pytest.raises(BackupAgentError):
+            asyncio.run(_restore(body, "gzip"))
+
+
+class ApiResponse:
+    """aiohttp response stand-in for the native Dropbox client."""
+
+    def __init__(self, status=200, body=b"", headers=None, chunks=()):
+        self.status = status
+        self.body = body
+        self.headers = headers or {}
+        self.content = SimpleNamespace(iter_chunked=self._iter_chunked)
+        self.chunks = list(chunks)
+        self.released = False
+
+    async def _iter_chunked(self, size):
+        for chunk in self.chunks:
+            yield chunk
+
+    async def read(self):
+        return self.body
+
+    async def text(self):
+        return self.body.decode()
+
+    def release(self):
+        self.released = True
+
+
+class ApiSession:
+    """Record Dropbox API requests and answer them in order."""
+
+    def __init__(self, *responses):
+        self.responses = list(responses)
+        self.requests = []
+
+    async def post(self, url, *, headers, data, timeout):
+        self.requests.append((url, headers, data))
+        return self.responses.pop(0)
+
+
+def _file_json(path, size, content_hash=None):
+    return {
+        "name": path.rsplit("/", 1)[-1],
+        "id": "id:abc",
+        "client_modified": "2025-06-01T03:00:00Z",
+        "server_modified": "2025-06-01T03:00:00Z",
+        "rev": "0123456789abcdef",
+        "size": size,
+        "path_lower": path,
+        "path_display": path,
+        **({"content_hash": content_hash} if content_hash else {}),
+    }
+
+
+def _native_client(hass, mp, session):
+    mp.setattr(api_module, "async_get_clientsession", lambda hass: session)
+    return DropboxClient(hass, "token", Mock())
+
+
+def test_dropbox_client_upload_returns_sdk_metadata(hass):
+    session = ApiSession(ApiResponse(body=json.dumps(_file_json("/b.tar", 4)).encode()))
+    with MonkeyPatch.context() as mp:
+        client = _native_client(hass, mp, session)
+        result = asyncio.run(client.files_upload(b"data", "/b.tar"))
+
+    assert isinstance(result, dropbox_files.FileMetadata)
+    assert result.size == 4
+    url, headers, data = session.requests[0]
+    assert url == "https://content.dropboxapi.com/2/files/upload"
+    assert headers["Authorization"] == "Bearer token"
+    assert json.loads(headers["Dropbox-API-Arg"])["path"] == "/b.tar"
+    assert data == b"data"
+
+
+def test_dropbox_client_raises_sdk_errors(hass):
+    not_found = {"error": {".tag": "path_lookup", "path_lookup": {".tag": "not_found"}}}
+    session = ApiSession(
+        ApiResponse(409, json.dumps(not_found).encode()),
+        ApiResponse(429, b"", {"Retry-After": "3"}),
+        ApiResponse(429, b"", {"Retry-After": "Wed, 21 Oct 2026 07:28:00 GMT"}),
+        ApiResponse(503, b"unavailable"),
+    )
+    with MonkeyPatch.context() as mp:
+        client = _native_client(hass, mp, session)
+        with pytest.raises(ApiError) as err:
+            asyncio.run(client.files_delete_v2("/b.tar"))
+        assert err.value.error.get_path_lookup().is_not_found()
+        with pytest.raises(RateLimitError) as err:
+            asyncio.run(client.files_delete_v2("/b.tar"))
+        assert err.value.backoff == 3
+        # The date form still raises the rate limit; retries use their default
+        with pytest.raises(RateLimitError) as err:
+            asyncio.run(client.files_delete_v2("/b.tar"))
+        assert err.value.backoff is None
+        with pytest.raises(InternalServerError):
+            asyncio.run(client.files_delete_v2("/b.tar"))
+
+    url, _headers, data = session.requests[0]
+    assert url == "https://api.dropboxapi.com/2/files/delete_v2"
+    assert json.loads(data) == {"path": "/b.tar"}
+
+
+def test_async_download_backup_streams_native_response(single_stream_agent, hass):
+    agent = single_stream_agent
+    response = ApiResponse(
+        headers={
+            "Dropbox-API-Result": json.dumps(
+                _file_json("/backup1.tar", 3, _dropbox_hash(b"abc"))
+            )
+        },
+        chunks=[b"a", b"b", b"c"],
+    )
+    session = ApiSession(response)
+    with MonkeyPatch.context() as mp:
+        client = _native_client(hass, mp, session)
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=client))
+
+        async def _run():
+            stream = await agent.async_download_backup("backup1.tar")
+            return await _collect(stream)
+
+        chunks = asyncio.run(_run())
+    assert chunks == [b"a", b"b", b"c"]
+    assert response.released
+    assert session.requests[0][0] == "https://content.dropboxapi.com/2/files/download"
+    client._sdk.files_download.assert_not_called()
+
+
+def test_dropbox_client_falls_back_to_sdk(hass):
+    with MonkeyPatch.context() as mp:
+        client = _native_client(hass, mp, ApiSession())
+        assert client.files_list_revisions is client._sdk.files_list_revisions
+
+
+def test_operation_metrics_count_calls_retries_and_throttling(agent, hass):
+    dbx = Mock()
+    dbx.files_get_metadata.side_effect = [
+        RateLimitError("request-id", backoff=0),
+        FileMetadata("/backup1.tar", "backup1.tar", 1),
+        InternalServerError("request-id", 503, ""),
+    ] + [InternalServerError("request-id", 503, "")] * REQUEST_ATTEMPTS
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(backup_module.asyncio, "sleep", AsyncMock())
+        asyncio.run(agent.async_get_backup("backup1.tar"))
+        record = agent.metrics.last["get"]
+        assert (record.api_calls, record.retries, record.throttled) == (2, 1, 1)
+        assert not record.failed
+
+        with pytest.raises(BackupAgentError):
+            asyncio.run(agent.async_get_backup("backup2.tar"))
+    record = agent.metrics.last["get"]
+    assert (record.api_calls, record.throttled, record.failed) == (
+        REQUEST_ATTEMPTS,
+        0,
+        True,
+    )
+    totals = agent.metrics.totals["get"]
+    assert (totals.count, totals.failures, totals.api_calls) == (
+        2,
+        1,
+        2 + REQUEST_ATTEMPTS,
+    )
+
+
+def test_finished_operations_stop_counting_requests():
+    metrics = TransferMetrics()
+    with metrics.operation("upload") as upload:
+        with metrics.operation("get") as get:
+            count_api_call()
+        count_api_call()
+    # Requests after the operation count against nothing
+    count_api_call()
+    assert (upload.api_calls, get.api_calls) == (1, 1)
+
+
+def test_unread_download_leaves_no_current_record(single_stream_agent, hass):
+    agent = single_stream_agent
+    dbx = Mock()
+    metadata = FileMetadata("/backup1.tar", "backup1.tar", 3, _dropbox_hash(b"abc"))
+    dbx.files_download.return_value = (metadata, StreamedResponse([b"abc"]))
+    records = []
+    start = agent.metrics.start
+
+    def _start(operation):
+        records.append(start(operation))
+        return records[-1]
+
+    async def _run():
+        await agent.async_download_backup("backup1.tar")
+        # The backup manager may drop the stream without reading it
+        count_api_call()
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        mp.setattr(agent.metrics, "start", _start)
+        asyncio.run(_run())
+
+    (download,) = records
+    assert download.api_calls == 1
+    assert "download" not in agent.metrics.last
+
+
+def test_upload_metrics_feed_sensors_and_diagnostics(hass):
+    entry = _create_entry(token=_fresh_token("secret"))
+    agent = DropboxBackupAgent(hass, entry, WorkerPool(1, "test"))
+    entry.runtime_data = agent
+    dbx = Mock()
+    dbx.files_upload.side_effect = [FileMetadata("/b.tar", "b.tar", 4), None]
+    dbx.files_download.side_effect = _not_found()
+    updates = Mock()
+    agent.metrics.async_add_listener(updates)
+
+    async def open_stream():
+        async def gen():
+            yield b"data"
+
+        return gen()
+
+    async def _run():
+        backup = _dated_backup("b.tar", "2025-06-01T03:00:00+00:00", size=4)
+        await agent.async_upload_backup(open_stream=open_stream, backup=backup)
+        return await async_get_config_entry_diagnostics(hass, entry)
+
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        diagnostics = asyncio.run(_run())
+    agent.pool.shutdown()
+
+    updates.assert_called_once()
+    record = agent.metrics.last["upload"]
+    assert record.bytes == 4
+    # The upload itself, then reading and writing the sidecar index
+    assert record.api_calls == 3
+    values = {
+        description.key: DropboxBackupSensor(entry, agent, description).native_value
+        for description in SENSORS
+    }
+    assert values == {
+        "last_upload_throughput": record.bytes_per_second,
+        "last_backup_duration": record.duration,
+        "stored_bytes": 4,
+    }
+    assert "secret" not in json.dumps(diagnostics)
+    assert diagnostics["operations"]["last"]["upload"]["bytes"] == 4
+    assert diagnostics["worker_pool"]["workers"] == 1
+
+
+def _content_chunks(data: bytes, piece_size: int) -> list[bytes]:
+    chunker = ContentChunker()
+    chunks = []
+    for start in range(0, len(data), piece_size):
+        chunks.extend(chunker.feed(data[start : start + piece_size]))
+    if (last := chunker.flush()) is not None:
+        chunks.append(last)
+    return chunks
+
+
+def test_content_chunker_realigns_after_an_insertion():
+    import random
+
+    data = random.Random(1).randbytes(24 * 1024 * 1024)
+    edited = data[:5_000_000] + b"inserted" + data[5_000_000:]
+    original = _content_chunks(data, 1024 * 1024)
+    changed = _content_chunks(edited, 100_000)
+
+    # Boundaries do not depend on how the stream was cut up
+    assert _content_chunks(data, 100_000) == original
+    assert b"".join(changed) == edited
+    assert all(
+        DEDUP_MIN_CHUNK_SIZE <= len(chunk) <= DEDUP_MAX_CHUNK_SIZE
+        for chunk in original[:-1]
+    )
+    # Only the chunk holding the insertion differs
+    shared = {chunk_id(chunk) for chunk in original} & {
+        chunk_id(chunk) for chunk in changed
+    }
+    assert len(shared) == len(original) - 1
+
+
+def test_restore_chunk_checks_stored_chunks():
+    data = b"backup data " * 1000
+    name = chunk_id(data)
+    assert restore_chunk(name, data) == data
+    assert restore_chunk(name, compress_bytes(data, "gzip", 6)) == data
+    with pytest.raises(ValueError):
+        restore_chunk(name, data[:-1])
+
+
+def test_collect_chunks_keeps_recent_chunks(agent, hass):
+    agent._list_cursor = "c1"
+    agent._metadata = {}
+    old = FileMetadata("/.chunks/old", "old", 1)
+    old.server_modified = datetime(2025, 6, 1, 3, 0)
+    # May belong to a backup another instance is still uploading
+    new = FileMetadata("/.chunks/new", "new", 1)
+    new.server_modified = datetime.now(UTC).replace(tzinfo=None)
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[old, new], has_more=False, cursor="k1"
+    )
+    dbx.files_list_folder_continue.return_value = SimpleNamespace(
+        entries=[], has_more=False, cursor="c2"
+    )
+    dbx.files_delete_batch.return_value = _batch_launch(None)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        sys.modules["dropbox.files"].DeleteArg = dropbox_files.DeleteArg
+        asyncio.run(agent._async_collect_chunks())
+
+    # The chunk folder is listed again rather than trusted from memory
+    dbx.files_list_folder.assert_called_once_with("/.chunks")
+    (entries,) = dbx.files_delete_batch.call_args.args
+    assert [entry.path for entry in entries] == ["/.chunks/old"]
+    assert agent._chunks == {"new": 1}
+
+
+def test_collect_chunks_ignores_unreadable_archives_that_are_not_manifests(
+    agent, hass, caplog
+):
+    agent._list_cursor = "c1"
+    agent._metadata = {}
+    agent._files = {
+        "notes.tar": FileMetadata("/notes.tar", "notes.tar", 10),
+        "broken.tar": FileMetadata("/broken.tar", "broken.tar", 14),
+    }
+    old = FileMetadata("/.chunks/old", "old", 1)
+    old.server_modified = datetime(2025, 6, 1, 3, 0)
+    heads = {"/notes.tar": b"plain text", "/broken.tar": b'{"manifest": 9'}
+    dbx = Mock()
+    dbx.files_list_folder.return_value = SimpleNamespace(
+        entries=[old], has_more=False, cursor="k1"
+    )
+    dbx.files_list_folder_continue.return_value = SimpleNamespace(
+        entries=[], has_more=False, cursor="c2"
+    )
+    dbx.files_download.side_effect = lambda path: _body(raw=io.BytesIO(heads[path]))
+    dbx.files_delete_batch.return_value = _batch_launch(None)
+    with MonkeyPatch.context() as mp:
+        mp.setattr(agent, "_get_dbx", AsyncMock(return_value=dbx))
+        _stub_metadata_types(mp)
+        sys.modules["dropbox.files"].DeleteArg = dropbox_files.DeleteArg
+        # A manifest that cannot be read may still use any chunk
+        asyncio.run(agent._async_collect_chunks())
+        dbx.files_delete_batch.assert_not_called()
+        assert "not indexed: broken.tar" in caplog.text
+
+        del agent._files["broken.tar"]
+        asyncio.run(agent._async_collect_chunks())
+
+    assert agent._unreadable == {"notes.tar", "broken.tar"}
+    (entries,) = dbx.files_delete_batch.call_args.args
+    assert [entry.path for entry in entries] == ["/.chunks/old"]
+
+
+def test_token_bucket_paces_chunks_and_follows_rate_changes(monkeypatch):
+    clock = [0.0]
+    sleeps = []
+    rate = [1000.0]
+
+    async def _sleep(delay):
+        sleeps.append(delay)
+        clock[0] += delay
+        # The limit is raised while the second chunk waits
+        rate[0] = 4000.0
+
+    monkeypatch.setattr(
+        bandwidth_module, "time", SimpleNamespace(monotonic=lambda: clock[0])
+    )
+    monkeypatch.setattr(
+        bandwidth_module,
+        "asyncio",
+        SimpleNamespace(Lock=asyncio.Lock, sleep=_sleep),
+    )
+    bucket = TokenBucket(lambda: rate[0])
+
+    async def _run():
+        # The first chunk goes at once; the next waits for it to be paid off
+        await bucket.async_consume(2000)
+        await bucket.async_consume(2000)
+        rate[0] = None
+        await bucket.async_consume(10**9)
+
+    asyncio.run(_run())
+    # One second at 1000 B/s, then the other 1000 bytes at 4000 B/s
+    assert sleeps == [1.0, 0.25]
+
+
+def test_bandwidth_limiter_lifts_limits_in_unlimited_hours(monkeypatch):
+    from datetime import datetime
+
+    now = [datetime(2025, 6, 1, 2, 30)]
+    monkeypatch.setattr(
+        bandwidth_module, "dt_util", SimpleNamespace(now=lambda: now[0])
+    )
+    limiter = BandwidthLimiter(
+        {"upload_limit": 8, "unlimited_hours": "22:00-06:00, 12:00-13:00"}
+    )
+    assert limiter.as_dict() == {"upload": None, "download": None}
+    now[0] = datetime(2025, 6, 1, 6, 0)
+    assert limiter.as_dict() == {"upload": 1_000_000, "download": None}
+
+    limiter.configure({"download_limit": 0.8})
+    assert limiter.as_dict() == {"upload": None, "download": 100_000}
+
+    with pytest.raises(ValueError):
+        parse_windows("1am-6am")
+
+
+def test_backup_cache_evicts_least_recently_used_within_budget(tmp_path, monkeypatch):
+    clock = iter(range(100))
+    monkeypatch.setattr(
+        "custom_components.dropboxbackup.cache.time.time", lambda: next(clock)
+    )
+    cache = BackupCache(str(tmp_path / "cache"), "prefix", 0, 25)
+
+    def _add(key: str, size: int) -> None:
+        writer = cache.writer()
+        writer.restart()
+        writer.write(b"x" * size)
+        cache.add(key, writer, f"hash-{key}", "2025-06-01T03:00:00+00:00")
+
+    _add("a", 10)
+    _add("b", 10)
+    # Using "a" makes "b" the least recently used
+    assert cache.lookup("a", "hash-a", "2025-06-01T03:00:00+00:00") is not None
+    _add("c", 10)
+    assert cache.lookup("b", "hash-b", "2025-06-01T03:00:00+00:00") is None
+    assert cache.lookup("a", "hash-a", "2025-06-01T03:00:00+00:00") is not None
+    # A changed file on Dropbox drops the stale copy
+    assert cache.lookup("c", "other", "2025-06-01T03:00:00+00:00") is None
+    assert sorted(os.listdir(tmp_path / "cache")) == sorted(
+        ["prefix_index.json", _cached_name("a")]
+    )
+    # Too large to ever fit
+    _add("d", 30)
+    assert cache.lookup("d", "hash-d", "2025-06-01T03:00:00+00:00") is None
+    # Only .tar files sit in the folder Home Assistant's backups leave out
+    assert all(
+        name.endswith(".tar")
+        for name in os.listdir(tmp_path / "cache")
+        if name != "prefix_index.json"
+    )
+    cache.clear()
+    assert os.listdir(tmp_path / "cache") == []
+
+
+def _cached_name(key: str) -> str:
+    return "prefix_" + hashlib.sha256(key.encode()).hexdigest()[:32] + ".tar"